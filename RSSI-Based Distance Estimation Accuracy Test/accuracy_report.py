@@ -0,0 +1,231 @@
+# accuracy_report.py
+# Accuracy report of the distance estimation test as data, for pipelines as well as people.
+#
+# build_report() computes the (tag, ref_distance) summary once, from the mergeable
+# accumulators in running_stats.py, together with the per-tag overall error, the
+# raw-vs-Kalman comparison and the RSSI drift check. The result can be printed in the
+# format main.py always used (format_report), turned into JSON (report_to_dict), or split
+# into one report file per tag, written in parallel for large fleets (write_tag_reports).
+#
+#   python accuracy_report.py --data data.csv --json report.json --per-tag reports/ --format txt
+
+import argparse
+import json
+import math
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "shared"))
+
+from loaders import read_accuracy, widen
+from running_stats import StatsTable
+
+TX_POWER = -68.0
+PATH_LOSS_EXPONENT = 2.5
+DRIFT_WARNING = -0.2            # dBm per cycle
+SUMMARY_COLUMNS = {
+    'mean_estimated': ('estimated_distance', 'mean'),
+    'std_estimated': ('estimated_distance', 'std'),
+    'mean_abs_error': ('abs_error', 'mean'),
+    'std_abs_error': ('abs_error', 'std'),
+    'min_error': ('abs_error', 'min'),
+    'max_error': ('abs_error', 'max'),
+}
+
+
+def load_data(path='data.csv'):
+    """data.csv with the compact dtypes of loaders.ACCURACY_SCHEMA."""
+    return read_accuracy(path)
+
+
+def add_model_errors(df):
+    """Model estimates and absolute errors, computed in float64 from the logged values."""
+    v = widen(df, ['ref_distance', 'raw_rssi', 'kalman_rssi', 'estimated_distance'])
+    df['raw_estimated'] = 10**((TX_POWER - v['raw_rssi'])/(10*PATH_LOSS_EXPONENT))
+    df['raw_error'] = np.abs(df['raw_estimated'] - v['ref_distance'])
+    df['kalman_estimated'] = 10**((TX_POWER - v['kalman_rssi'])/(10*PATH_LOSS_EXPONENT))
+    df['kalman_error'] = np.abs(df['kalman_estimated'] - v['ref_distance'])
+    df['abs_error'] = np.abs(v['estimated_distance'] - v['ref_distance'])
+    return df
+
+
+def accuracy_stats(df):
+    """Mergeable accumulators of the estimated distance and absolute error per (tag, ref_distance)."""
+    keys = pd.DataFrame({'tag': df['tag'], **widen(df, ['ref_distance', 'estimated_distance'])}, index=df.index)
+    return StatsTable(['tag', 'ref_distance'], ['estimated_distance', 'abs_error']) \
+        .update_frame(keys.assign(abs_error=df['abs_error']))
+
+
+# ---------------------------
+# Report
+# ---------------------------
+def summary_table(stats):
+    """Per-(tag, ref_distance) accuracy summary, indexed and sorted by tag then distance."""
+    frame = stats.frame()
+    if not len(frame):
+        return pd.DataFrame(columns=list(SUMMARY_COLUMNS),
+                            index=pd.MultiIndex.from_tuples([], names=['tag', 'ref_distance']))
+    return pd.DataFrame({name: frame[column] for name, column in SUMMARY_COLUMNS.items()})
+
+
+def kalman_comparison(df):
+    mean_raw = df['raw_error'].mean()
+    mean_kalman = df['kalman_error'].mean()
+    improvement = mean_raw - mean_kalman
+    return {'mean_raw_error': mean_raw, 'mean_kalman_error': mean_kalman,
+            'improvement': improvement, 'improvement_pct': improvement / mean_raw * 100}
+
+
+def rssi_drift(df, threshold=DRIFT_WARNING):
+    """Mean change of the per-cycle minimum raw RSSI, or None without a cycle column."""
+    if 'cycle' not in df.columns:
+        return None
+    rate = pd.Series(widen(df, ['raw_rssi'])['raw_rssi'], index=df.index).groupby(df['cycle']).min().diff().mean()
+    return {'drift_rate': rate, 'drifting': bool(rate < threshold)}
+
+
+def build_report(df, stats=None):
+    """
+    The full accuracy report of a frame with model errors (add_model_errors). The per-tag
+    tables come from `stats` when given (e.g. accumulators merged over several sessions),
+    the Kalman comparison and drift check from df.
+    """
+    summary = summary_table(accuracy_stats(df) if stats is None else stats)
+    overall = summary['mean_abs_error'].groupby(level='tag', sort=True).mean().rename('overall_mean_abs_error')
+    return {'summary': summary, 'overall': overall,
+            'kalman': kalman_comparison(df), 'drift': rssi_drift(df)}
+
+
+def tag_summary(report, tag):
+    return report['summary'].xs(tag, level='tag')
+
+
+def per_tag(report):
+    """(tag, summary indexed by ref_distance, overall error) for every tag, from one pass over the table."""
+    overall = report['overall']
+    for tag, summary in report['summary'].groupby(level='tag', sort=True):
+        yield tag, summary.droplevel('tag'), overall[tag]
+
+
+# ---------------------------
+# Output
+# ---------------------------
+def _plain(value):
+    if isinstance(value, (np.floating, float)):
+        return None if math.isnan(value) else float(value)
+    if isinstance(value, np.integer):
+        return int(value)
+    if isinstance(value, np.bool_):
+        return bool(value)
+    return value
+
+
+def tag_dict(tag, summary, overall):
+    distances = [{k: _plain(v) for k, v in row.items()} for row in summary.reset_index().to_dict('records')]
+    return {'tag': tag, 'overall_mean_abs_error': _plain(overall), 'distances': distances}
+
+
+def report_to_dict(report):
+    """JSON-ready form of a report: NaN becomes null."""
+    return {
+        'tags': [tag_dict(*item) for item in per_tag(report)],
+        'kalman': {k: _plain(v) for k, v in report['kalman'].items()},
+        'drift': None if report['drift'] is None else {k: _plain(v) for k, v in report['drift'].items()},
+    }
+
+
+def format_tag(tag, summary, overall, full=False):
+    """One tag's section of the report; `full` prints every column instead of the console-width table."""
+    table = summary.round(3)
+    lines = [f"\n📊 {tag} Performance Analysis", "-" * 30, table.to_string() if full else str(table),
+             "\n📏 Distance-wise Error Summary:"]
+    for ref, m, s in zip(summary.index, summary['mean_abs_error'], summary['std_abs_error']):
+        lines.append(f"  📍 {ref}m: Mean Error = {m:.2f}m (±{s:.2f}m)")
+    lines.append(f"\n🎯 Overall Mean Absolute Error: {overall:.2f}m")
+    return "\n".join(lines)
+
+
+def format_report(report):
+    """The report as main.py prints it."""
+    lines = ["\n" + "="*50, "🎯 KEY ACCURACY INSIGHTS", "="*50]
+    for item in per_tag(report):
+        lines.append(format_tag(*item))
+
+    k = report['kalman']
+    lines += ["\n" + "="*50, "🔬 KALMAN FILTER PERFORMANCE", "="*50,
+              f"📈 Raw RSSI Error:      {k['mean_raw_error']:.2f}m",
+              f"📉 Kalman Filter Error: {k['mean_kalman_error']:.2f}m",
+              f"✅ Improvement:         {k['improvement']:.2f}m ({k['improvement_pct']:.1f}% better)"]
+
+    drift = report['drift']
+    if drift is not None:
+        if drift['drifting']:
+            lines += [f"\n⚠️  WARNING: RSSI drifting at {drift['drift_rate']:.2f} dBm/cycle",
+                      "   Possible causes: battery discharge or tag movement"]
+        else:
+            lines.append(f"\n✅ RSSI stability: Good (drift rate: {drift['drift_rate']:.2f} dBm/cycle)")
+    return "\n".join(lines)
+
+
+def print_insights(df, stats=None):
+    print(format_report(build_report(df, stats)))
+
+
+def _safe_name(tag):
+    return "".join(c if c.isalnum() or c in "-_." else "_" for c in str(tag))
+
+
+def _write_tag(job):
+    """Worker: write one tag's report. Runs in a separate process."""
+    tag, summary, overall, path, fmt = job
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        if fmt == 'json':
+            json.dump(tag_dict(tag, summary, overall), f, indent=2)
+        else:
+            f.write(format_tag(tag, summary, overall, full=True).lstrip("\n") + "\n")
+    os.replace(tmp_path, path)
+    return path
+
+
+def write_tag_reports(report, out_dir, fmt='json', workers=None):
+    """One report file per tag under out_dir (json or txt), spread over a process pool. Returns the paths."""
+    os.makedirs(out_dir, exist_ok=True)
+    jobs = [(tag, summary, overall, os.path.join(out_dir, f"{_safe_name(tag)}.{fmt}"), fmt)
+            for tag, summary, overall in per_tag(report)]
+    if workers == 1 or len(jobs) < 2:
+        return [_write_tag(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_write_tag, jobs, chunksize=max(1, len(jobs) // 64)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Accuracy report of the distance estimation test.")
+    parser.add_argument("--data", default="data.csv")
+    parser.add_argument("--stats", help="report the per-tag tables from this accumulator file (see main.py --stats)")
+    parser.add_argument("--json", help="write the whole report as JSON to this file ('-' for stdout)")
+    parser.add_argument("--per-tag", metavar="DIR", help="write one report per tag into DIR")
+    parser.add_argument("--format", choices=["json", "txt"], default="json", help="per-tag report format")
+    parser.add_argument("--workers", type=int, default=None, help="processes writing per-tag reports")
+    args = parser.parse_args()
+
+    df = add_model_errors(load_data(args.data))
+    report = build_report(df, StatsTable.load(args.stats) if args.stats else None)
+    if args.json == '-':
+        print(json.dumps(report_to_dict(report), indent=2))
+    elif args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report_to_dict(report), f, indent=2)
+    if args.per_tag:
+        paths = write_tag_reports(report, args.per_tag, args.format, args.workers)
+        print(f"Wrote {len(paths)} per-tag reports to {args.per_tag}/")
+    if not args.json and not args.per_tag:
+        print(format_report(report))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+# autofit.py
+# Grid / random search for txPower, pathLossExponent and Kalman Q/R against ref_distance.
+#
+# Every candidate is scored by the mean absolute error of the firmware pipeline
+# (Kalman filter -> calculateDistance) over the whole dataset. The filter only depends
+# on (Q, R) and the distance model only on (txPower, n), so a grid is evaluated as:
+# one batched filter pass per chunk of (Q, R) pairs, then every (txPower, n) combination
+# scored against those filtered series in one array expression. Chunks of (Q, R) pairs
+# are spread over a process pool.
+
+import argparse
+import itertools
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from kalman_replay import F32, KALMAN_DEFAULTS, batch_filter, to_series_matrix
+from loaders import read_accuracy, widen
+
+# Reader::$defaultConfig, the block getConfig serves to readers
+DEFAULT_CONFIG = {
+    "txPower": -68,
+    "pathLossExponent": 2.5,
+    "maxDistance": 5.0,
+    "sampleCount": 5,
+    "sampleDelayMs": 100,
+    "kalman": {"P": 1.0, "Q": 0.1, "R": 2.0, "initial": -60.0},
+}
+
+# Upper bound on the (txPower x n x rows) block scored at once, in elements
+MAX_BLOCK = 1 << 22
+
+_data = {}
+
+
+def parse_range(text, log=False):
+    """'start:stop:num' (inclusive, geometric if log) or a comma-separated list of values."""
+    if ':' in text:
+        start, stop, num = text.split(':')
+        space = np.geomspace if log else np.linspace
+        return space(float(start), float(stop), int(num))
+    return np.array([float(v) for v in text.split(',')])
+
+
+def _init_worker(matrix, series_id, position, ref):
+    _data.update(matrix=matrix, series_id=series_id, position=position, ref=ref)
+
+
+def _distance_mae(filtered, ref, tx_power, n):
+    """
+    MAE of calculateDistance(filtered) for every (tx_power[i], n[j]) pair -> (len(tx_power), len(n)).
+    Uses 10^((tx - f)/(10n)) = 10^(tx/(10n)) * 10^(-f/(10n)) so each n costs one pass over the rows.
+    """
+    missing = (filtered == 0) | (filtered < -100)
+    tx_power = np.asarray(tx_power, dtype=np.float64)
+    mae = np.empty((len(tx_power), len(n)))
+    step = max(1, MAX_BLOCK // max(1, len(tx_power)))
+    for j, exponent in enumerate(n):
+        total = np.zeros(len(tx_power))
+        scale = np.power(10.0, tx_power / (10.0 * exponent))[:, None]
+        for start in range(0, len(filtered), step):
+            f = filtered[start:start + step].astype(np.float64)
+            base = np.power(10.0, -f / (10.0 * exponent))
+            distance = np.clip(scale * base, 0.01, 100.0)
+            distance[:, missing[start:start + step]] = -1.0
+            total += np.abs(distance - ref[start:start + step]).sum(axis=1)
+        mae[:, j] = total / len(filtered)
+    return mae
+
+
+def _score_grid_chunk(args):
+    """Worker: score a chunk of (Q, R) pairs against the full (txPower x n) grid."""
+    qr_pairs, tx_power, n = args
+    q, r = np.array(qr_pairs).T
+    filtered = batch_filter(_data["matrix"], q, r, KALMAN_DEFAULTS["P"])[:, _data["series_id"], _data["position"]]
+    rows = []
+    for (qv, rv), f in zip(qr_pairs, filtered):
+        mae = _distance_mae(f, _data["ref"], tx_power, n)
+        for (i, tx), (j, nv) in itertools.product(enumerate(tx_power), enumerate(n)):
+            rows.append((tx, nv, qv, rv, mae[i, j]))
+    return rows
+
+
+def _score_points_chunk(points):
+    """Worker: score independent (txPower, n, Q, R) points, as drawn by random search."""
+    points = np.asarray(points, dtype=np.float64)
+    filtered = batch_filter(_data["matrix"], points[:, 2], points[:, 3], KALMAN_DEFAULTS["P"])[:, _data["series_id"], _data["position"]]
+    return [tuple(p) + (_distance_mae(f, _data["ref"], [p[0]], [p[1]])[0, 0],) for p, f in zip(points, filtered)]
+
+
+def search(df, tx_power, n, q, r, random_points=0, workers=None, seed=0):
+    """
+    Score candidates and return them sorted by MAE as a DataFrame
+    (txPower, pathLossExponent, Q, R, mae). With random_points > 0, that many points are
+    drawn uniformly from the ranges spanned by each axis instead of taking the product grid.
+    """
+    matrix, _, series_id, position = to_series_matrix(df)
+    ref = widen(df, ['ref_distance'])['ref_distance']
+    workers = workers or os.cpu_count()
+
+    if random_points:
+        rng = np.random.default_rng(seed)
+        points = np.column_stack([
+            rng.uniform(min(tx_power), max(tx_power), random_points),
+            rng.uniform(min(n), max(n), random_points),
+            np.exp(rng.uniform(np.log(min(q)), np.log(max(q)), random_points)),
+            np.exp(rng.uniform(np.log(min(r)), np.log(max(r)), random_points)),
+        ])
+        jobs = np.array_split(points, max(1, min(len(points), workers * 4)))
+        task = _score_points_chunk
+    else:
+        qr_pairs = list(itertools.product(q, r))
+        chunks = np.array_split(np.arange(len(qr_pairs)), max(1, min(len(qr_pairs), workers * 4)))
+        jobs = [([qr_pairs[i] for i in idx], tx_power, n) for idx in chunks if len(idx)]
+        task = _score_grid_chunk
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(matrix, series_id, position, ref)) as pool:
+        rows = [row for chunk in pool.map(task, jobs) for row in chunk]
+
+    results = pd.DataFrame(rows, columns=['txPower', 'pathLossExponent', 'Q', 'R', 'mae'])
+    return results.sort_values(['mae', 'txPower', 'pathLossExponent', 'Q', 'R'], kind='stable').reset_index(drop=True)
+
+
+def config_block(best, base=DEFAULT_CONFIG):
+    """Reader config with the fitted values, in the shape getConfig returns under 'config'."""
+    config = json.loads(json.dumps(base))
+    config["txPower"] = round(float(best['txPower']), 2)
+    config["pathLossExponent"] = round(float(best['pathLossExponent']), 3)
+    config["kalman"]["Q"] = round(float(best['Q']), 4)
+    config["kalman"]["R"] = round(float(best['R']), 4)
+    return config
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fit txPower, pathLossExponent and Kalman Q/R to ref_distance.")
+    parser.add_argument("--data", default="data.csv")
+    parser.add_argument("--tx-power", default="-80:-55:26", help="start:stop:num or comma list (dBm)")
+    parser.add_argument("--path-loss", default="1.5:4.0:26", help="start:stop:num or comma list")
+    parser.add_argument("--Q", default="0.01:1:10", help="start:stop:num (log-spaced) or comma list")
+    parser.add_argument("--R", default="0.5:8:10", help="start:stop:num (log-spaced) or comma list")
+    parser.add_argument("--random", type=int, default=0, help="draw this many random points instead of the full grid")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--out", help="write the fitted config block to this JSON file")
+    args = parser.parse_args()
+
+    df = read_accuracy(args.data)
+    tx_power = parse_range(args.tx_power)
+    n = parse_range(args.path_loss)
+    q = parse_range(args.Q, log=True).astype(F32)
+    r = parse_range(args.R, log=True).astype(F32)
+
+    results = search(df, tx_power, n, q, r, args.random, args.workers, args.seed)
+    baseline = search(df, [DEFAULT_CONFIG["txPower"]], [DEFAULT_CONFIG["pathLossExponent"]],
+                      [DEFAULT_CONFIG["kalman"]["Q"]], [DEFAULT_CONFIG["kalman"]["R"]], workers=1)
+
+    print(f"Scored {len(results)} candidates over {len(df)} readings")
+    print(f"Current config MAE: {baseline.loc[0, 'mae']:.3f} m")
+    print(results.head(args.top).round(4).to_string(index=False))
+
+    config = config_block(results.iloc[0])
+    print("\nFitted reader config:")
+    print(json.dumps(config, indent=4))
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(config, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
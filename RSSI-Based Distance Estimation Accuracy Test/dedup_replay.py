@@ -0,0 +1,230 @@
+# dedup_replay.py
+# Offline replay of the ingest de-duplication policy (ReaderController::receiveLocationLogs).
+#
+# For every reported device the controller looks up the latest log of the same
+# (asset, location, status, type) updated within LOG_TIME_WINDOW. Without one, or when
+# rssi / kalman_rssi / estimated_distance moved by more than their threshold, or the
+# reader differs, it inserts a new row; otherwise it overwrites that row's values and
+# updated_at. Either way the latest row of the key ends up holding the event just
+# processed, so each decision only depends on the previous event of the same key. The
+# replay therefore sorts events by (hashed key, event time), pairs each with its
+# predecessor, and scores every threshold combination as array expressions. Input is
+# read in chunks; the last event per key is carried between chunks (and dropped once it
+# is older than the widest window), so memory follows active keys rather than events.
+
+import argparse
+import itertools
+import json
+
+import numpy as np
+import pandas as pd
+
+from autofit import parse_range
+from db_source import is_database, reader_locations
+from loaders import EVENT_SCHEMA, iter_events, iter_logs, widen
+
+# ReaderController constants
+DEFAULT_POLICY = {
+    "window": 300,           # LOG_TIME_WINDOW, seconds
+    "rssi": 10,              # RSSI_THRESHOLD
+    "kalman_rssi": 10,       # KALMAN_RSSI_THRESHOLD
+    "distance": 2,           # DISTANCE_THRESHOLD
+}
+
+# Event stream layout: one row per device per report, in event-time order
+EVENT_COLUMNS = ['time', 'reader_name', 'asset_id', 'type', 'status', 'rssi', 'kalman_rssi', 'estimated_distance']
+VALUES = ['rssi', 'kalman_rssi', 'estimated_distance']
+CHUNK_ROWS = 1_000_000
+
+
+def _hash(*columns):
+    frame = pd.concat([c.astype(str).reset_index(drop=True) for c in columns], axis=1)
+    return pd.util.hash_pandas_object(frame, index=False).to_numpy()
+
+
+def event_seconds(time):
+    if pd.api.types.is_numeric_dtype(time):
+        return time.to_numpy(dtype=np.float64)
+    return ((pd.to_datetime(time, format='ISO8601') - pd.Timestamp(0)) / pd.Timedelta(seconds=1)).to_numpy()
+
+
+def read_events(path, chunk_rows=CHUNK_ROWS):
+    """
+    Yield event chunks from an event-stream CSV (with header), a headerless location_logs
+    export or a database URL (see db_source.py).
+    """
+    has_header = False
+    if not is_database(path):
+        with open(path) as f:
+            has_header = 'reader_name' in f.readline()
+    if has_header:
+        yield from iter_events(path, EVENT_COLUMNS, chunk_rows)
+        return
+    # location_logs rows: created_at is the event time
+    columns = ['created_at' if c == 'time' else c for c in EVENT_COLUMNS]
+    for chunk in iter_logs(path, columns, chunk_rows):
+        yield chunk.rename(columns={'created_at': 'time'})[EVENT_COLUMNS]
+
+
+def prepare(chunk, locations=None):
+    """Hashed keys and float values for one chunk. Readers without a location map are their own location."""
+    location = chunk['reader_name']
+    if locations:
+        location = location.map(locations).fillna(location)
+    return pd.DataFrame({
+        'key': _hash(chunk['asset_id'], location, chunk['status'], chunk['type']),
+        'time': event_seconds(chunk['time']),
+        'reader': _hash(chunk['reader_name']),
+        'asset': _hash(chunk['asset_id']),
+        'location': _hash(location),
+        'present': (chunk['status'] == 'present').to_numpy(),
+        **widen(chunk, VALUES, EVENT_SCHEMA),
+    })
+
+
+def _pair_with_previous(events, by, state, columns):
+    """
+    Sort `events` by (`by`, time) and attach the previous event of the same `by` value as
+    prev_<column> (valid where has_prev), looking it up in `state` (last event per value from
+    earlier chunks, None at the start) for the first event of each value. Returns the paired
+    events and the updated state.
+    """
+    order = np.lexsort((events['time'].to_numpy(), events[by].to_numpy()))
+    events = events.iloc[order].reset_index(drop=True)
+    ids = events[by].to_numpy()
+    first = np.ones(len(ids), dtype=bool)
+    first[1:] = ids[1:] != ids[:-1]
+    if state is None:
+        state = events.iloc[:0][[by] + columns].set_index(by)
+
+    carried = state.index.get_indexer(ids[first])
+    has_prev = ~first
+    has_prev[first] = carried >= 0
+    events['has_prev'] = has_prev
+    for column in columns:
+        values = events[column].to_numpy()
+        prev = np.empty_like(values)
+        prev[1:] = values[:-1]
+        if len(state):
+            prev[first] = state[column].to_numpy()[np.maximum(carried, 0)]
+        if prev.dtype.kind == 'f':
+            prev[~has_prev] = np.nan
+        events['prev_' + column] = prev
+
+    last = np.ones(len(ids), dtype=bool)
+    last[:-1] = ids[:-1] != ids[1:]
+    latest = events.loc[last, [by] + columns].set_index(by)
+    state = pd.concat([state[~state.index.isin(latest.index)], latest])
+    return events, state
+
+
+class DedupReplay:
+    """
+    Scores the insert/update decisions of every (window, rssi, kalman_rssi, distance)
+    threshold combination over an event stream fed chunk by chunk in event-time order.
+    """
+
+    def __init__(self, windows, rssi, kalman_rssi, distance, locations=None):
+        self.windows = np.asarray(windows, dtype=np.float64)
+        self.thresholds = list(itertools.product(rssi, kalman_rssi, distance))
+        self.locations = locations
+        self.key_state = None
+        self.asset_state = None
+        self.inserts = np.zeros((len(self.windows), len(self.thresholds)), dtype=np.int64)
+        self.events = 0
+        self.asset_updates = 0
+        self.first_time = None
+        self.last_time = None
+
+    def feed(self, chunk):
+        events = prepare(chunk, self.locations)
+        if events.empty:
+            return
+        self.events += len(events)
+        self.first_time = events['time'].min() if self.first_time is None else self.first_time
+        self.last_time = events['time'].max()
+
+        paired, self.key_state = _pair_with_previous(events, 'key', self.key_state, ['time', 'reader'] + VALUES)
+        gap = (paired['time'] - paired['prev_time']).to_numpy()
+        reader_changed = (paired['has_prev'] & (paired['reader'] != paired['prev_reader'])).to_numpy()
+        # null on either side skips the comparison, as isset() / !== null do; NaN > t is False
+        diffs = [np.abs(paired[v] - paired['prev_' + v]).to_numpy() for v in VALUES]
+
+        for w, window in enumerate(self.windows):
+            existing = gap <= window
+            self.inserts[w] += np.count_nonzero(~existing)
+            changed = reader_changed[existing]
+            rssi_diff, kalman_diff, distance_diff = (d[existing] for d in diffs)
+            for t, (rssi, kalman, distance) in enumerate(self.thresholds):
+                drastic = changed | (rssi_diff > rssi) | (kalman_diff > kalman) | (distance_diff > distance)
+                self.inserts[w, t] += np.count_nonzero(drastic)
+
+        # Asset::location_id is rewritten when a present device is seen at a new location
+        present = events.loc[events['present'], ['asset', 'time', 'location']]
+        if len(present):
+            paired, self.asset_state = _pair_with_previous(present, 'asset', self.asset_state, ['time', 'location'])
+            self.asset_updates += int(np.count_nonzero(~paired['has_prev'] | (paired['location'] != paired['prev_location'])))
+
+        # Keys idle for longer than every window can never be matched again
+        horizon = self.last_time - self.windows.max()
+        self.key_state = self.key_state[self.key_state['time'] >= horizon]
+
+    def results(self):
+        """One row per threshold combination: inserted rows, in-place updates and write rates."""
+        hours = max((self.last_time - self.first_time) / 3600.0, 1 / 3600.0) if self.events else 1.0
+        rows = []
+        for (w, window), (t, (rssi, kalman, distance)) in itertools.product(enumerate(self.windows),
+                                                                               enumerate(self.thresholds)):
+            inserts = int(self.inserts[w, t])
+            rows.append({
+                'window': window, 'rssi': rssi, 'kalman_rssi': kalman, 'distance': distance,
+                'events': self.events, 'inserts': inserts, 'updates': self.events - inserts,
+                'asset_updates': self.asset_updates,
+                'inserts_per_hour': inserts / hours,
+                'writes_per_s': (self.events + self.asset_updates) / (hours * 3600.0),
+                'reduction_pct': 100.0 * (1 - inserts / self.events) if self.events else 0.0,
+            })
+        return pd.DataFrame(rows)
+
+
+def replay(path, windows=(DEFAULT_POLICY["window"],), rssi=(DEFAULT_POLICY["rssi"],),
+           kalman_rssi=(DEFAULT_POLICY["kalman_rssi"],), distance=(DEFAULT_POLICY["distance"],),
+           locations=None, chunk_rows=CHUNK_ROWS):
+    engine = DedupReplay(windows, rssi, kalman_rssi, distance, locations)
+    for chunk in read_events(path, chunk_rows):
+        engine.feed(chunk)
+    return engine.results()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay the ingest de-duplication policy over an event stream.")
+    parser.add_argument("--data", default="location_logs_export.csv",
+                        help="event CSV (time, reader_name, asset_id, type, status, rssi, kalman_rssi, "
+                             "estimated_distance), a headerless location_logs export or a database URL")
+    parser.add_argument("--window", default=str(DEFAULT_POLICY["window"]), help="seconds; start:stop:num or comma list")
+    parser.add_argument("--rssi", default=str(DEFAULT_POLICY["rssi"]), help="start:stop:num or comma list")
+    parser.add_argument("--kalman-rssi", default=str(DEFAULT_POLICY["kalman_rssi"]), help="start:stop:num or comma list")
+    parser.add_argument("--distance", default=str(DEFAULT_POLICY["distance"]), help="start:stop:num or comma list")
+    parser.add_argument("--locations", help="JSON file mapping reader_name to location (default: the readers table of a "
+                                            "database, else one location per reader)")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--out", help="write the sweep results to this CSV file")
+    args = parser.parse_args()
+
+    locations = None
+    if args.locations:
+        with open(args.locations) as f:
+            locations = json.load(f)
+    elif is_database(args.data):
+        locations = reader_locations(args.data)
+
+    results = replay(args.data, parse_range(args.window), parse_range(args.rssi), parse_range(args.kalman_rssi),
+                     parse_range(args.distance), locations, args.chunk_rows)
+    print(f"Replayed {results['events'].iloc[0]} events, {results['asset_updates'].iloc[0]} asset location updates")
+    print(results.drop(columns=['events', 'asset_updates']).round(2).to_string(index=False))
+    if args.out:
+        results.to_csv(args.out, index=False)
+
+
+if __name__ == "__main__":
+    main()
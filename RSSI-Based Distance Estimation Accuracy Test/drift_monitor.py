@@ -0,0 +1,239 @@
+# drift_monitor.py
+# Streaming per-tag, per-reader RSSI drift detection over location log streams.
+#
+# Every (asset, reader) pair is one series. Its first --warmup readings set a baseline
+# mean and spread; after that, two one-sided CUSUMs of the standardised readings
+#
+#   low_t  = max(0, low_{t-1}  - z_t - k)        high_t = max(0, high_{t-1} + z_t - k)
+#
+# raise an event once either passes h. The recursion is a reflected random walk, so over a
+# chunk it has the closed form S_t = D_t - min(0, min_{s<=t} D_s) with D the running sum
+# started from the carried S: a grouped cumsum and cummin evaluate it for all series at
+# once. After an event the series re-learns its baseline at the new level; rows past an
+# event are fed again, which takes one more pass per event in the same chunk at most.
+#
+# An event records where the excursion started (the last time S was 0) and the mean level
+# it reached. A tag losing power keeps stepping down: a second downward event with no
+# upward one in between, more than --decay-hours after the first began, is reported as
+# battery_decay against the baseline the run started from; anything else is drift. State
+# is a handful of numbers per series, whatever the length of the stream, and readings
+# without a distance (not heard) are skipped.
+#
+# Read from a database, events also name the tag of the asset (assets.tag_id -> tags.name).
+#
+#   python drift_monitor.py --data location_logs_export.csv [--out events.csv]
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from db_source import asset_tags, is_database
+from dedup_replay import event_seconds, read_events
+from loaders import CHUNK_ROWS, EVENT_SCHEMA, encode, widen
+
+WARMUP = 100                 # readings that set the baseline of a series
+K = 0.5                      # CUSUM slack, in baseline standard deviations
+H = 10.0                     # CUSUM decision threshold
+MIN_SIGMA = 1.0              # dB; floor of the baseline spread (readings are logged to 0.1 dB)
+DECAY_HOURS = 2.0
+EVENT_COLUMNS = ['time', 'asset_id', 'reader_name', 'event', 'direction', 'baseline', 'level', 'shift',
+                 'onset', 'hours', 'rate']
+
+# per-series state and its initial value; reset after every event
+STATE = {
+    'n': 0.0, 'sum': 0.0, 'sumsq': 0.0,                  # baseline readings seen so far
+    'low': 0.0, 'low_onset': np.nan, 'low_count': 0.0,   # CUSUM, start time and length of its excursion
+    'high': 0.0, 'high_onset': np.nan, 'high_count': 0.0,
+}
+# run of downward events without an upward one in between: when it started, from which baseline
+TREND = {'steps': 0.0, 'onset': np.nan, 'baseline': np.nan}
+
+
+class DriftDetector:
+    """CUSUM drift and battery-decay detection per (asset, reader), fed chunk by chunk in event-time order."""
+
+    def __init__(self, value='kalman_rssi', warmup=WARMUP, k=K, h=H, min_sigma=MIN_SIGMA, decay_hours=DECAY_HOURS):
+        self.value = value
+        self.warmup, self.k, self.h, self.min_sigma = warmup, k, h, min_sigma
+        self.decay_seconds = decay_hours * 3600.0
+        self.assets, self.readers, self.series = {}, {}, {}
+        self.state = {name: np.empty(0) for name in STATE}
+        self.trend = {name: np.empty(0) for name in TREND}
+        self.readings = 0
+        self.timestamps = False
+
+    def _grow(self):
+        missing = len(self.series) - len(self.state['n'])
+        if missing > 0:
+            for table, initial_values in ((self.state, STATE), (self.trend, TREND)):
+                for name, initial in initial_values.items():
+                    table[name] = np.r_[table[name], np.full(missing, initial)]
+
+    def _reset(self, keys):
+        for name, initial in STATE.items():
+            self.state[name][keys] = initial
+
+    def feed(self, chunk):
+        """Events raised by one chunk, as a DataFrame of EVENT_COLUMNS."""
+        self.timestamps = self.timestamps or pd.api.types.is_datetime64_any_dtype(chunk['time'])
+        v = widen(chunk, [self.value, 'estimated_distance'], EVENT_SCHEMA)
+        seconds = event_seconds(chunk['time'])
+        asset = encode(chunk['asset_id'], self.assets)
+        reader = encode(chunk['reader_name'], self.readers)
+        keep = ((asset >= 0) & (reader >= 0) & np.isfinite(seconds) & np.isfinite(v[self.value])
+                & (v['estimated_distance'] > 0) & (chunk['status'] != 'not_found').to_numpy())
+        self.readings += int(np.count_nonzero(keep))
+        key = encode(pd.Series(asset[keep] << 32 | reader[keep]), self.series)
+        self._grow()
+
+        # series by series, in time order within each
+        order = np.argsort(key, kind='stable')
+        key, t, x = key[order], seconds[keep][order], v[self.value][keep][order]
+        events = []
+        while len(key):
+            key, t, x = self._step(key, t, x, events)
+        if not events:
+            return pd.DataFrame(columns=EVENT_COLUMNS)
+        return self._events(pd.concat(events, ignore_index=True))
+
+    def _step(self, key, t, x, events):
+        """
+        Advance every series over its rows (sorted by series, then time). Events go to
+        `events`; returns the rows after each series' first event, to be fed again.
+        """
+        st = self.state
+        rank = pd.Series(key).groupby(key).cumcount().to_numpy() + st['n'][key]
+        warm = rank < self.warmup
+        n = len(st['n'])
+        st['n'] += np.bincount(key[warm], minlength=n)
+        st['sum'] += np.bincount(key[warm], x[warm], minlength=n)
+        st['sumsq'] += np.bincount(key[warm], x[warm] ** 2, minlength=n)
+
+        key, t, x = key[~warm], t[~warm], x[~warm]
+        if not len(key):
+            return key, t, x
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = st['sum'] / st['n']
+            sigma = np.maximum(np.sqrt(np.maximum(st['sumsq'] / st['n'] - mean ** 2, 0.0)), self.min_sigma)
+        z = (x - mean[key]) / sigma[key]
+
+        pos = np.arange(len(key))
+        first = np.ones(len(key), dtype=bool)
+        first[1:] = key[1:] != key[:-1]
+        seg_start = np.maximum.accumulate(np.where(first, pos, 0))
+
+        sides = {}
+        for side, sign in (('low', -1.0), ('high', 1.0)):
+            d = st[side][key] + pd.Series(sign * z - self.k).groupby(key).cumsum().to_numpy()
+            s = d - np.minimum(0.0, pd.Series(d).groupby(key).cummin().to_numpy())
+            # start and length of the excursion each reading belongs to
+            last_zero = pd.Series(np.where(s == 0.0, pos, -1)).groupby(key).cummax().to_numpy()
+            carried = st[side][key] > 0
+            onset = np.where(last_zero >= 0, t[np.minimum(last_zero + 1, len(t) - 1)],
+                             np.where(carried, st[side + '_onset'][key], t[seg_start]))
+            count = np.where(last_zero >= 0, pos - last_zero,
+                             np.where(carried, st[side + '_count'][key], 0.0) + pos - seg_start + 1)
+            onset[s == 0.0] = np.nan
+            sides[side] = (s, onset, count)
+
+        alarm = (sides['low'][0] > self.h) | (sides['high'][0] > self.h)
+        hit = np.flatnonzero(alarm)
+        firsts = hit[np.r_[True, key[hit][1:] != key[hit][:-1]]] if len(hit) else hit
+        first_event = np.full(n, len(key))
+        first_event[key[firsts]] = firsts
+
+        # carry the CUSUMs of series without an event to the next chunk
+        quiet = np.r_[key[1:] != key[:-1], True] & (first_event[key] == len(key))
+        for side, (s, onset, count) in sides.items():
+            st[side][key[quiet]] = s[quiet]
+            st[side + '_onset'][key[quiet]] = onset[quiet]
+            st[side + '_count'][key[quiet]] = count[quiet]
+        if not len(firsts):
+            return key[:0], t[:0], x[:0]
+
+        low = sides['low'][0][firsts] > self.h
+        s, onset, count = (np.where(low, sides['low'][i][firsts], sides['high'][i][firsts]) for i in range(3))
+        series = key[firsts]
+        # mean reading over the excursion: S = sum(+-z - k) over `count` readings
+        shift = np.where(low, -1.0, 1.0) * sigma[series] * (s / count + self.k)
+        # a tag losing power steps down again and again; abrupt moves step once or go back up
+        tr = self.trend
+        starts = low & (tr['steps'][series] == 0)
+        tr['onset'][series[starts]] = onset[starts]
+        tr['baseline'][series[starts]] = mean[series[starts]]
+        tr['steps'][series] = np.where(low, tr['steps'][series] + 1, 0)
+        decay = low & (tr['steps'][series] >= 2) & (t[firsts] - tr['onset'][series] >= self.decay_seconds)
+        events.append(pd.DataFrame({'series': series, 'time': t[firsts], 'low': low, 'decay': decay,
+                                    'baseline': np.where(decay, tr['baseline'][series], mean[series]),
+                                    'level': mean[series] + shift,
+                                    'onset': np.where(decay, tr['onset'][series], onset)}))
+        self._reset(series)
+        # rows after a series' event start its next baseline
+        again = pos > first_event[key]
+        return key[again], t[again], x[again]
+
+    def _events(self, raw):
+        """Label the raw events of a chunk."""
+        series = np.array(list(self.series), dtype=np.int64)[raw['series'].to_numpy()]
+        assets = np.array(list(self.assets), dtype=object)[series >> 32]
+        readers = np.array(list(self.readers), dtype=object)[series & 0xFFFFFFFF]
+        hours = (raw['time'] - raw['onset']) / 3600.0
+        shift = raw['level'] - raw['baseline']
+        frame = pd.DataFrame({
+            'time': self._time(raw['time']), 'asset_id': assets, 'reader_name': readers,
+            'event': np.where(raw['decay'], 'battery_decay', 'drift'),
+            'direction': np.where(raw['low'], 'down', 'up'),
+            'baseline': raw['baseline'], 'level': raw['level'], 'shift': shift,
+            'onset': self._time(raw['onset']), 'hours': hours,
+            'rate': shift / hours.where(hours > 0),
+        })
+        return frame.sort_values('time', kind='stable').reset_index(drop=True)[EVENT_COLUMNS]
+
+    def _time(self, seconds):
+        return pd.to_datetime(seconds, unit='s') if self.timestamps else seconds
+
+
+def monitor(path, chunk_rows=CHUNK_ROWS, **kwargs):
+    """Yield the events of an event stream or location_logs export chunk by chunk."""
+    detector = DriftDetector(**kwargs)
+    for chunk in read_events(path, chunk_rows):
+        events = detector.feed(chunk)
+        if len(events):
+            yield events
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Streaming CUSUM drift and battery-decay detection per tag and reader.")
+    parser.add_argument("--data", default="location_logs_export.csv",
+                        help="event CSV (see dedup_replay.py), a headerless location_logs export or a database URL")
+    parser.add_argument("--value", choices=["kalman_rssi", "rssi"], default="kalman_rssi")
+    parser.add_argument("--warmup", type=int, default=WARMUP, help="readings that set each series' baseline")
+    parser.add_argument("--k", type=float, default=K, help="CUSUM slack in baseline standard deviations")
+    parser.add_argument("--h", type=float, default=H, help="CUSUM threshold in baseline standard deviations")
+    parser.add_argument("--min-sigma", type=float, default=MIN_SIGMA, help="floor of the baseline spread, dB")
+    parser.add_argument("--decay-hours", type=float, default=DECAY_HOURS,
+                        help="downward shifts building up over longer than this are battery decay")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--out", help="write the events to this CSV file")
+    args = parser.parse_args()
+
+    tags = asset_tags(args.data) if is_database(args.data) else None
+    found = 0
+    header = True
+    for events in monitor(args.data, args.chunk_rows, value=args.value, warmup=args.warmup, k=args.k, h=args.h,
+                          min_sigma=args.min_sigma, decay_hours=args.decay_hours):
+        found += len(events)
+        if tags is not None:
+            events.insert(2, 'tag', [tags.get(int(asset)) for asset in events['asset_id']])
+        if args.out:
+            events.to_csv(args.out, mode='w' if header else 'a', header=header, index=False)
+            header = False
+        else:
+            print(events.to_string(index=False, header=header, float_format='%.2f'))
+            header = False
+    print(f"{found} drift events")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+# ingest_standin.py
+# Local stand-in for the reader ingest API, for throughput testing without the Laravel stack.
+#
+# Serves POST /api/reader-log with the validation rules and response shapes of
+# ReaderController::receiveLocationLogs (400 on validation errors, 201 with one result per
+# device), and GET /api/reader-config with Reader::$defaultConfig. It does not touch a
+# database; it records arrival time, payload size and handling latency per request and can
+# append every accepted device report to an event CSV that dedup_replay.py reads.
+
+import argparse
+import asyncio
+import csv
+import json
+import os
+import time
+
+import numpy as np
+
+from autofit import DEFAULT_CONFIG
+from dedup_replay import EVENT_COLUMNS
+
+DEVICE_TYPES = ('heartbeat', 'alert')
+DEVICE_STATUSES = ('present', 'not_found', 'out_of_range')
+NULLABLE_NUMERIC = ('rssi', 'kalman_rssi', 'estimated_distance')
+PERCENTILES = (50, 90, 99)
+
+REASONS = {200: 'OK', 201: 'Created', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed'}
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _required_string(errors, field, value):
+    if value is None or value == '':
+        errors[field] = [f"The {field} field is required."]
+    elif not isinstance(value, str):
+        errors[field] = [f"The {field} field must be a string."]
+    elif len(value) > 255:
+        errors[field] = [f"The {field} field must not be greater than 255 characters."]
+
+
+def validate(payload):
+    """The receiveLocationLogs validation rules. Returns Laravel-style {field: [messages]}, empty when valid."""
+    errors = {}
+    if not isinstance(payload, dict):
+        return {'reader_name': ["The reader_name field is required."], 'devices': ["The devices field is required."]}
+    _required_string(errors, 'reader_name', payload.get('reader_name'))
+    devices = payload.get('devices')
+    if not devices:
+        errors['devices'] = ["The devices field is required."]
+        return errors
+    if not isinstance(devices, list):
+        errors['devices'] = ["The devices field must be an array."]
+        return errors
+    for i, device in enumerate(devices):
+        prefix = f"devices.{i}."
+        if not isinstance(device, dict):
+            errors[prefix + 'device_name'] = [f"The {prefix}device_name field is required."]
+            continue
+        _required_string(errors, prefix + 'device_name', device.get('device_name'))
+        if device.get('type') not in DEVICE_TYPES:
+            errors[prefix + 'type'] = [f"The selected {prefix}type is invalid."]
+        if device.get('status') not in DEVICE_STATUSES:
+            errors[prefix + 'status'] = [f"The selected {prefix}status is invalid."]
+        for field in NULLABLE_NUMERIC:
+            value = device.get(field)
+            if value is not None and not _is_number(value):
+                errors[prefix + field] = [f"The {prefix}{field} field must be a number."]
+        distance = device.get('estimated_distance')
+        if _is_number(distance) and distance < -1:
+            errors[prefix + 'estimated_distance'] = [f"The {prefix}estimated_distance field must be at least -1."]
+    return errors
+
+
+def summarize(times, sizes, latencies, statuses):
+    """Requests/sec over the arrival span, payload size and latency (ms) percentiles, status counts."""
+    summary = {'requests': len(times), 'statuses': dict(sorted(statuses.items()))}
+    if not times:
+        return summary
+    span = max(times) - min(times)
+    summary['requests_per_s'] = len(times) / span if span > 0 else float(len(times))
+    sizes = np.asarray(sizes, dtype=np.float64)
+    summary['payload_bytes'] = {'mean': sizes.mean(), **{f"p{p}": np.percentile(sizes, p) for p in PERCENTILES},
+                                'max': sizes.max()}
+    latencies = np.asarray(latencies, dtype=np.float64) * 1000.0
+    summary['latency_ms'] = {'mean': latencies.mean(), **{f"p{p}": np.percentile(latencies, p) for p in PERCENTILES},
+                             'max': latencies.max()}
+    return summary
+
+
+def format_summary(summary, title):
+    lines = [title, f"  requests:      {summary['requests']}  {summary['statuses']}"]
+    if summary['requests']:
+        lines.append(f"  requests/s:    {summary['requests_per_s']:.1f}")
+        for name, unit in (('payload_bytes', 'B'), ('latency_ms', 'ms')):
+            stats = summary[name]
+            lines.append(f"  {name.split('_')[0] + ':':<14} " + "  ".join(f"{k} {v:.1f}{unit}" for k, v in stats.items()))
+    return "\n".join(lines)
+
+
+class IngestStandIn:
+    def __init__(self, record=None, delay=0.0):
+        self.delay = delay
+        self.times, self.sizes, self.latencies = [], [], []
+        self.statuses = {}
+        self.devices = 0
+        self._record = None
+        if record:
+            # a restart carries on the same recording; only a new file gets the header
+            new = not os.path.exists(record) or os.path.getsize(record) == 0
+            self._record_file = open(record, 'a', newline='')
+            self._record = csv.writer(self._record_file)
+            if new:
+                self._record.writerow(EVENT_COLUMNS)
+
+    def handle(self, method, path, body):
+        """Route one request. Returns (status, response dict)."""
+        path = path.split('?', 1)[0].rstrip('/')
+        if path == '/api/reader-config':
+            if method != 'GET':
+                return 405, {'message': 'Method not allowed'}
+            return 200, {'discovery_mode': 'pattern', 'config': DEFAULT_CONFIG, 'version': 0}
+        if path != '/api/reader-log':
+            return 404, {'message': 'Not found'}
+        if method != 'POST':
+            return 405, {'message': 'Method not allowed'}
+
+        try:
+            payload = json.loads(body or b'null')
+        except ValueError:
+            payload = None
+        errors = validate(payload)
+        if errors:
+            return 400, {'error': 'Validation failed', 'details': errors}
+
+        now = time.time()
+        self.devices += len(payload['devices'])
+        if self._record is not None:
+            for device in payload['devices']:
+                self._record.writerow([now, payload['reader_name'], device['device_name'], device['type'],
+                                       device['status']] + [device.get(field) for field in NULLABLE_NUMERIC])
+        results = [{'device_name': d['device_name'], 'status': 'success', 'action': 'created'} for d in payload['devices']]
+        return 201, {'results': results}
+
+    async def serve_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                start = time.perf_counter()
+                method, path, _ = request_line.decode('latin-1').split(' ', 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get('content-length', 0)))
+
+                if self.delay:
+                    await asyncio.sleep(self.delay)
+                status, response = self.handle(method, path, body)
+                data = json.dumps(response).encode()
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                writer.write(f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                             f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n"
+                             f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + data)
+                await writer.drain()
+
+                self.times.append(time.time())
+                self.sizes.append(len(body))
+                self.latencies.append(time.perf_counter() - start)
+                self.statuses[status] = self.statuses.get(status, 0) + 1
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host='127.0.0.1', port=8000):
+        return await asyncio.start_server(self.serve_connection, host, port, backlog=4096)
+
+    def summary(self):
+        summary = summarize(self.times, self.sizes, self.latencies, self.statuses)
+        summary['devices'] = self.devices
+        return summary
+
+    def close(self):
+        if self._record is not None:
+            self._record_file.close()
+            self._record = None
+
+
+async def _serve(args):
+    standin = IngestStandIn(args.record, args.delay_ms / 1000.0)
+    server = await standin.start(args.host, args.port)
+    print(f"Ingest stand-in listening on http://{args.host}:{args.port}/api/reader-log")
+    try:
+        async with server:
+            while True:
+                await asyncio.sleep(args.report)
+                if standin.times:
+                    print(format_summary(standin.summary(), f"[{time.strftime('%H:%M:%S')}]"), flush=True)
+    finally:
+        standin.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the reader ingest API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--delay-ms", type=float, default=0.0, help="artificial handling time per request")
+    parser.add_argument("--record", help="append accepted device reports to this event CSV (dedup_replay.py input)")
+    parser.add_argument("--report", type=float, default=10.0, help="seconds between stats printouts")
+    args = parser.parse_args()
+    try:
+        asyncio.run(_serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+# kalman_replay.py
+# Offline replay of the reader's per-device KalmanFilter over raw RSSI.
+#
+# Every (trial, ref_distance, tag) series in data.csv is one filter instance: the test
+# firmware (esp32_debug/reader_rssi_test.ino) resets each tag's filter at the start of a
+# test set. All series are filtered together as one batched recurrence over the time axis,
+# in float32 like the ESP32, so results match the logged kalman_rssi to print precision.
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from loaders import read_accuracy, widen
+
+# Same defaults as Reader::$defaultConfig['kalman'] and the firmware Config struct
+KALMAN_DEFAULTS = {"Q": 0.1, "R": 2.0, "P": 1.0, "initial": -60.0}
+TX_POWER = -68.0
+PATH_LOSS_EXPONENT = 2.5
+
+SERIES_KEYS = ['trial', 'ref_distance', 'tag']
+ORDER_KEY = 'cycle'
+
+F32 = np.float32
+
+
+def to_series_matrix(df, value='raw_rssi', keys=SERIES_KEYS, order=ORDER_KEY):
+    """
+    Scatter a long table into a (n_series, max_len) float32 matrix, NaN-padded on the right.
+    Returns (matrix, lengths, series_id, position) where series_id/position map every row
+    of `df` to its cell, so results can be gathered back in the original row order.
+    """
+    ordered = df.sort_values(keys + [order], kind='stable')
+    series_id = ordered.groupby(keys, sort=False, observed=True).ngroup().to_numpy()
+    position = ordered.groupby(keys, sort=False, observed=True).cumcount().to_numpy()
+    n_series = int(series_id.max()) + 1 if len(ordered) else 0
+    lengths = np.bincount(series_id, minlength=n_series)
+
+    matrix = np.full((n_series, int(lengths.max()) if n_series else 0), np.nan, dtype=F32)
+    matrix[series_id, position] = ordered[value].to_numpy(dtype=F32)
+
+    # Map back to the caller's row order
+    row_order = np.empty(len(ordered), dtype=np.int64)
+    row_order[df.index.get_indexer(ordered.index)] = np.arange(len(ordered))
+    return matrix, lengths, series_id[row_order], position[row_order]
+
+
+def batch_filter(z, Q=KALMAN_DEFAULTS["Q"], R=KALMAN_DEFAULTS["R"], P=KALMAN_DEFAULTS["P"], dt=None):
+    """
+    Run the firmware filter over every row of z (n_series, T) at once.
+
+    Q, R and P may be scalars or 1-D arrays of length G; arrays filter every series
+    under every parameter set and return shape (G, n_series, T). `dt` (seconds between
+    updates, same shape as z) enables the time-scaled process noise Q * (1 + dt) of the
+    production reader; without it this is the fixed-Q filter of the RSSI test firmware.
+    The first sample of a series initialises the state, as in KalmanFilter::update.
+    """
+    z = np.asarray(z, dtype=F32)
+    grid = any(np.ndim(v) for v in (Q, R, P))
+    Q = np.atleast_1d(np.asarray(Q, dtype=F32))[:, None]
+    R = np.atleast_1d(np.asarray(R, dtype=F32))[:, None]
+    P = np.broadcast_to(np.atleast_1d(np.asarray(P, dtype=F32))[:, None], np.broadcast_shapes(Q.shape, R.shape)).copy()
+    one = F32(1.0)
+
+    n_series, T = z.shape
+    out = np.empty((P.shape[0], n_series, T), dtype=F32)
+    if T == 0:
+        return out if grid else out[0]
+
+    x = np.broadcast_to(z[:, 0], (P.shape[0], n_series)).copy()
+    out[:, :, 0] = x
+    if dt is None:
+        # Without dt the gain schedule does not depend on the data: compute it once per parameter set
+        gains = np.empty((P.shape[0], T), dtype=F32)
+        for t in range(1, T):
+            P = P + Q
+            K = P / (P + R)
+            P = (one - K) * P
+            gains[:, t] = K[:, 0]
+        for t in range(1, T):
+            x = x + gains[:, t, None] * (z[:, t] - x)
+            out[:, :, t] = x
+    else:
+        dt = np.asarray(dt, dtype=F32)
+        P = np.broadcast_to(P, (P.shape[0], n_series)).copy()
+        for t in range(1, T):
+            P = P + Q * (one + dt[:, t])
+            K = P / (P + R)
+            x = x + K * (z[:, t] - x)
+            P = (one - K) * P
+            out[:, :, t] = x
+    return out if grid else out[0]
+
+
+def calculate_distance(rssi, tx_power=TX_POWER, n=PATH_LOSS_EXPONENT):
+    """Vectorised calculateDistance(): -1 for missing readings, otherwise clamped to [0.01, 100] m."""
+    rssi = np.asarray(rssi, dtype=F32)
+    distance = np.power(F32(10.0), (F32(tx_power) - rssi) / (F32(10.0) * F32(n)))
+    distance = np.clip(distance, F32(0.01), F32(100.0))
+    return np.where((rssi == 0) | (rssi < -100), F32(-1.0), distance)
+
+
+def replay(df, Q=KALMAN_DEFAULTS["Q"], R=KALMAN_DEFAULTS["R"], P=KALMAN_DEFAULTS["P"],
+           tx_power=TX_POWER, n=PATH_LOSS_EXPONENT, value='raw_rssi'):
+    """Re-filter `value` under the given parameters. Returns a frame of kalman_rssi/estimated_distance aligned with df."""
+    matrix, _, series_id, position = to_series_matrix(df, value)
+    filtered = batch_filter(matrix, Q, R, P)[series_id, position]
+    return pd.DataFrame({
+        'kalman_rssi': filtered,
+        'estimated_distance': calculate_distance(filtered, tx_power, n),
+    }, index=df.index)
+
+
+def verify(df, **params):
+    """Compare a replay under the firmware defaults with the logged values, at the firmware's print precision."""
+    replayed = replay(df, **params)
+    logged = widen(df, ['kalman_rssi', 'estimated_distance'])
+    kalman_diff = np.abs(np.round(replayed['kalman_rssi'].astype(float), 1) - logged['kalman_rssi'])
+    distance_diff = np.abs(np.round(replayed['estimated_distance'].astype(float), 2) - logged['estimated_distance'])
+    return {
+        'rows': len(df),
+        'max_kalman_diff': float(kalman_diff.max()),
+        'max_distance_diff': float(distance_diff.max()),
+        # Logged values are %.1f / %.2f, so anything within half a unit of the last digit is a match
+        'kalman_mismatches': int((kalman_diff > 0.05 + 1e-6).sum()),
+        'distance_mismatches': int((distance_diff > 0.005 + 1e-6).sum()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay the firmware Kalman filter over raw RSSI in data.csv.")
+    parser.add_argument("--data", default="data.csv")
+    parser.add_argument("--Q", type=float, default=KALMAN_DEFAULTS["Q"])
+    parser.add_argument("--R", type=float, default=KALMAN_DEFAULTS["R"])
+    parser.add_argument("--P", type=float, default=KALMAN_DEFAULTS["P"])
+    parser.add_argument("--tx-power", type=float, default=TX_POWER)
+    parser.add_argument("--path-loss", type=float, default=PATH_LOSS_EXPONENT)
+    parser.add_argument("--out", help="write the re-filtered table to this CSV")
+    args = parser.parse_args()
+
+    df = read_accuracy(args.data)
+    params = dict(Q=args.Q, R=args.R, P=args.P, tx_power=args.tx_power, n=args.path_loss)
+
+    if args.out:
+        replayed = replay(df, **params)
+        out = df.copy()
+        out['kalman_rssi'] = replayed['kalman_rssi'].round(1)
+        out['estimated_distance'] = replayed['estimated_distance'].round(2)
+        out.to_csv(args.out, index=False)
+        print(f"Re-filtered {len(out)} readings -> {args.out}")
+    else:
+        report = verify(df, **params)
+        print(f"Replayed {report['rows']} readings against logged values")
+        print(f"  kalman_rssi:        max diff {report['max_kalman_diff']:.3f} dBm, {report['kalman_mismatches']} mismatches")
+        print(f"  estimated_distance: max diff {report['max_distance_diff']:.3f} m, {report['distance_mismatches']} mismatches")
+
+
+if __name__ == "__main__":
+    main()
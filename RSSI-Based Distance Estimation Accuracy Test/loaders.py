@@ -0,0 +1,147 @@
+# loaders.py
+# Typed loaders for the accuracy test data and the location_logs exports.
+#
+# Every column has an explicit schema entry: repeated strings (tags, reader names, types,
+# statuses) load as categoricals, RSSI and distances as float32, counters as narrow ints,
+# so a frame takes a fraction of what pandas' default int64/float64/object columns need.
+# The logged values are printed with 1 or 2 decimals; `decimals` records that, and widen()
+# turns float32 columns back into exactly the float64 values the CSV holds, for sums and
+# threshold comparisons that must not drift. Timestamps of the export are parsed through a
+# cache of distinct strings: every log of one report shares created_at, so a chunk holds
+# far fewer distinct timestamps than rows.
+
+import numpy as np
+import pandas as pd
+
+CHUNK_ROWS = 1_000_000
+
+# data.csv written by the RSSI test firmware (esp32_debug/reader_rssi_test.ino)
+ACCURACY_SCHEMA = {
+    "trial": {"dtype": "int16"},
+    "ref_distance": {"dtype": "float32", "decimals": 2},
+    "cycle": {"dtype": "int16"},
+    "tag": {"dtype": "category"},
+    "raw_rssi": {"dtype": "float32", "decimals": 1},
+    "kalman_rssi": {"dtype": "float32", "decimals": 1},
+    "estimated_distance": {"dtype": "float32", "decimals": 2},
+}
+
+# Headerless location_logs export, in table column order
+LOG_SCHEMA = {
+    "id": {"dtype": "int64"},
+    "asset_id": {"dtype": "int32"},
+    "location_id": {"dtype": "Int32"},     # nullable
+    "rssi": {"dtype": "float32", "decimals": 1},
+    "kalman_rssi": {"dtype": "float32", "decimals": 1},
+    "estimated_distance": {"dtype": "float32", "decimals": 2},
+    "type": {"dtype": "category"},
+    "status": {"dtype": "category"},
+    "reader_name": {"dtype": "category"},
+    "created_at": {"dtype": "timestamp"},
+    "updated_at": {"dtype": "timestamp"},
+}
+LOG_COLUMNS = list(LOG_SCHEMA)
+
+# Event stream recorded by ingest_standin.py (asset_id is the device name); time is left to
+# pandas, as epoch seconds or timestamps
+EVENT_SCHEMA = {
+    "reader_name": {"dtype": "category"},
+    "asset_id": {"dtype": "category"},
+    "type": {"dtype": "category"},
+    "status": {"dtype": "category"},
+    "rssi": {"dtype": "float32", "decimals": 1},
+    "kalman_rssi": {"dtype": "float32", "decimals": 1},
+    "estimated_distance": {"dtype": "float32", "decimals": 2},
+}
+
+SCHEMAS = {"accuracy": ACCURACY_SCHEMA, "logs": LOG_SCHEMA, "events": EVENT_SCHEMA}
+
+
+def csv_dtypes(schema, columns=None):
+    """read_csv dtype mapping for `columns` (all by default); timestamps are read as strings and parsed afterwards."""
+    names = schema if columns is None else columns
+    return {name: "str" if schema[name]["dtype"] == "timestamp" else schema[name]["dtype"]
+            for name in names if name in schema}
+
+
+def parse_timestamps(frame, columns):
+    """Parse the timestamp `columns` of a frame in place; each distinct string is converted once."""
+    for column in columns:
+        if column in frame.columns:
+            frame[column] = pd.to_datetime(frame[column], format='ISO8601', cache=True)
+    return frame
+
+
+def _typed(frame, schema):
+    return parse_timestamps(frame, [c for c, spec in schema.items() if spec["dtype"] == "timestamp"])
+
+
+def read_accuracy(path="data.csv", columns=None):
+    """data.csv with narrow dtypes; `columns` limits what is read."""
+    return pd.read_csv(path, usecols=columns, dtype=csv_dtypes(ACCURACY_SCHEMA, columns))
+
+
+def iter_logs(path, columns=None, chunk_rows=CHUNK_ROWS, after_id=None, updated_since=None):
+    """
+    Yield a headerless location_logs export, or the asset_location_logs table of a database
+    URL (see db_source.py), as typed chunks of at most `chunk_rows` rows. A database only
+    returns rows with an id above `after_id` or updated at or after `updated_since`; an
+    export is always read whole.
+    """
+    from db_source import is_database, iter_log_rows
+    if is_database(path):
+        yield from iter_log_rows(path, columns, chunk_rows, after_id, updated_since)
+        return
+    reader = pd.read_csv(path, header=None, names=LOG_COLUMNS, usecols=columns, na_values=['NULL'],
+                         dtype=csv_dtypes(LOG_SCHEMA, columns), chunksize=chunk_rows)
+    for chunk in reader:
+        yield _typed(chunk, LOG_SCHEMA)
+
+
+def concat_chunks(chunks):
+    """Concatenate typed chunks, unioning per-chunk categories so categorical columns stay categorical."""
+    chunks = list(chunks)
+    if len(chunks) == 1:
+        return chunks[0]
+    for name in chunks[0].columns:
+        if isinstance(chunks[0][name].dtype, pd.CategoricalDtype):
+            categories = pd.api.types.union_categoricals([c[name] for c in chunks]).categories
+            for c in chunks:
+                c[name] = c[name].cat.set_categories(categories)
+    return pd.concat(chunks, ignore_index=True)
+
+
+def read_logs(path, columns=None, chunk_rows=CHUNK_ROWS):
+    return concat_chunks(iter_logs(path, columns, chunk_rows))
+
+
+def iter_events(path, columns=None, chunk_rows=CHUNK_ROWS):
+    """Yield an event-stream CSV (with header) as typed chunks."""
+    yield from pd.read_csv(path, usecols=columns, na_values=['NULL'],
+                           dtype=csv_dtypes(EVENT_SCHEMA, columns), chunksize=chunk_rows)
+
+
+def encode(values, table):
+    """
+    Integer codes of a column's values in `table` (value -> code), which grows with values it
+    has not seen, so codes stay stable across chunks; -1 for missing values.
+    """
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        inverse, uniques = values.cat.codes.to_numpy(), values.cat.categories
+    else:
+        inverse, uniques = pd.factorize(values)
+    lookup = np.array([table.setdefault(u, len(table)) for u in uniques.tolist()] + [-1], dtype=np.int64)
+    return lookup[inverse]
+
+
+def widen(frame, columns, schema=ACCURACY_SCHEMA):
+    """
+    float64 copies of float32 columns, rounded back to the decimals the CSV was written
+    with (float32 1.32 is 1.3200000524...), keyed by column name.
+    """
+    out = {}
+    for name in columns:
+        values = frame[name].to_numpy(dtype=np.float64)
+        decimals = schema.get(name, {}).get("decimals")
+        out[name] = np.round(values, decimals) if decimals is not None and frame[name].dtype == np.float32 else values
+    return out
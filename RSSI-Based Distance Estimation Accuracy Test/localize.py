@@ -0,0 +1,249 @@
+# localize.py
+# Per-asset location track fused from every reader's observations.
+#
+# Logs are bucketed into fixed time windows and reduced chunk by chunk to one row per
+# (asset, window, reader) with the mean kalman_rssi and estimated_distance, so memory
+# follows assets x readers x windows rather than the number of logs. Two fusions then run
+# on that table as array operations over all assets at once:
+#
+#   nearest        the strongest reader of each window, with hysteresis: an asset only moves
+#                  to another reader when that one beats the current reader by --margin dB,
+#                  or when the current reader no longer hears it. One vectorised step per
+#                  window, across every asset seen in it.
+#   trilateration  weighted least squares of the reader positions (--positions) against
+#                  the estimated distances, weighted by 1/d^2 since the estimate degrades
+#                  with distance. Gauss-Newton runs on every (asset, window) together; the
+#                  2x2 normal equations are accumulated per window with bincount.
+#
+# Readings without a distance (estimated_distance -1, not_found) are not observations.
+#
+#   python localize.py --data location_logs_export.csv --window 30 --locations locations.json --out track.csv
+#   python localize.py --mode trilateration --positions readers.json --out track.csv
+
+import argparse
+import json
+
+import numpy as np
+import pandas as pd
+
+from db_source import is_database, reader_locations
+from dedup_replay import event_seconds, read_events
+from loaders import CHUNK_ROWS, EVENT_SCHEMA, encode, widen
+
+DEFAULT_WINDOW = 30          # seconds, one reader scan interval
+DEFAULT_MARGIN = 6.0         # dB a new reader must win by before the asset moves
+MIN_DISTANCE = 0.5           # metres; floor of the 1/d^2 weights
+GAUSS_NEWTON_STEPS = 10
+VALUES = ['kalman_rssi', 'estimated_distance']
+
+
+class Observations:
+    """Mean kalman_rssi and estimated_distance per (asset, window, reader), accumulated over chunks."""
+
+    def __init__(self, window=DEFAULT_WINDOW):
+        self.window = float(window)
+        self.assets = {}
+        self.readers = {}
+        self.parts = []
+        self.logs = 0
+        self.timestamps = False
+
+    def feed(self, chunk):
+        self.timestamps = self.timestamps or pd.api.types.is_datetime64_any_dtype(chunk['time'])
+        seconds = event_seconds(chunk['time'])
+        v = widen(chunk, VALUES, EVENT_SCHEMA)
+        asset = encode(chunk['asset_id'], self.assets)
+        reader = encode(chunk['reader_name'], self.readers)
+        keep = ((asset >= 0) & (reader >= 0) & np.isfinite(seconds) & np.isfinite(v['kalman_rssi'])
+                & (v['estimated_distance'] > 0) & (chunk['status'] != 'not_found').to_numpy())
+        self.logs += int(np.count_nonzero(keep))
+        part = pd.DataFrame({
+            'window': np.floor(seconds[keep] / self.window).astype(np.int64),
+            'asset': asset[keep], 'reader': reader[keep],
+            'rssi': v['kalman_rssi'][keep], 'distance': v['estimated_distance'][keep],
+        })
+        self.parts.append(part.groupby(['window', 'asset', 'reader'], sort=False)
+                          .agg(rssi=('rssi', 'sum'), distance=('distance', 'sum'), count=('rssi', 'size')))
+
+    def table(self):
+        """One row per (window, asset, reader), sorted by window, asset and strongest reader first."""
+        columns = ['window', 'asset', 'reader', 'rssi', 'distance', 'count']
+        if not self.parts:
+            return pd.DataFrame(columns=columns)
+        sums = pd.concat(self.parts).groupby(level=['window', 'asset', 'reader'], sort=False).sum()
+        self.parts = [sums]
+        table = sums.reset_index()
+        table['rssi'] /= table['count']
+        table['distance'] /= table['count']
+        order = np.lexsort((-table['rssi'].to_numpy(), table['asset'].to_numpy(), table['window'].to_numpy()))
+        return table.iloc[order].reset_index(drop=True)[columns]
+
+    def labels(self):
+        """Asset and reader values by code."""
+        return {name: np.array(list(codes), dtype=object) for name, codes in
+                (('asset', self.assets), ('reader', self.readers))}
+
+    def window_start(self, window):
+        seconds = window * self.window
+        return pd.to_datetime(seconds, unit='s') if self.timestamps else seconds
+
+
+def _groups(table):
+    """Row index of the first (strongest) row of every (window, asset) and the group id of each row."""
+    window, asset = table['window'].to_numpy(), table['asset'].to_numpy()
+    first = np.ones(len(table), dtype=bool)
+    first[1:] = (window[1:] != window[:-1]) | (asset[1:] != asset[:-1])
+    return np.flatnonzero(first), np.cumsum(first) - 1
+
+
+def nearest(table, n_assets, margin=DEFAULT_MARGIN):
+    """
+    Reader code and its kalman_rssi held by each (window, asset) group of `table`, in group
+    order. Windows are stepped in time order; within a window every asset is updated at once.
+    """
+    heads, group = _groups(table)
+    window, asset = table['window'].to_numpy(), table['asset'].to_numpy()
+    reader, rssi = table['reader'].to_numpy(), table['rssi'].to_numpy()
+    current = np.full(n_assets, -1, dtype=np.int64)
+    held = np.empty(len(heads), dtype=np.int64)
+    held_rssi = np.empty(len(heads))
+
+    bounds = np.flatnonzero(np.r_[True, window[1:] != window[:-1], True])
+    for start, stop in zip(bounds[:-1], bounds[1:]):
+        lo, hi = group[start], group[stop - 1] + 1
+        rows = slice(start, stop)
+        # the current reader's level in this window, -inf where it did not hear the asset
+        on_current = reader[rows] == current[asset[rows]]
+        current_rssi = np.full(hi - lo, -np.inf)
+        current_rssi[group[rows][on_current] - lo] = rssi[rows][on_current]
+
+        best = heads[lo:hi]
+        switch = rssi[best] - current_rssi >= margin
+        current[asset[best[switch]]] = reader[best[switch]]
+        held[lo:hi] = current[asset[best]]
+        held_rssi[lo:hi] = np.where(switch, rssi[best], current_rssi)
+    return held, held_rssi
+
+
+def trilaterate(table, positions, steps=GAUSS_NEWTON_STEPS):
+    """
+    (x, y, readers, residual) of every (window, asset) group of `table` heard by a reader of
+    known position (`positions`: reader code -> (x, y), NaN when unknown), in group order.
+    Returns the kept groups' head rows too. residual is the weighted RMS of |p - reader| - d.
+    """
+    codes = table['reader'].to_numpy()
+    px, py = positions[codes, 0], positions[codes, 1]
+    known = np.isfinite(px) & np.isfinite(py)
+    table, px, py = table[known], px[known], py[known]
+    heads, group = _groups(table)
+    n = len(heads)
+    d = table['distance'].to_numpy()
+    w = table['count'].to_numpy() / np.maximum(d, MIN_DISTANCE) ** 2
+    sw = np.bincount(group, w, n)
+
+    # weighted centroid of the readers, then Gauss-Newton on sum w (|p - r| - d)^2
+    x = np.bincount(group, w * px, n) / sw
+    y = np.bincount(group, w * py, n) / sw
+    for _ in range(steps):
+        dx, dy = x[group] - px, y[group] - py
+        r = np.maximum(np.hypot(dx, dy), 1e-9)
+        jx, jy, res = dx / r, dy / r, r - d
+        a11 = np.bincount(group, w * jx * jx, n)
+        a12 = np.bincount(group, w * jx * jy, n)
+        a22 = np.bincount(group, w * jy * jy, n)
+        b1 = np.bincount(group, w * jx * res, n)
+        b2 = np.bincount(group, w * jy * res, n)
+        # Levenberg damping keeps one- and two-reader groups (rank-deficient) in place
+        damping = 1e-3 * (a11 + a22) + 1e-12
+        a11, a22 = a11 + damping, a22 + damping
+        det = a11 * a22 - a12 * a12
+        x -= (a22 * b1 - a12 * b2) / det
+        y -= (a11 * b2 - a12 * b1) / det
+
+    res = np.hypot(x[group] - px, y[group] - py) - d
+    residual = np.sqrt(np.bincount(group, w * res * res, n) / sw)
+    readers = np.bincount(group, minlength=n)
+    return table.index.to_numpy()[heads], x, y, readers, residual
+
+
+def track(path, window=DEFAULT_WINDOW, mode='nearest', margin=DEFAULT_MARGIN, locations=None, positions=None,
+          chunk_rows=CHUNK_ROWS):
+    """
+    Location track of every asset: one row per (asset, window) the asset was heard in,
+    sorted by asset and time. `locations` maps reader names to locations for the nearest
+    mode; `positions` maps reader names to (x, y) metres and is required for trilateration.
+    """
+    obs = Observations(window)
+    for chunk in read_events(path, chunk_rows):
+        obs.feed(chunk)
+    table = obs.table()
+    labels = obs.labels()
+
+    if mode == 'trilateration':
+        if not positions:
+            raise ValueError("trilateration needs reader positions")
+        xy = np.full((len(obs.readers), 2), np.nan)
+        for name, code in obs.readers.items():
+            if name in positions:
+                xy[code] = positions[name]
+        heads, x, y, readers, residual = trilaterate(table, xy)
+        frame = pd.DataFrame({'x': x, 'y': y, 'readers': readers, 'residual': residual})
+    else:
+        heads, _ = _groups(table)
+        held, held_rssi = nearest(table, len(obs.assets), margin)
+        names = labels['reader'][held]
+        frame = pd.DataFrame({'reader_name': names, 'kalman_rssi': held_rssi,
+                              'readers': np.diff(np.r_[heads, len(table)])})
+        if locations:
+            frame.insert(1, 'location', [locations.get(name, name) for name in names])
+    heads_table = table.iloc[heads] if len(table) else table
+    frame.insert(0, 'asset_id', labels['asset'][heads_table['asset'].to_numpy(dtype=np.int64)])
+    frame.insert(1, 'window_start', obs.window_start(heads_table['window'].to_numpy(dtype=np.int64)))
+
+    order = np.lexsort((heads_table['window'].to_numpy(), heads_table['asset'].to_numpy()))
+    return frame.iloc[order].reset_index(drop=True), obs.logs
+
+
+def _load_json(path):
+    if not path:
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fuse reader observations into a per-asset location track.")
+    parser.add_argument("--data", default="location_logs_export.csv",
+                        help="event CSV (see dedup_replay.py), a headerless location_logs export or a database URL")
+    parser.add_argument("--window", type=float, default=DEFAULT_WINDOW, help="seconds per time window")
+    parser.add_argument("--mode", choices=["nearest", "trilateration"], default="nearest")
+    parser.add_argument("--margin", type=float, default=DEFAULT_MARGIN,
+                        help="dB a reader must beat the current one by to take the asset over")
+    parser.add_argument("--locations", help="JSON file mapping reader_name to location (nearest mode; default: the "
+                                            "readers table of a database)")
+    parser.add_argument("--positions", help="JSON file mapping reader_name to [x, y] in metres (trilateration)")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--out", help="write the track to this CSV file")
+    args = parser.parse_args()
+    if args.mode == 'trilateration' and not args.positions:
+        parser.error("--mode trilateration needs --positions")
+
+    locations = _load_json(args.locations)
+    if locations is None and is_database(args.data):
+        locations = reader_locations(args.data)
+    frame, logs = track(args.data, args.window, args.mode, args.margin, locations,
+                        _load_json(args.positions), args.chunk_rows)
+    print(f"Fused {logs} observations into {len(frame)} (asset, window) positions "
+          f"for {frame['asset_id'].nunique()} assets")
+    if args.mode == 'nearest' and len(frame):
+        place = frame['location'] if 'location' in frame.columns else frame['reader_name']
+        moves = (frame['asset_id'].eq(frame['asset_id'].shift()) & place.ne(place.shift())).sum()
+        print(f"{moves} location changes")
+    if args.out:
+        frame.to_csv(args.out, index=False)
+    else:
+        print(frame.to_string(index=False, float_format='%.2f'))
+
+
+if __name__ == "__main__":
+    main()
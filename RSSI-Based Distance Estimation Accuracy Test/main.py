@@ -1,12 +1,21 @@
+import argparse
+import os
+import sys
+
 import pandas as pd
 import matplotlib.pyplot as plt
 import numpy as np
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "shared"))
+
+from accuracy_report import accuracy_stats, add_model_errors, load_data, print_insights, summary_table
+from downsample import line, pixel_size
+from loaders import widen
+from plotting import OUTPUT, add_arguments, configure, finish, render_all
+from running_stats import StatsTable
+
 # Style and color
-plt.style.use('seaborn-v0_8-whitegrid')
-plt.rcParams['figure.facecolor'] = 'white'
-plt.rcParams['axes.facecolor'] = 'white'
-plt.rcParams.update({
+STYLE_RC = {
     'font.size': 20,                 # Medium base font
     'axes.labelsize': 23,
     'axes.titlesize': 28,
@@ -16,7 +25,7 @@ plt.rcParams.update({
     'legend.title_fontsize': 22,
     'lines.linewidth': 2.6,           # Medium-thick lines
     'lines.markersize': 9             # Medium markers
-})
+}
 
 RAW_COLOR = '#0080ff'
 RAW_MAX = '#003366'
@@ -25,26 +34,40 @@ KALMAN_COLOR = '#e74c3c'
 KALMAN_MAX = '#800000'
 KALMAN_MIN = '#ffb3b3'
 first_plot_colors = ['#B7950B', '#196F3D', '#3498db', '#e67e22', '#8e44ad', '#e74c3c']
+SAMPLES_PER_TRIAL = 10
+
+# Above this many tags, one line (and one figure) per tag stops being readable: the
+# small-multiples layout draws the fleet distribution per reference distance, a tag x
+# distance error heatmap, and pages of PAGE_ROWS x PAGE_COLS per-tag panels instead.
+MAX_TAG_LINES = 12
+PAGE_ROWS, PAGE_COLS = 5, 5
+FLEET_PERCENTILES = (10, 25, 50, 75, 90)
+
+
+def tag_colors(n):
+    """n distinct colors: the original palette first, then evenly spaced hues."""
+    if n <= len(first_plot_colors):
+        return first_plot_colors[:n]
+    hues = plt.get_cmap('hsv')(np.linspace(0, 1, n - len(first_plot_colors), endpoint=False))
+    return first_plot_colors + [tuple(c) for c in hues]
 
-df = pd.read_csv('data.csv')
-df['ref_distance'] = df['ref_distance'].astype(float)
-df['estimated_distance'] = df['estimated_distance'].astype(float)
-df['raw_rssi'] = df['raw_rssi'].astype(float)
-df['kalman_rssi'] = df['kalman_rssi'].astype(float)
 
-tags = df['tag'].unique()
-ref_distances = sorted(df['ref_distance'].unique())
+def first_trials(tag_df):
+    """The first SAMPLES_PER_TRIAL rows of each reference distance, in distance order."""
+    return tag_df.sort_values('ref_distance', kind='stable').groupby('ref_distance', sort=False).head(SAMPLES_PER_TRIAL)
+
 
 # 1. Estimated Distance at Each Reference Distance
-for ref in ref_distances:
+def plot_estimated_distance(ref, ref_df, tags):
     plt.figure(figsize=(11, 7))
     plt.axhline(ref, color='black', linestyle='--', linewidth=2.2,
                 label=f'Distance: {ref} m', alpha=0.8, zorder=1)
-    for i, tag in enumerate(tags):
-        vals = df[(df['ref_distance'] == ref) & (df['tag'] == tag)]['estimated_distance'].values
+    by_tag = {tag: widen(group, ['estimated_distance'])['estimated_distance'] for tag, group in ref_df.groupby('tag', sort=False)}
+    for tag, color in zip(tags, tag_colors(len(tags))):
+        vals = by_tag.get(tag, np.empty(0))
         plt.plot(range(1, len(vals)+1), vals,
                  marker='o', markersize=9, linewidth=2.4,
-                 color=first_plot_colors[i % len(first_plot_colors)],
+                 color=color,
                  label=f'{tag}', alpha=0.85, zorder=2,
                  markerfacecolor='white', markeredgewidth=1.5)
     plt.xlabel('Sample Index', fontsize=22, fontweight='bold')
@@ -56,34 +79,36 @@ for ref in ref_distances:
     plt.legend(frameon=True, fancybox=True, shadow=True, fontsize=23, loc='best', borderpad=1)
     plt.grid(alpha=0.35, linestyle='-', linewidth=1.1)
     plt.tight_layout()
-    plt.show()
+    return finish(f'estimated_distance_{ref:g}m.png', save=False)
+
 
 # 2. RSSI vs Sample Index (Raw & Kalman, each tag separate figure, first trial of each distance)
-SAMPLES_PER_TRIAL = 10
-for tag in tags:
-    plt.figure(figsize=(13, 7))
-    tag_data = []
-    tag_kalman = []
-    for ref in ref_distances:
-        sub = df[(df['ref_distance'] == ref) & (df['tag'] == tag)].head(SAMPLES_PER_TRIAL)
-        tag_data.extend(sub['raw_rssi'].values)
-        tag_kalman.extend(sub['kalman_rssi'].values)
+def plot_rssi_series(tag, tag_df, ref_distances):
+    fig = plt.figure(figsize=(13, 7))
+    width, _ = pixel_size(fig, OUTPUT["dpi"])
+    sub = first_trials(tag_df[tag_df['ref_distance'].isin(ref_distances)])
+    values = widen(sub, ['raw_rssi', 'kalman_rssi'])
+    tag_data = values['raw_rssi']
+    tag_kalman = values['kalman_rssi']
     x = np.arange(1, len(tag_data)+1)
     kalman_smooth = pd.Series(tag_kalman).rolling(window=7, center=True, min_periods=1).mean()
-    plt.plot(x, tag_data, color=RAW_COLOR, linewidth=2.6, label='Raw RSSI')
-    plt.plot(x, kalman_smooth, color=KALMAN_COLOR, linewidth=3.2, linestyle='--', label='Kalman Filtered RSSI')
+    # long series are reduced to what the output pixels can show
+    plt.plot(*line(x, tag_data, width), color=RAW_COLOR, linewidth=2.6, label='Raw RSSI')
+    plt.plot(*line(x, kalman_smooth, width, method='lttb'), color=KALMAN_COLOR, linewidth=3.2, linestyle='--',
+             label='Kalman Filtered RSSI')
     plt.xlabel('Sample Index 10 of Each Distance', fontsize=22, fontweight='bold')
     plt.ylabel('RSSI (dBm)', fontsize=22, fontweight='bold')
     # plt.title(f'RSSI Signal (Raw vs Kalman) - {tag}', fontsize=28, fontweight='bold', pad=20)
     plt.grid(alpha=0.35, linestyle='-', linewidth=1.1)
     plt.legend(loc='upper right', frameon=True, fancybox=True, shadow=True, fontsize=23, borderpad=1)
     plt.tight_layout()
-    plt.show()
+    return finish(f'rssi_raw_vs_kalman_{tag}.png', save=False)
+
 
 # 3. Min/Mean/Max RSSI per Reference Distance (Raw & Kalman, vertical lines & average lines)
-for tag in tags:
+def plot_rssi_range(tag, sub):
     plt.figure(figsize=(13, 8))
-    sub = df[df['tag'] == tag]
+    sub = pd.DataFrame(widen(sub, ['ref_distance', 'raw_rssi', 'kalman_rssi']))
     g_raw = sub.groupby('ref_distance')['raw_rssi'].agg(['min', 'mean', 'max'])
     g_kal = sub.groupby('ref_distance')['kalman_rssi'].agg(['min', 'mean', 'max'])
     x = np.array(g_raw.index)
@@ -106,76 +131,190 @@ for tag in tags:
     plt.legend(by_label.values(), by_label.keys(), frameon=True, fancybox=True, shadow=True, fontsize=23, ncol=2, borderpad=1)
     plt.grid(alpha=0.35, linestyle='-', linewidth=1.1)
     plt.tight_layout()
-    plt.show()
+    return finish(f'rssi_min_mean_max_{tag}.png', save=False)
+
+
+# 1-3 for large fleets: distributions over tags and pages of small per-tag panels
+def plot_estimated_distance_fleet(ref, ref_df):
+    """Percentile bands of every tag's estimated distance per sample index at one reference distance."""
+    sample = ref_df.groupby('tag', sort=False).cumcount() + 1
+    estimated = pd.Series(widen(ref_df, ['estimated_distance'])['estimated_distance'])
+    q = estimated.groupby(sample.values).quantile([p / 100 for p in FLEET_PERCENTILES]).unstack()
+    low, q1, median, q3, high = (q[c] for c in q.columns)
+    color = first_plot_colors[2]
+    plt.figure(figsize=(11, 7))
+    plt.axhline(ref, color='black', linestyle='--', linewidth=2.2,
+                label=f'Distance: {ref} m', alpha=0.8, zorder=1)
+    plt.fill_between(q.index, low, high, color=color, alpha=0.18, linewidth=0,
+                     label=f'{FLEET_PERCENTILES[0]}-{FLEET_PERCENTILES[-1]}th percentile')
+    plt.fill_between(q.index, q1, q3, color=color, alpha=0.35, linewidth=0,
+                     label=f'{FLEET_PERCENTILES[1]}-{FLEET_PERCENTILES[-2]}th percentile')
+    plt.plot(q.index, median, marker='o', markersize=9, linewidth=2.4, color=color,
+             label=f'Median of {ref_df["tag"].nunique()} tags', markerfacecolor='white', markeredgewidth=1.5)
+    plt.xlabel('Sample Index', fontsize=22, fontweight='bold')
+    plt.ylabel('Estimated Distance (m)', fontsize=22, fontweight='bold')
+    plt.ylim(0, max(11, ref+2))
+    plt.xlim(1, max(q.index.max(), 2))
+    plt.legend(frameon=True, fancybox=True, shadow=True, fontsize=20, loc='best', borderpad=1)
+    plt.grid(alpha=0.35, linestyle='-', linewidth=1.1)
+    plt.tight_layout()
+    return finish(f'estimated_distance_{ref:g}m.png', save=False)
+
+
+def plot_error_heatmap(summary):
+    """Mean absolute error per tag (rows) and reference distance (columns), one pixel row per tag if need be."""
+    grid = summary['mean_abs_error'].unstack('ref_distance')
+    plt.figure(figsize=(11, min(7 + len(grid) * 0.02, 30)))
+    plt.imshow(grid.values, aspect='auto', interpolation='nearest', cmap='viridis')
+    plt.colorbar(label='Mean Absolute Error (m)')
+    plt.xticks(range(len(grid.columns)), [f'{c:g}' for c in grid.columns])
+    if len(grid) <= 40:
+        plt.yticks(range(len(grid)), grid.index, fontsize=12)
+    else:
+        plt.yticks([])
+    plt.xlabel('Distance (m)', fontsize=22, fontweight='bold')
+    plt.ylabel(f'Tag ({len(grid)})', fontsize=22, fontweight='bold')
+    plt.grid(False)
+    plt.tight_layout()
+    return finish('error_heatmap.png', save=False)
+
+
+def _page(n_panels):
+    fig, axes = plt.subplots(PAGE_ROWS, PAGE_COLS, figsize=(4.5 * PAGE_COLS, 3.2 * PAGE_ROWS),
+                             sharex=True, sharey=True, squeeze=False)
+    # fixed margins: tight_layout over 25 axes costs more than drawing them
+    fig.subplots_adjust(left=0.06, right=0.99, bottom=0.06, top=0.93, wspace=0.08, hspace=0.25)
+    axes[0, 0].xaxis.set_major_locator(plt.MaxNLocator(5))
+    axes[0, 0].yaxis.set_major_locator(plt.MaxNLocator(4))
+    for ax in axes.flat[n_panels:]:
+        ax.axis('off')
+    return fig, axes.flat
+
+
+def _finish_page(fig, xlabel, labels, name):
+    fig.supxlabel(xlabel, fontsize=18, fontweight='bold')
+    fig.supylabel('RSSI (dBm)', fontsize=18, fontweight='bold')
+    handles = [h for h in fig.axes[0].get_lines() if not h.get_label().startswith('_')]
+    fig.legend(handles, labels, loc='upper center', ncol=len(labels), fontsize=14, frameon=True)
+    return finish(name, save=False)
+
+
+def plot_rssi_series_page(page, series):
+    """Section 2 for one page of tags: series is [(tag, first-trial rows)]."""
+    fig, axes = _page(len(series))
+    width = pixel_size(fig, OUTPUT["dpi"])[0] // PAGE_COLS
+    for ax, (tag, sub) in zip(axes, series):
+        x = np.arange(1, len(sub)+1)
+        kalman_smooth = pd.Series(sub['kalman_rssi'].values).rolling(window=7, center=True, min_periods=1).mean()
+        ax.plot(*line(x, sub['raw_rssi'].values, width), color=RAW_COLOR, linewidth=1.2, label='Raw RSSI')
+        ax.plot(*line(x, kalman_smooth, width, method='lttb'), color=KALMAN_COLOR, linewidth=1.6, linestyle='--',
+                label='Kalman Filtered RSSI')
+        ax.set_title(str(tag), fontsize=12)
+        ax.tick_params(labelsize=10)
+        ax.grid(alpha=0.35, linestyle='-', linewidth=0.8)
+    return _finish_page(fig, 'Sample Index 10 of Each Distance', ['Raw RSSI', 'Kalman Filtered RSSI'],
+                        f'rssi_raw_vs_kalman_page_{page:03d}.png')
+
+
+def plot_rssi_range_page(page, ranges):
+    """Section 3 for one page of tags: ranges is [(tag, min/mean/max of raw and kalman RSSI by distance)]."""
+    fig, axes = _page(len(ranges))
+    width = 0.11
+    for ax, (tag, g) in zip(axes, ranges):
+        x = np.array(g.index)
+        for column, color, offset, style, label in (('raw_rssi', RAW_COLOR, -width/2, '-', 'Raw Mean'),
+                                                    ('kalman_rssi', KALMAN_COLOR, width/2, '--', 'Kalman Mean')):
+            ax.vlines(x + offset, g[(column, 'min')], g[(column, 'max')], color=color, linewidth=3, alpha=0.5)
+            ax.plot(x + offset, g[(column, 'mean')], color=color, marker='o', markersize=4, linewidth=1.6,
+                    linestyle=style, label=label)
+        ax.set_title(str(tag), fontsize=12)
+        ax.tick_params(labelsize=10)
+        ax.grid(alpha=0.35, linestyle='-', linewidth=0.8)
+    return _finish_page(fig, 'Distance (m)', ['Raw Mean', 'Kalman Mean'], f'rssi_min_mean_max_page_{page:03d}.png')
+
+
+def small_multiples_jobs(df, tags):
+    """Page jobs for sections 2 and 3, from one sort and one grouped aggregation of the whole frame."""
+    df = pd.DataFrame({'tag': df['tag'], **widen(df, ['ref_distance', 'raw_rssi', 'kalman_rssi'])})
+    first = df.sort_values(['tag', 'ref_distance'], kind='stable').groupby(['tag', 'ref_distance'], sort=False).head(SAMPLES_PER_TRIAL)
+    series = {tag: rows[['raw_rssi', 'kalman_rssi']] for tag, rows in first.groupby('tag', sort=False)}
+    ranges = df.groupby(['tag', 'ref_distance'])[['raw_rssi', 'kalman_rssi']].agg(['min', 'mean', 'max'])
+    ranges = {tag: rows.droplevel('tag') for tag, rows in ranges.groupby(level='tag', sort=False)}
+
+    per_page = PAGE_ROWS * PAGE_COLS
+    jobs = []
+    for page, start in enumerate(range(0, len(tags), per_page), start=1):
+        page_tags = tags[start:start + per_page]
+        jobs.append((plot_rssi_series_page, (page, [(tag, series[tag]) for tag in page_tags])))
+        jobs.append((plot_rssi_range_page, (page, [(tag, ranges[tag]) for tag in page_tags])))
+    return jobs
+
 
 # 4. Error Distribution Histogram
-df['raw_estimated'] = 10**(( -68.0 - df['raw_rssi'])/(10*2.5))
-df['raw_error'] = np.abs(df['raw_estimated'] - df['ref_distance'])
-df['kalman_estimated'] = 10**(( -68.0 - df['kalman_rssi'])/(10*2.5))
-df['kalman_error'] = np.abs(df['kalman_estimated'] - df['ref_distance'])
-
-plt.figure(figsize=(13, 7))
-plt.hist(df['raw_error'], bins=15, alpha=0.7, label='Raw RSSI Error',
-         color=RAW_COLOR, edgecolor='white', linewidth=2)
-plt.hist(df['kalman_error'], bins=15, alpha=0.7, label='Kalman Filtered Error',
-         color=KALMAN_COLOR, edgecolor='white', linewidth=2)
-raw_mean = df['raw_error'].mean()
-kalman_mean = df['kalman_error'].mean()
-plt.axvline(raw_mean, color=RAW_COLOR, linestyle='--', linewidth=3,
-           label=f'Raw Mean: {raw_mean:.2f}m')
-plt.axvline(kalman_mean, color=KALMAN_COLOR, linestyle='--', linewidth=3,
-           label=f'Kalman Mean: {kalman_mean:.2f}m')
-plt.xlabel('Absolute Error (meters)', fontsize=22, fontweight='bold')
-plt.ylabel('Frequency', fontsize=22, fontweight='bold')
-# plt.title('Distance Estimation Error Distribution Comparison',
-#           fontsize=28, fontweight='bold', pad=20)
-plt.legend(frameon=True, fancybox=True, shadow=True, fontsize=23, borderpad=1)
-plt.grid(alpha=0.35, linestyle='-', linewidth=1.1)
-plt.tight_layout()
-plt.show()
-
-# ---------- Insights Output ----------
-df['abs_error'] = np.abs(df['estimated_distance'] - df['ref_distance'])
-print("\n" + "="*50)
-print("🎯 KEY ACCURACY INSIGHTS")
-print("="*50)
-for tag, tagdf in df.groupby('tag'):
-    print(f"\n📊 {tag} Performance Analysis")
-    print("-" * 30)
-    summary = tagdf.groupby('ref_distance').agg(
-        mean_estimated=('estimated_distance', 'mean'),
-        std_estimated=('estimated_distance', 'std'),
-        mean_abs_error=('abs_error', 'mean'),
-        std_abs_error=('abs_error', 'std'),
-        min_error=('abs_error', 'min'),
-        max_error=('abs_error', 'max')
-    )
-    print(summary.round(3))
-    print(f"\n📏 Distance-wise Error Summary:")
-    for ref in summary.index:
-        m = summary.loc[ref, 'mean_abs_error']
-        s = summary.loc[ref, 'std_abs_error']
-        print(f"  📍 {ref}m: Mean Error = {m:.2f}m (±{s:.2f}m)")
-    overall_error = summary['mean_abs_error'].mean()
-    print(f"\n🎯 Overall Mean Absolute Error: {overall_error:.2f}m")
-
-mean_raw_err = df['raw_error'].mean()
-mean_kalman_err = df['kalman_error'].mean()
-improvement = mean_raw_err - mean_kalman_err
-improvement_pct = (improvement / mean_raw_err) * 100
-
-print("\n" + "="*50)
-print("🔬 KALMAN FILTER PERFORMANCE")
-print("="*50)
-print(f"📈 Raw RSSI Error:      {mean_raw_err:.2f}m")
-print(f"📉 Kalman Filter Error: {mean_kalman_err:.2f}m")
-print(f"✅ Improvement:         {improvement:.2f}m ({improvement_pct:.1f}% better)")
-
-if 'cycle' in df.columns:
-    min_rssi = df.groupby('cycle')['raw_rssi'].min()
-    drift_rate = min_rssi.diff().mean()
-    if drift_rate < -0.2:
-        print(f"\n⚠️  WARNING: RSSI drifting at {drift_rate:.2f} dBm/cycle")
-        print("   Possible causes: battery discharge or tag movement")
+def plot_error_histogram(df):
+    plt.figure(figsize=(13, 7))
+    plt.hist(df['raw_error'], bins=15, alpha=0.7, label='Raw RSSI Error',
+             color=RAW_COLOR, edgecolor='white', linewidth=2)
+    plt.hist(df['kalman_error'], bins=15, alpha=0.7, label='Kalman Filtered Error',
+             color=KALMAN_COLOR, edgecolor='white', linewidth=2)
+    raw_mean = df['raw_error'].mean()
+    kalman_mean = df['kalman_error'].mean()
+    plt.axvline(raw_mean, color=RAW_COLOR, linestyle='--', linewidth=3,
+               label=f'Raw Mean: {raw_mean:.2f}m')
+    plt.axvline(kalman_mean, color=KALMAN_COLOR, linestyle='--', linewidth=3,
+               label=f'Kalman Mean: {kalman_mean:.2f}m')
+    plt.xlabel('Absolute Error (meters)', fontsize=22, fontweight='bold')
+    plt.ylabel('Frequency', fontsize=22, fontweight='bold')
+    # plt.title('Distance Estimation Error Distribution Comparison',
+    #           fontsize=28, fontweight='bold', pad=20)
+    plt.legend(frameon=True, fancybox=True, shadow=True, fontsize=23, borderpad=1)
+    plt.grid(alpha=0.35, linestyle='-', linewidth=1.1)
+    plt.tight_layout()
+    return finish('error_distribution.png', save=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="RSSI distance estimation accuracy plots and insights.")
+    parser.add_argument("--data", default="data.csv")
+    parser.add_argument("--stats", help="accumulator file: merge this data into it and report the accuracy tables "
+                                        "over every session merged so far")
+    parser.add_argument("--layout", choices=["auto", "per-tag", "small-multiples"], default="auto",
+                        help=f"per-tag figures, or fleet overviews and pages of per-tag panels "
+                             f"(auto: small multiples above {MAX_TAG_LINES} tags)")
+    add_arguments(parser, out="figures", dpi=150, cache=False)
+    args = parser.parse_args()
+    configure(args.batch, args.out, args.dpi, STYLE_RC)
+
+    df = add_model_errors(load_data(args.data))
+    tags = df['tag'].unique()
+    ref_distances = sorted(df['ref_distance'].unique())
+    layout = args.layout
+    if layout == "auto":
+        layout = "per-tag" if len(tags) <= MAX_TAG_LINES else "small-multiples"
+
+    stats = accuracy_stats(df)
+    if args.stats:
+        if os.path.exists(args.stats):
+            stats = StatsTable.load(args.stats).merge(stats)
+        stats.save(args.stats)
+
+    # Rows are grouped once; every job carries only its own slice
+    by_ref = dict(tuple(df.groupby('ref_distance', sort=True)))
+    if layout == "per-tag":
+        by_tag = dict(tuple(df.groupby('tag', sort=False)))
+        jobs = [(plot_estimated_distance, (ref, by_ref[ref], tags)) for ref in ref_distances]
+        for tag in tags:
+            jobs.append((plot_rssi_series, (tag, by_tag[tag], ref_distances)))
+            jobs.append((plot_rssi_range, (tag, by_tag[tag])))
     else:
-        print(f"\n✅ RSSI stability: Good (drift rate: {drift_rate:.2f} dBm/cycle)")
+        jobs = [(plot_estimated_distance_fleet, (ref, by_ref[ref][['tag', 'estimated_distance']])) for ref in ref_distances]
+        jobs.append((plot_error_heatmap, (summary_table(stats),)))
+        jobs += small_multiples_jobs(df, tags)
+    jobs.append((plot_error_histogram, (df[['raw_error', 'kalman_error']],)))
+    render_all(jobs, args.workers)
+
+    print_insights(df, stats)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,379 @@
+# presence_index.py
+# On-disk interval index of the location logs for "where was asset X at time T" queries.
+#
+# Every location_logs row is an interval: the ingest de-duplication overwrites a row in
+# place while the reading stays steady, so a row covers created_at..updated_at for one
+# (asset, reader, location, type, status). The index keeps those intervals sorted by
+# (asset, start) in one raw binary file per column, with the rows of each asset found
+# through an offsets array, and `reach`: the latest end of any interval of the asset up to
+# that row. Starts and reach are both ascending within an asset, so the intervals covering
+# a time, or overlapping a range, are found by two binary searches over memory-mapped
+# columns. A query reads a few pages of the index instead of scanning a year of logs.
+#
+# Updates are incremental: only rows with an id above the last one indexed, or updated
+# since the last updated_at seen, are read from a new export, and they are written as a
+# new sorted segment of their own. A row that was indexed before is not rewritten where it
+# is: its id goes into the superseded set of the segment holding it (found by binary search
+# over that segment's sorted ids), and queries skip superseded rows. Segments of similar
+# size are merged, like the carries of a binary counter, dropping superseded rows; so an
+# update costs about its own rows, each row is rewritten O(log N) times over the life of
+# the index, and there are O(log N) segments to search. index.json, which holds the
+# labels, the segments and the watermark, is written last.
+#
+#   python presence_index.py --update location_logs_export.csv
+#   python presence_index.py --asset 2 --at "2025-08-07 09:40:00"
+#   python presence_index.py --asset 2 --from "2025-08-07 09:30" --to "2025-08-07 10:00"
+
+import argparse
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from loaders import CHUNK_ROWS, encode, iter_logs
+
+INDEX_DIR = "presence_index"
+INDEX_FILE = "index.json"
+INDEX_VERSION = 2
+
+# column -> raw little-endian dtype; rows of a segment sorted by (asset, start, id)
+COLUMNS = {
+    "start": "<i8",         # created_at, epoch seconds
+    "end": "<i8",           # updated_at, epoch seconds
+    "reach": "<i8",         # max end of the asset's rows in the segment up to this one
+    "id": "<i8",
+    "reader": "<i4",        # codes into the labels of index.json
+    "location": "<i4",      # location_id, -1 when null
+    "type": "<i2",
+    "status": "<i2",
+}
+# per-segment lookup files besides the columns
+OFFSETS = "offsets.bin"         # first row of each asset known when the segment was written, and the end
+SORTED_IDS = "ids.bin"          # the segment's ids, sorted
+SUPERSEDED = "superseded.bin"   # ids replaced in a later segment, appended; index.json has the committed count
+LABELS = ["asset", "reader", "type", "status"]
+READ_COLUMNS = ["id", "asset_id", "location_id", "type", "status", "reader_name", "created_at", "updated_at"]
+
+
+def _seconds(times):
+    return times.to_numpy(dtype="datetime64[s]").astype(np.int64)
+
+
+def to_seconds(value):
+    """Epoch seconds of a timestamp string or datetime-like."""
+    return int(pd.Timestamp(value).timestamp())
+
+
+def _reach(asset, end):
+    """Running max of `end` restarting at every asset; rows are sorted by asset."""
+    if not len(end):
+        return end.copy()
+    lo = end.min()
+    span = end.max() - lo + 1
+    return np.maximum.accumulate((end - lo) + asset * span) - asset * span + lo
+
+
+def _member(sorted_values, values):
+    """Which of `values` are in the sorted array `sorted_values`."""
+    found = np.zeros(len(values), dtype=bool)
+    if not len(sorted_values):
+        return found
+    pos = np.searchsorted(sorted_values, values)
+    inside = pos < len(sorted_values)
+    found[inside] = np.asarray(sorted_values[pos[inside]]) == values[inside]
+    return found
+
+
+class Segment:
+    """One sorted run of intervals, memory-mapped from its directory; `entry` is its record in index.json."""
+
+    def __init__(self, path, entry):
+        self.path = os.path.join(path, entry["name"])
+        self.entry = entry
+        rows = entry["rows"]
+        self.columns = {name: self._open(name + ".bin", dtype, rows) for name, dtype in COLUMNS.items()}
+        self.offsets = self._open(OFFSETS, "<i8", entry["assets"] + 1)
+        self.ids = self._open(SORTED_IDS, "<i8", rows)
+        self.superseded = np.sort(np.fromfile(os.path.join(self.path, SUPERSEDED), dtype="<i8",
+                                              count=entry["superseded"]))
+
+    def _open(self, name, dtype, rows):
+        if not rows:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(os.path.join(self.path, name), dtype=dtype, mode="r", shape=(rows,))
+
+    def __len__(self):
+        return self.entry["rows"]
+
+    def rows(self, code):
+        if code >= self.entry["assets"]:
+            return 0, 0
+        return int(self.offsets[code]), int(self.offsets[code + 1])
+
+    def live(self, rows):
+        """`rows` without the superseded ones."""
+        if not len(self.superseded):
+            return rows
+        return rows[~_member(self.superseded, np.asarray(self.columns["id"][rows]))]
+
+    def overlapping(self, code, t0, t1):
+        """Live rows of asset `code` whose interval overlaps [t0, t1]: starts up to t1, reach from t0, then exact ends."""
+        lo, hi = self.rows(code)
+        stop = lo + int(np.searchsorted(self.columns["start"][lo:hi], t1, side="right"))
+        first = lo + int(np.searchsorted(self.columns["reach"][lo:stop], t0, side="left"))
+        rows = np.arange(first, stop)
+        return self.live(rows[np.asarray(self.columns["end"][first:stop]) >= t0])
+
+    def last_before(self, code, t):
+        """The live row of asset `code` with the latest start up to `t`, or None."""
+        lo, hi = self.rows(code)
+        row = lo + int(np.searchsorted(self.columns["start"][lo:hi], t, side="right")) - 1
+        while row >= lo and not len(self.live(np.array([row]))):
+            row -= 1
+        return row if row >= lo else None
+
+    def supersede(self, ids):
+        """Mark the ids of `ids` (sorted) that this segment holds live as replaced. Returns their number."""
+        ids = ids[_member(self.ids, ids) & ~_member(self.superseded, ids)]
+        if not len(ids):
+            return 0
+        with open(os.path.join(self.path, SUPERSEDED), 'ab') as f:
+            # drop anything an interrupted update appended past the committed count
+            f.truncate(self.entry["superseded"] * 8)
+            f.write(ids.astype("<i8").tobytes())
+        self.entry["superseded"] += len(ids)
+        self.superseded = np.sort(np.r_[self.superseded, ids])
+        return len(ids)
+
+    def take(self, rows):
+        return {name: np.asarray(values[rows]) for name, values in self.columns.items()}
+
+    def load(self):
+        """Every live row, with its asset code, as arrays."""
+        rows = self.live(np.arange(len(self)))
+        columns = self.take(rows)
+        columns["asset"] = np.repeat(np.arange(self.entry["assets"]), np.diff(np.asarray(self.offsets)))[rows]
+        return columns
+
+
+class PresenceIndex:
+    """Presence intervals per asset, memory-mapped from `path` and updated from location_logs exports."""
+
+    def __init__(self, path=INDEX_DIR):
+        self.path = path
+        self.meta = {"version": INDEX_VERSION, "max_id": None, "max_updated": None, "next_segment": 0,
+                     "segments": [], "labels": {name: [] for name in LABELS}}
+        if os.path.isfile(os.path.join(path, INDEX_FILE)):
+            with open(os.path.join(path, INDEX_FILE)) as f:
+                meta = json.load(f)
+            if meta.get("version") != INDEX_VERSION:
+                raise ValueError(f"Unsupported index version {meta.get('version')} in {path}")
+            self.meta = meta
+        self.codes = {name: {value: code for code, value in enumerate(values)}
+                      for name, values in self.meta["labels"].items()}
+        self.segments = [Segment(path, entry) for entry in self.meta["segments"]]
+
+    def __len__(self):
+        """Live intervals."""
+        return sum(len(segment) - segment.entry["superseded"] for segment in self.segments)
+
+    # ---------------------------
+    # Building
+    # ---------------------------
+    def _read(self, source, chunk_rows):
+        """Rows of an export past the watermark as code arrays (asset and the COLUMNS but reach)."""
+        max_id, max_updated = self.meta["max_id"], self.meta["max_updated"]
+        parts = []
+        since = None if max_updated is None else pd.Timestamp(max_updated, unit="s").strftime("%Y-%m-%d %H:%M:%S")
+        for chunk in iter_logs(source, READ_COLUMNS, chunk_rows, after_id=max_id, updated_since=since):
+            end = _seconds(chunk["updated_at"])
+            if max_id is not None:
+                fresh = (chunk["id"].to_numpy() > max_id) | (end >= max_updated)
+                chunk, end = chunk[fresh], end[fresh]
+            parts.append({
+                "asset": encode(chunk["asset_id"], self.codes["asset"]),
+                "start": _seconds(chunk["created_at"]), "end": end,
+                "id": chunk["id"].to_numpy(dtype=np.int64),
+                "reader": encode(chunk["reader_name"], self.codes["reader"]),
+                "location": chunk["location_id"].fillna(-1).to_numpy(dtype=np.int64),
+                "type": encode(chunk["type"], self.codes["type"]),
+                "status": encode(chunk["status"], self.codes["status"]),
+            })
+        return {name: np.concatenate([p[name] for p in parts]) for name in parts[0]} if parts else None
+
+    def update(self, source, chunk_rows=CHUNK_ROWS):
+        """Index the rows of an export that are new or updated since the last update. Returns their number."""
+        new = self._read(source, chunk_rows)
+        if new is None or not len(new["id"]):
+            return 0
+        # a re-exported row replaces its earlier version; keep the latest of duplicates within the export
+        order = np.lexsort((new["end"], new["id"]))
+        last = np.r_[new["id"][order][1:] != new["id"][order][:-1], True]
+        new = {name: values[order[last]] for name, values in new.items()}
+
+        max_id, max_updated = self.meta["max_id"], self.meta["max_updated"]
+        if max_id is not None:
+            # only ids up to the old watermark can be in the index already (new["id"] is sorted)
+            seen = new["id"][new["id"] <= max_id]
+            for segment in self.segments:
+                segment.supersede(seen)
+        self.segments.append(self._write_segment(new))
+        self._merge()
+
+        top, latest = int(new["id"].max()), int(new["end"].max())
+        self.meta.update({"max_id": top if max_id is None else max(max_id, top),
+                          "max_updated": latest if max_updated is None else max(max_updated, latest)})
+        self._save()
+        return len(new["id"])
+
+    def compact(self):
+        """Merge every segment into one without superseded rows."""
+        if len(self.segments) > 1 or any(segment.entry["superseded"] for segment in self.segments):
+            self.segments = [self._write_segment(self._combine(self.segments))]
+            self._save()
+
+    def _merge(self):
+        """Merge the newest segment into the one before it while that one is no larger."""
+        while len(self.segments) >= 2 and len(self.segments[-2]) <= len(self.segments[-1]):
+            self.segments[-2:] = [self._write_segment(self._combine(self.segments[-2:]))]
+
+    @staticmethod
+    def _combine(segments):
+        # superseded rows are dropped: their replacements live in a later segment
+        parts = [segment.load() for segment in segments]
+        return {name: np.concatenate([p[name] for p in parts]) for name in parts[0]}
+
+    def _write_segment(self, rows):
+        """Sort `rows` (asset codes and the COLUMNS but reach) into a new segment directory."""
+        order = np.lexsort((rows["id"], rows["start"], rows["asset"]))
+        rows = {name: values[order] for name, values in rows.items()}
+        rows["reach"] = _reach(rows["asset"], rows["end"])
+        n_assets = len(self.codes["asset"])
+
+        name = f"segment-{self.meta['next_segment']:06d}"
+        self.meta["next_segment"] += 1
+        path = os.path.join(self.path, name)
+        os.makedirs(path, exist_ok=True)
+        for column, dtype in COLUMNS.items():
+            rows[column].astype(dtype).tofile(os.path.join(path, f"{column}.bin"))
+        offsets = np.r_[0, np.cumsum(np.bincount(rows["asset"], minlength=n_assets))]
+        offsets.astype("<i8").tofile(os.path.join(path, OFFSETS))
+        np.sort(rows["id"]).astype("<i8").tofile(os.path.join(path, SORTED_IDS))
+        open(os.path.join(path, SUPERSEDED), 'wb').close()
+        return Segment(self.path, {"name": name, "rows": int(len(rows["id"])), "assets": n_assets, "superseded": 0})
+
+    def _save(self):
+        self.meta.update({
+            "segments": [segment.entry for segment in self.segments],
+            "labels": {name: list(codes) for name, codes in self.codes.items()},
+        })
+        tmp_path = os.path.join(self.path, INDEX_FILE + ".tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(self.meta, f)
+        os.replace(tmp_path, os.path.join(self.path, INDEX_FILE))
+        # segments merged away, or left behind by an interrupted update
+        live = {segment.entry["name"] for segment in self.segments}
+        for name in os.listdir(self.path):
+            if name.startswith("segment-") and name not in live:
+                shutil.rmtree(os.path.join(self.path, name))
+
+    # ---------------------------
+    # Queries
+    # ---------------------------
+    def _frame(self, parts):
+        """The intervals of (segment, rows) pairs, oldest first."""
+        labels = self.meta["labels"]
+        taken = [segment.take(rows) for segment, rows in parts]
+        column = {name: np.concatenate([t[name] for t in taken]) if taken else np.empty(0, dtype=dtype)
+                  for name, dtype in COLUMNS.items()}
+        order = np.lexsort((column["id"], column["start"]))
+        column = {name: values[order] for name, values in column.items()}
+        location = column["location"].astype(np.float64)
+        location[column["location"] < 0] = np.nan
+        return pd.DataFrame({
+            "id": column["id"],
+            "reader_name": np.asarray(labels["reader"], dtype=object)[column["reader"]],
+            "location_id": pd.array(location, dtype="Int32"),
+            "type": np.asarray(labels["type"], dtype=object)[column["type"]],
+            "status": np.asarray(labels["status"], dtype=object)[column["status"]],
+            "start": pd.to_datetime(column["start"], unit="s"),
+            "end": pd.to_datetime(column["end"], unit="s"),
+        })
+
+    def _overlapping(self, asset, t0, t1):
+        """Intervals of `asset` overlapping [t0, t1] in every segment."""
+        code = self.codes["asset"].get(asset)
+        if code is None:
+            return self._frame([])
+        return self._frame([(segment, segment.overlapping(code, t0, t1)) for segment in self.segments])
+
+    def at(self, asset, time):
+        """Intervals of `asset` covering `time` (timestamp or epoch seconds), oldest first."""
+        t = time if isinstance(time, (int, np.integer)) else to_seconds(time)
+        return self._overlapping(asset, t, t)
+
+    def between(self, asset, start, end):
+        """Intervals of `asset` overlapping [start, end], oldest first."""
+        t0 = start if isinstance(start, (int, np.integer)) else to_seconds(start)
+        t1 = end if isinstance(end, (int, np.integer)) else to_seconds(end)
+        return self._overlapping(asset, t0, t1)
+
+    def last_seen(self, asset, time):
+        """The latest interval of `asset` starting at or before `time`: where it was last reported."""
+        t = time if isinstance(time, (int, np.integer)) else to_seconds(time)
+        code = self.codes["asset"].get(asset)
+        best = None
+        for segment in self.segments if code is not None else []:
+            row = segment.last_before(code, t)
+            if row is None:
+                continue
+            key = (int(segment.columns["start"][row]), int(segment.columns["id"][row]))
+            if best is None or key > best[0]:
+                best = (key, segment, row)
+        return self._frame([] if best is None else [(best[1], np.array([best[2]]))])
+
+
+def _asset(value):
+    """CLI asset ids are numbers in the export."""
+    try:
+        return int(value)
+    except ValueError:
+        return value
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Interval index of location logs for point-in-time asset queries.")
+    parser.add_argument("--index", default=INDEX_DIR, help="index directory")
+    parser.add_argument("--update", metavar="EXPORT", action="append", default=[],
+                        help="index the new and updated rows of a headerless location_logs export or database URL "
+                             "(repeatable)")
+    parser.add_argument("--compact", action="store_true", help="merge the index into one segment")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--asset", type=_asset, help="asset_id to query")
+    parser.add_argument("--at", help="timestamp: intervals covering it and the last report before it")
+    parser.add_argument("--from", dest="start", help="range start (with --to)")
+    parser.add_argument("--to", dest="end", help="range end (with --from)")
+    args = parser.parse_args()
+
+    index = PresenceIndex(args.index)
+    for export in args.update:
+        print(f"{export}: indexed {index.update(export, args.chunk_rows)} new or updated rows, {len(index)} in total "
+              f"in {len(index.segments)} segments")
+    if args.compact:
+        index.compact()
+    if args.asset is None:
+        return
+    if args.at:
+        print(f"Asset {args.asset} at {args.at}:")
+        print(index.at(args.asset, args.at).to_string(index=False))
+        print("Last report:")
+        print(index.last_seen(args.asset, args.at).to_string(index=False))
+    if args.start and args.end:
+        print(f"Asset {args.asset} from {args.start} to {args.end}:")
+        print(index.between(args.asset, args.start, args.end).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+# rollups.py
+# Append-only minute and hour rollups of the location logs, maintained incrementally.
+#
+# Each rollup is a table of (bucket, reader, location, type, status, count), the logs
+# created in that bucket, stored like the calibration dataset: one raw column file per
+# field and a rollups.json holding the labels, the committed row counts and the
+# watermark, the highest log id already counted. The ingest only ever inserts a row or
+# rewrites its values and updated_at; reader, location, type, status and created_at of a
+# row never change, so counting rows by created_at over ids above the watermark is exact.
+# An update reads the export, keeps only the new ids, and appends their counts, so it
+# costs as much as the new rows, and a query never touches raw logs.
+#
+# The same bucket may be appended by several updates; queries sum over it. Range counts
+# take whole hours from the hour rollup and only the ragged edges from the minute one.
+#
+#   python rollups.py --update location_logs_export.csv
+#   python rollups.py --from "2025-08-07 09:30" --to "2025-08-07 10:00" --by reader_name,status
+
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from loaders import CHUNK_ROWS, encode, iter_logs
+
+ROLLUP_DIR = "rollups"
+ROLLUP_FILE = "rollups.json"
+ROLLUP_VERSION = 1
+GRANULARITIES = {"minute": 60, "hour": 3600}
+
+# rollup column -> raw little-endian dtype
+COLUMNS = {
+    "bucket": "<i8",        # epoch seconds // granularity
+    "reader": "<i4",        # codes into the labels of rollups.json
+    "location": "<i4",      # location_id, -1 when null
+    "type": "<i2",
+    "status": "<i2",
+    "count": "<i8",
+}
+KEYS = ["reader", "location", "type", "status"]
+# rollup key -> column name in query results
+KEY_NAMES = {"reader": "reader_name", "location": "location_id", "type": "type", "status": "status"}
+READ_COLUMNS = ["id", "asset_id", "location_id", "type", "status", "reader_name", "created_at"]
+
+
+def to_seconds(value):
+    """Epoch seconds of a timestamp string or datetime-like."""
+    return int(pd.Timestamp(value).timestamp())
+
+
+def _pair_keys(pairs):
+    return pairs["reader"].to_numpy(dtype=np.int64) << 32 | pairs["asset"].to_numpy(dtype=np.int64)
+
+
+class RollupStore:
+    """Minute and hour log counts per (reader, location, type, status), kept in `path`."""
+
+    def __init__(self, path=ROLLUP_DIR):
+        self.path = path
+        self.meta = {"version": ROLLUP_VERSION, "watermark": None, "logs": 0,
+                     "rows": {name: 0 for name in GRANULARITIES}, "pairs": 0,
+                     "labels": {"reader": [], "type": [], "status": [], "asset": []}}
+        file = os.path.join(path, ROLLUP_FILE)
+        if os.path.isfile(file):
+            with open(file) as f:
+                meta = json.load(f)
+            if meta.get("version") != ROLLUP_VERSION:
+                raise ValueError(f"Unsupported rollup version {meta.get('version')} in {path}")
+            self.meta = meta
+        self.codes = {name: {value: code for code, value in enumerate(values)}
+                      for name, values in self.meta["labels"].items()}
+
+    def _file(self, table, column):
+        return os.path.join(self.path, table, f"{column}.bin")
+
+    def _read_column(self, table, column, dtype, rows):
+        if not rows:
+            return np.empty(0, dtype=dtype)
+        return np.fromfile(self._file(table, column), dtype=dtype, count=rows)
+
+    def _append(self, table, columns, rows):
+        """Append arrays to a table's column files, first dropping anything past the committed rows."""
+        os.makedirs(os.path.join(self.path, table), exist_ok=True)
+        for name, values in columns.items():
+            dtype = np.dtype(values.dtype)
+            with open(self._file(table, name), 'ab') as f:
+                f.truncate(rows * dtype.itemsize)
+                f.write(values.tobytes())
+
+    # ---------------------------
+    # Ingest
+    # ---------------------------
+    def update(self, source, chunk_rows=CHUNK_ROWS):
+        """Count the logs of an export with ids above the watermark. Returns the number of new logs."""
+        watermark = self.meta["watermark"]
+        parts = {name: [] for name in GRANULARITIES}
+        pairs = []
+        logs, top = 0, watermark
+        for chunk in iter_logs(source, READ_COLUMNS, chunk_rows, after_id=watermark):
+            ids = chunk["id"].to_numpy()
+            if watermark is not None:
+                chunk, ids = chunk[ids > watermark], ids[ids > watermark]
+            if not len(ids):
+                continue
+            logs += len(ids)
+            top = int(ids.max()) if top is None else max(top, int(ids.max()))
+            keys = pd.DataFrame({
+                "reader": encode(chunk["reader_name"], self.codes["reader"]),
+                "location": chunk["location_id"].fillna(-1).to_numpy(dtype=np.int64),
+                "type": encode(chunk["type"], self.codes["type"]),
+                "status": encode(chunk["status"], self.codes["status"]),
+            })
+            seconds = chunk["created_at"].to_numpy(dtype="datetime64[s]").astype(np.int64)
+            for name, size in GRANULARITIES.items():
+                parts[name].append(keys.groupby([seconds // size] + [keys[k] for k in KEYS], sort=False).size())
+            pairs.append(pd.DataFrame({"reader": keys["reader"],
+                                       "asset": encode(chunk["asset_id"], self.codes["asset"])}).drop_duplicates())
+        if not logs:
+            return 0
+
+        rows = dict(self.meta["rows"])
+        for name, counts in parts.items():
+            counts = pd.concat(counts).groupby(level=list(range(len(KEYS) + 1)), sort=True).sum()
+            columns = {"bucket": counts.index.get_level_values(0)}
+            columns.update({k: counts.index.get_level_values(i + 1) for i, k in enumerate(KEYS)})
+            columns["count"] = counts.to_numpy()
+            self._append(name, {c: np.asarray(columns[c], dtype=COLUMNS[c]) for c in COLUMNS}, rows[name])
+            rows[name] += len(counts)
+
+        # (reader, asset) pairs seen so far, for per-reader asset counts
+        new = pd.concat(pairs).drop_duplicates()
+        known = self.reader_asset_codes()
+        new = new[~np.isin(_pair_keys(new), _pair_keys(known))]
+        self._append("pairs", {"reader": new["reader"].to_numpy(dtype="<i4"),
+                               "asset": new["asset"].to_numpy(dtype="<i4")}, self.meta["pairs"])
+
+        self.meta.update({
+            "watermark": top, "logs": self.meta["logs"] + logs, "rows": rows,
+            "pairs": self.meta["pairs"] + len(new),
+            "labels": {name: list(codes) for name, codes in self.codes.items()},
+        })
+        os.makedirs(self.path, exist_ok=True)
+        tmp_path = os.path.join(self.path, ROLLUP_FILE + ".tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(self.meta, f, indent=2)
+        os.replace(tmp_path, os.path.join(self.path, ROLLUP_FILE))
+        return logs
+
+    # ---------------------------
+    # Queries
+    # ---------------------------
+    def table(self, granularity="minute"):
+        """The rollup as a frame of bucket start (epoch seconds), labelled keys and count."""
+        rows = self.meta["rows"][granularity]
+        raw = {c: self._read_column(granularity, c, dtype, rows) for c, dtype in COLUMNS.items()}
+        labels = self.meta["labels"]
+        frame = pd.DataFrame({"start": raw["bucket"] * GRANULARITIES[granularity]})
+        for key in KEYS:
+            values = raw[key]
+            if key == "location":
+                frame[KEY_NAMES[key]] = pd.array(np.where(values < 0, np.nan, values), dtype="Int32") \
+                    if len(values) else pd.array([], dtype="Int32")
+            else:
+                frame[KEY_NAMES[key]] = pd.Categorical.from_codes(values, categories=labels[key])
+        frame["count"] = raw["count"]
+        return frame
+
+    def reader_asset_codes(self):
+        n = self.meta["pairs"]
+        return pd.DataFrame({"reader": self._read_column("pairs", "reader", "<i4", n),
+                             "asset": self._read_column("pairs", "asset", "<i4", n)})
+
+    def reader_assets(self):
+        """The set of asset_ids each reader logged, like scalability_test.stream_counts."""
+        pairs = self.reader_asset_codes()
+        readers, assets = self.meta["labels"]["reader"], self.meta["labels"]["asset"]
+        out = {}
+        for reader, asset in zip(pairs["reader"], pairs["asset"]):
+            out.setdefault(readers[reader], set()).add(assets[asset])
+        return out
+
+    def series(self, granularity="minute", by=("reader_name",)):
+        """Counts per bucket start and `by` keys, summed over the appends that touched a bucket."""
+        table = self.table(granularity)
+        return table.groupby(["start"] + list(by), observed=True, dropna=False)["count"].sum()
+
+    def cumulative(self, granularity="minute", by="reader_name"):
+        """Running totals per bucket over every bucket since the first, one column per `by` value plus 'Total'."""
+        size = GRANULARITIES[granularity]
+        per_bucket = self.series(granularity, [by]).unstack(by, fill_value=0)
+        buckets = np.arange(per_bucket.index.min(), per_bucket.index.max() + size, size)
+        cumulative = per_bucket.reindex(buckets, fill_value=0).cumsum()
+        cumulative = cumulative[sorted(cumulative.columns, key=lambda c: (pd.isna(c), c))]   # null location last
+        cumulative["Total"] = cumulative.sum(axis=1)
+        return cumulative
+
+    def count(self, start, end, by=("reader_name",)):
+        """
+        Logs created in [start, end), minute-aligned, per `by` keys: whole hours from the hour
+        rollup, the minutes before the first and after the last whole hour from the minute one.
+        """
+        t0 = start if isinstance(start, (int, np.integer)) else to_seconds(start)
+        t1 = end if isinstance(end, (int, np.integer)) else to_seconds(end)
+        h0, h1 = -(-t0 // 3600) * 3600, t1 // 3600 * 3600
+        by = list(by)
+        parts = []
+        if h0 < h1:
+            hours = self.table("hour")
+            parts.append(hours[(hours["start"] >= h0) & (hours["start"] < h1)])
+            minutes = self.table("minute")
+            start = minutes["start"]
+            parts.append(minutes[((start >= t0) & (start < h0)) | ((start >= h1) & (start < t1))])
+        else:
+            minutes = self.table("minute")
+            parts.append(minutes[(minutes["start"] >= t0) & (minutes["start"] < t1)])
+        counts = pd.concat(parts)
+        return counts.groupby(by, observed=True, dropna=False)["count"].sum() if by else counts["count"].sum()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incremental minute/hour rollups of location log exports.")
+    parser.add_argument("--store", default=ROLLUP_DIR, help="rollup directory")
+    parser.add_argument("--update", metavar="EXPORT", action="append", default=[],
+                        help="count the logs of a headerless location_logs export or database URL past the watermark "
+                             "(repeatable)")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--from", dest="start", help="window start")
+    parser.add_argument("--to", dest="end", help="window end (exclusive)")
+    parser.add_argument("--by", default="reader_name", help="comma list of: " + ", ".join(KEY_NAMES.values()))
+    args = parser.parse_args()
+
+    store = RollupStore(args.store)
+    for export in args.update:
+        print(f"{export}: counted {store.update(export, args.chunk_rows)} new logs "
+              f"(watermark id {store.meta['watermark']})")
+    if args.start and args.end:
+        by = [name for name in args.by.split(",") if name]
+        print(f"Logs from {args.start} to {args.end}:")
+        counts = store.count(args.start, args.end, by)
+        print(counts.to_string() if by else counts)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,84 +1,198 @@
+import argparse
+import os
+import sys
+
 import pandas as pd
 import matplotlib.pyplot as plt
 import numpy as np
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "shared"))
+
+from loaders import CHUNK_ROWS, iter_logs
+from plotting import add_arguments, configure, finish
+from rollups import RollupStore
+
 # --- Style setup (print-friendly, visible for presentations/print) ---
-plt.style.use('seaborn-v0_8-whitegrid')
-plt.rcParams['figure.facecolor'] = 'white'
-plt.rcParams['axes.facecolor'] = 'white'
-plt.rcParams.update({'font.size': 21})
+STYLE_RC = {'font.size': 21}
 COLORS = ['#0080ff', '#e74c3c', '#27ae60']
+TOTAL_COLOR = '#27ae60'
 
-# --- Load your real data ---
 FNAME = 'location_logs_export.csv'
-df = pd.read_csv(FNAME, header=None)
-df.columns = [
-    "id", "asset_id", "tag_id", "rssi", "kalman_rssi", "estimated_distance",
-    "type", "status", "reader_name", "created_at", "updated_at"
-]
-df['created_at'] = pd.to_datetime(df['created_at'])
-df['minute'] = (df['created_at'] - df['created_at'].min()).dt.total_seconds() // 60
-df['minute'] = df['minute'].astype(int)
+
+# Legend names and scan assumptions for the readers of the original two-reader test
+READER_LABELS = {
+    'Asset_Reader_01': 'Room Reader (Explicit)',
+    'Asset_Reader_02': 'Hallway Reader (Pattern)',
+}
+# Tags seen per scan without dedup; the hallway reader sees ~3 tags per scan on avg
+# (from the earlier simulation). Other readers default to the number of distinct assets they logged.
+TAGS_PER_SCAN = {
+    'Asset_Reader_01': 5,
+    'Asset_Reader_02': 3,
+}
+SCAN_INTERVAL_S = 30          # 1 scan every 30 sec
+MAX_PLOTTED_READERS = 12
+
+
+# --- Stream the export ---
+def _add_minutes(counts, minutes, readers):
+    """Add one chunk's logs (epoch minute and reader name of each) to the per-reader minute arrays in `counts`."""
+    codes, names = pd.factorize(readers)
+    lo = int(minutes.min())
+    span = int(minutes.max()) - lo + 1
+    table = np.bincount(codes * span + (minutes - lo), minlength=len(names) * span).reshape(len(names), span)
+    for name, row in zip(names, table):
+        c = counts.setdefault(name, {'first': lo, 'n': np.zeros(0, dtype=np.int64)})
+        # grow to cover the chunk, at least doubling, so a long export is copied O(log) times
+        need_lo, need_hi = min(c['first'], lo), max(c['first'] + len(c['n']), lo + span)
+        if need_lo < c['first'] or need_hi > c['first'] + len(c['n']):
+            grown = np.zeros(max(need_hi - need_lo, 2 * len(c['n'])), dtype=np.int64)
+            grown[c['first'] - need_lo:c['first'] - need_lo + len(c['n'])] = c['n']
+            c['first'], c['n'] = need_lo, grown
+        c['n'][lo - c['first']:lo - c['first'] + span] += row
+
+
+def stream_counts(path=FNAME, chunk_rows=CHUNK_ROWS):
+    """
+    One pass over the export in fixed-size chunks. Returns log counts per created_at minute
+    (epoch minutes as the index, one column per reader) and the set of assets each reader
+    logged. Every chunk is bucketed to minutes and added into one count array per reader,
+    so memory follows readers x minutes spanned and each chunk costs the same.
+    """
+    counts = {}
+    assets = {}
+    for chunk in iter_logs(path, ['asset_id', 'reader_name', 'created_at'], chunk_rows):
+        chunk = chunk[chunk['created_at'].notna() & chunk['reader_name'].notna()]
+        if not len(chunk):
+            continue
+        minutes = chunk['created_at'].to_numpy(dtype='datetime64[m]').astype(np.int64)
+        _add_minutes(counts, minutes, chunk['reader_name'].astype(str).to_numpy())
+        for name, ids in chunk.groupby('reader_name', observed=True)['asset_id'].unique().items():
+            assets.setdefault(name, set()).update(ids.tolist())
+    if not counts:
+        raise ValueError(f"{path} contains no logs")
+    lo = min(c['first'] for c in counts.values())
+    hi = max(c['first'] + len(c['n']) for c in counts.values())
+    per_minute = pd.DataFrame(0, index=pd.RangeIndex(lo, hi, name='minute'), columns=sorted(counts), dtype='int64')
+    for name, c in counts.items():
+        per_minute.iloc[c['first'] - lo:c['first'] - lo + len(c['n']), per_minute.columns.get_loc(name)] = c['n']
+    return per_minute, assets
+
+
+def rollup_counts(store_path, path=FNAME, chunk_rows=CHUNK_ROWS):
+    """
+    stream_counts from the minute rollups in `store_path`, after counting the export's logs
+    past the store's watermark.
+    """
+    store = RollupStore(store_path)
+    store.update(path, chunk_rows)
+    if not store.meta["logs"]:
+        raise ValueError(f"{path} contains no logs")
+    per_minute = store.series('minute', ['reader_name']).unstack('reader_name', fill_value=0)
+    per_minute.columns = per_minute.columns.astype(str)
+    per_minute.index = (per_minute.index // 60).rename('minute')
+    return per_minute.astype('int64'), store.reader_assets()
+
 
 # --- Cumulative log count by reader ---
-cum_room = df[df['reader_name'] == 'Asset_Reader_01'].groupby('minute')['id'].count().cumsum()
-cum_hall = df[df['reader_name'] == 'Asset_Reader_02'].groupby('minute')['id'].count().cumsum()
-cum_total = df.groupby('minute')['id'].count().cumsum()
+def cumulative_counts(per_minute):
+    """Cumulative counts, one column per reader plus 'Total', over every clock minute from the first log's to the last's."""
+    active = per_minute.index[per_minute.to_numpy().sum(axis=1) > 0]
+    # Fill all minutes for smooth lines
+    cumulative = per_minute.reindex(np.arange(active.min(), active.max() + 1), fill_value=0).cumsum()
+    cumulative = cumulative[sorted(cumulative.columns)]
+    cumulative['Total'] = cumulative.sum(axis=1)
+    minutes = np.arange(len(cumulative))
+    cumulative.index = pd.Index(minutes, name='minute')
+    return minutes, cumulative
 
-# Fill all minutes for smooth lines
-minutes = np.arange(0, df['minute'].max() + 1)
-cum_room = cum_room.reindex(minutes, method='ffill').fillna(0)
-cum_hall = cum_hall.reindex(minutes, method='ffill').fillna(0)
-cum_total = cum_total.reindex(minutes, method='ffill').fillna(0)
 
 # --- PLOT (real data only) ---
-plt.figure(figsize=(13, 7))
-plt.tick_params(axis='both', which='major', labelsize=25)
-plt.plot(minutes, cum_room, label='Room Reader (Explicit)', color=COLORS[0], linewidth=4, zorder=2)
-plt.plot(minutes, cum_hall, label='Hallway Reader (Pattern)', color=COLORS[1], linewidth=4, zorder=2)
-plt.plot(minutes, cum_total, label='Total Logs', color=COLORS[2], linewidth=5, linestyle='--', zorder=1)
-
-plt.xlabel('Time (minutes)', fontsize=20, fontweight='bold')
-plt.ylabel('Cumulative Log Count', fontsize=20, fontweight='bold')
-# plt.title('Cumulative Asset Log Count per Reader (1 Hour)', 
-#           fontsize=26, fontweight='bold', pad=26)
-plt.ylim(0, max(cum_total.max(), 30) * 1.08)
-plt.xlim(0, minutes.max())
-plt.legend(frameon=True, fancybox=True, shadow=True, fontsize=23, loc='upper left')
-plt.grid(alpha=0.3, linestyle='-', linewidth=1)
-plt.tight_layout()
-plt.show()
+def plot_cumulative(minutes, cumulative):
+    readers = [c for c in cumulative.columns if c != 'Total']
+    # With a large fleet only the busiest readers get their own line
+    if len(readers) > MAX_PLOTTED_READERS:
+        readers = list(cumulative[readers].iloc[-1].nlargest(MAX_PLOTTED_READERS).index)
+
+    plt.figure(figsize=(13, 7))
+    plt.tick_params(axis='both', which='major', labelsize=25)
+    for i, name in enumerate(readers):
+        plt.plot(minutes, cumulative[name], label=READER_LABELS.get(name, name),
+                 color=COLORS[i] if i < 2 else None, linewidth=4, zorder=2)
+    plt.plot(minutes, cumulative['Total'], label='Total Logs', color=TOTAL_COLOR, linewidth=5, linestyle='--', zorder=1)
+
+    plt.xlabel('Time (minutes)', fontsize=20, fontweight='bold')
+    plt.ylabel('Cumulative Log Count', fontsize=20, fontweight='bold')
+    # plt.title('Cumulative Asset Log Count per Reader (1 Hour)',
+    #           fontsize=26, fontweight='bold', pad=26)
+    plt.ylim(0, max(cumulative['Total'].max(), 30) * 1.08)
+    plt.xlim(0, minutes.max())
+    plt.legend(frameon=True, fancybox=True, shadow=True, fontsize=23 if len(readers) <= 4 else 12, loc='upper left')
+    plt.grid(alpha=0.3, linestyle='-', linewidth=1)
+    plt.tight_layout()
+    return finish('cumulative_log_count.png', save=False)
+
 
 # --- Stats summary ---
-# Real log counts
-room_logs = int(cum_room.max())
-hall_logs = int(cum_hall.max())
-total_logs = int(cum_total.max())
-
-print("\nLOG COUNTS SUMMARY (Real Data)")
-print(f"Room Reader logs:    {room_logs}")
-print(f"Hallway Reader logs: {hall_logs}")
-print(f"Total logs:          {total_logs}")
-
-# Theoretical log counts (no deduplication, for your system: 1 scan every 30 sec, 5 tags, 1 hour)
-scans_per_hour = 60 * 60 // 30
-tags_per_reader = 5
-room_theoretical = scans_per_hour * tags_per_reader
-# Assume hallway reader sees ~3 tags per scan on avg (from your previous simulation), so:
-hall_theoretical = int(scans_per_hour * 3)
-total_theoretical = room_theoretical + hall_theoretical
-
-print("\nTHEORETICAL LOG COUNTS (No Dedup/Threshold)")
-print(f"Room Reader (max):   {room_theoretical}")
-print(f"Hallway Reader (max):{hall_theoretical}")
-print(f"Total (max):         {total_theoretical}")
-
-# Reduction effectiveness
-room_reduction = 100 * (1 - room_logs / room_theoretical)
-hall_reduction = 100 * (1 - hall_logs / hall_theoretical)
-total_reduction = 100 * (1 - total_logs / total_theoretical)
-
-print("\nThreshold/deduplication effectiveness:")
-print(f"  Room reduction:    {room_reduction:.1f}% fewer logs")
-print(f"  Hall reduction:    {hall_reduction:.1f}% fewer logs")
-print(f"  Overall reduction: {total_reduction:.1f}% fewer logs")
+def reduction_report(cumulative, assets, scan_interval=SCAN_INTERVAL_S, tags_per_scan=None):
+    """
+    Real vs theoretical (no dedup/threshold) log counts per reader. The theoretical count is
+    one log per tag per scan over the export's time span.
+    """
+    tags_per_scan = {**TAGS_PER_SCAN, **(tags_per_scan or {})}
+    scans = len(cumulative) * 60 // scan_interval
+    rows = []
+    for name in cumulative.columns.drop('Total'):
+        tags = tags_per_scan.get(name, len(assets.get(name, ())))
+        rows.append((name, int(cumulative[name].iloc[-1]), scans * tags))
+    report = pd.DataFrame(rows, columns=['reader', 'logs', 'theoretical']).set_index('reader')
+    report.loc['Total'] = report.sum()
+    report['reduction_pct'] = 100 * (1 - report['logs'] / report['theoretical'])
+    return report
+
+
+def print_summary(report):
+    width = max(len(str(name)) for name in report.index) + 2
+    print("\nLOG COUNTS SUMMARY (Real Data)")
+    for name, row in report.iterrows():
+        print(f"{name + ' logs:':<{width + 6}}{int(row['logs'])}")
+
+    print("\nTHEORETICAL LOG COUNTS (No Dedup/Threshold)")
+    for name, row in report.iterrows():
+        print(f"{name + ' (max):':<{width + 6}}{row['theoretical']:g}")
+
+    # Reduction effectiveness
+    print("\nThreshold/deduplication effectiveness:")
+    for name, row in report.iterrows():
+        print(f"  {name + ' reduction:':<{width + 11}}{row['reduction_pct']:.1f}% fewer logs")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cumulative log counts per reader from a location log export.")
+    parser.add_argument("--data", default=FNAME, help="headerless location_logs export or database URL (see db_source.py)")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--rollups", metavar="DIR",
+                        help="keep minute/hour rollups in DIR and plot from them; only logs new since the last run are read")
+    parser.add_argument("--scan-interval", type=int, default=SCAN_INTERVAL_S, help="seconds between reader scans")
+    parser.add_argument("--tags-per-scan", action="append", default=[], metavar="READER=N",
+                        help="expected tags per scan for a reader (default: distinct assets it logged)")
+    add_arguments(parser, out="figures", dpi=150, cache=False)
+    args = parser.parse_args()
+    configure(args.batch, args.out, args.dpi, STYLE_RC)
+
+    tags_per_scan = {}
+    for item in args.tags_per_scan:
+        name, value = item.split('=', 1)
+        tags_per_scan[name] = float(value)
+
+    if args.rollups:
+        counts, assets = rollup_counts(args.rollups, args.data, args.chunk_rows)
+    else:
+        counts, assets = stream_counts(args.data, args.chunk_rows)
+    minutes, cumulative = cumulative_counts(counts)
+    plot_cumulative(minutes, cumulative)
+    print_summary(reduction_report(cumulative, assets, args.scan_interval, tags_per_scan))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+# traffic_sim.py
+# Synthetic reader traffic for capacity testing of the ingest path.
+#
+# Each simulated reader owns a set of tags that wander around it. Every scan it draws a raw
+# RSSI per tag from a noise model fitted to data.csv (mean RSSI interpolated over
+# log10(distance) between the measured reference distances, plus residuals resampled from
+# the nearest one), runs the firmware Kalman filter and calculateDistance, and builds the
+# batch payload sendBatchReports posts to /reader-log. Thousands of readers run
+# concurrently on one asyncio loop; latency and status of every POST are recorded. Without
+# --url the ingest stand-in (ingest_standin.py) is started in-process.
+
+import argparse
+import asyncio
+import json
+import time
+from urllib.parse import urlsplit
+
+import numpy as np
+import pandas as pd
+
+from autofit import DEFAULT_CONFIG
+from ingest_standin import IngestStandIn, format_summary, summarize
+from kalman_replay import F32, calculate_distance
+from loaders import read_accuracy, widen
+
+DETECTION_FLOOR = -100.0        # tags weaker than this are not seen by the scan
+WANDER_STEP = 0.3               # metres a tag may move between scans (std dev)
+DISTANCE_RANGE = (0.3, 12.0)
+
+
+class RssiModel:
+    """Raw RSSI versus distance, from the reference-distance measurements in data.csv."""
+
+    def __init__(self, distances, means, residuals):
+        self.log_d = np.log10(np.asarray(distances, dtype=np.float64))
+        self.means = np.asarray(means, dtype=np.float64)
+        self.slope = np.polyfit(self.log_d, self.means, 1)[0] if len(self.log_d) > 1 else -25.0
+        self.residuals = np.concatenate(residuals)
+        self.offsets = np.cumsum([0] + [len(r) for r in residuals])
+
+    @classmethod
+    def from_csv(cls, path='data.csv'):
+        grouped = pd.DataFrame(widen(read_accuracy(path, ['ref_distance', 'raw_rssi']), ['ref_distance', 'raw_rssi'])) \
+            .groupby('ref_distance')['raw_rssi']
+        residuals = [(g - g.mean()).to_numpy() for _, g in grouped]
+        return cls(list(grouped.groups), grouped.mean().to_numpy(), residuals)
+
+    def sample(self, distance, rng):
+        log_d = np.log10(distance)
+        inside = np.clip(log_d, self.log_d[0], self.log_d[-1])
+        # interpolate between reference distances, extend with the log-distance slope beyond them
+        mean = np.interp(inside, self.log_d, self.means) + self.slope * (log_d - inside)
+        nearest = np.abs(log_d[:, None] - self.log_d).argmin(axis=1)
+        lo, hi = self.offsets[nearest], self.offsets[nearest + 1]
+        return mean + self.residuals[lo + (rng.random(len(distance)) * (hi - lo)).astype(int)]
+
+
+class SimulatedReader:
+    """One reader: tag positions, per-tag Kalman state and the firmware's report format."""
+
+    def __init__(self, name, tags, model, rng, explicit=False, config=DEFAULT_CONFIG):
+        self.name = name
+        self.tags = tags
+        self.model = model
+        self.rng = rng
+        self.explicit = explicit
+        self.config = config
+        self.distance = rng.uniform(*DISTANCE_RANGE, len(tags))
+        self.x = np.full(len(tags), config["kalman"]["initial"], dtype=F32)
+        self.P = np.full(len(tags), config["kalman"]["P"], dtype=F32)
+        self.started = np.zeros(len(tags), dtype=bool)
+
+    def _filter(self, z, seen):
+        """KalmanFilter::update for the tags seen this scan; the first sample initialises the state."""
+        Q, R = F32(self.config["kalman"]["Q"]), F32(self.config["kalman"]["R"])
+        z = z.astype(F32)
+        first = seen & ~self.started
+        self.x[first] = z[first]
+        step = seen & self.started
+        P = self.P[step] + Q
+        K = P / (P + R)
+        self.x[step] = self.x[step] + K * (z[step] - self.x[step])
+        self.P[step] = (F32(1.0) - K) * P
+        self.started |= seen
+        return self.x
+
+    def payload(self):
+        """The next scan's batch report, or None when the firmware would not send one."""
+        self.distance = np.clip(self.distance + self.rng.normal(0, WANDER_STEP, len(self.tags)), *DISTANCE_RANGE)
+        rssi = np.round(self.model.sample(self.distance, self.rng), 1)
+        seen = rssi >= DETECTION_FLOOR
+        filtered = self._filter(rssi, seen)
+        estimated = calculate_distance(filtered, self.config["txPower"], self.config["pathLossExponent"])
+
+        devices = []
+        for i in np.flatnonzero(seen):
+            present = 0 < estimated[i] <= self.config["maxDistance"]
+            devices.append({
+                "device_name": self.tags[i],
+                "type": "heartbeat" if present else "alert",
+                "status": "present" if present else "out_of_range",
+                "estimated_distance": round(float(estimated[i]), 2),
+                "rssi": float(rssi[i]),
+                "kalman_rssi": round(float(filtered[i]), 1),
+            })
+        if self.explicit:
+            for i in np.flatnonzero(~seen):
+                devices.append({"device_name": self.tags[i], "type": "alert", "status": "not_found",
+                                "estimated_distance": -1.0, "rssi": -100.0, "kalman_rssi": -100.0})
+        if not devices:
+            return None
+        return {"reader_name": self.name, "devices": devices}
+
+
+def make_readers(n_readers, tags_per_reader, model, seed=0, explicit_fraction=0.0):
+    rng = np.random.default_rng(seed)
+    readers = []
+    for r in range(n_readers):
+        tags = [f"Asset_Tag_{r * tags_per_reader + i + 1:02d}" for i in range(tags_per_reader)]
+        readers.append(SimulatedReader(f"Asset_Reader_{r + 1:02d}", tags, model,
+                                       np.random.default_rng(rng.integers(2**63)), rng.random() < explicit_fraction))
+    return readers
+
+
+async def post(host, port, path, body):
+    """One HTTP/1.1 POST on a fresh connection, as the firmware does (setReuse(false)). Returns the status code."""
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        writer.write(f"POST {path} HTTP/1.1\r\nHost: {host}:{port}\r\nContent-Type: application/json\r\n"
+                     f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+        await writer.drain()
+        status = int((await reader.readline()).split()[1])
+        length = 0
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            if name.strip().lower() == 'content-length':
+                length = int(value)
+        await reader.readexactly(length)
+        return status
+    finally:
+        writer.close()
+
+
+class LoadStats:
+    def __init__(self):
+        self.times, self.sizes, self.latencies = [], [], []
+        self.statuses = {}
+
+    def add(self, size, latency, status):
+        self.times.append(time.time())
+        self.sizes.append(size)
+        self.latencies.append(latency)
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+
+    def summary(self):
+        return summarize(self.times, self.sizes, self.latencies, self.statuses)
+
+
+async def drive(reader, host, port, path, interval, deadline, stats, limit):
+    await asyncio.sleep(reader.rng.uniform(0, interval))
+    while time.monotonic() < deadline:
+        started = time.monotonic()
+        payload = reader.payload()
+        if payload is not None:
+            body = json.dumps(payload, separators=(',', ':')).encode()
+            async with limit:
+                t0 = time.perf_counter()
+                try:
+                    status = await post(host, port, path, body)
+                except (OSError, ValueError, IndexError, asyncio.IncompleteReadError):
+                    status = 'error'
+                stats.add(len(body), time.perf_counter() - t0, status)
+        await asyncio.sleep(max(0.0, interval - (time.monotonic() - started)))
+
+
+async def run_load(readers, url=None, interval=30.0, duration=60.0, max_connections=1000, record=None):
+    """Drive every reader against `url` (or an in-process stand-in) for `duration` seconds."""
+    standin = server = None
+    if url is None:
+        standin = IngestStandIn(record)
+        server = await standin.start('127.0.0.1', 0)
+        url = f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}/api/reader-log"
+    parts = urlsplit(url)
+    if parts.scheme != 'http':
+        raise ValueError("only plain http:// endpoints are supported")
+
+    stats = LoadStats()
+    limit = asyncio.Semaphore(max_connections)
+    deadline = time.monotonic() + duration
+    try:
+        await asyncio.gather(*(drive(r, parts.hostname, parts.port or 80, parts.path, interval, deadline, stats, limit)
+                               for r in readers))
+    finally:
+        if server is not None:
+            server.close()
+            await server.wait_closed()
+            standin.close()
+    return stats.summary(), standin.summary() if standin else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive simulated readers against the ingest API.")
+    parser.add_argument("--url", help="reader-log endpoint (default: start the ingest stand-in in-process)")
+    parser.add_argument("--data", default="data.csv", help="RSSI measurements for the noise model")
+    parser.add_argument("--readers", type=int, default=1000)
+    parser.add_argument("--tags", type=int, default=5, help="tags per reader")
+    parser.add_argument("--interval", type=float, default=30.0, help="seconds between scans per reader")
+    parser.add_argument("--duration", type=float, default=60.0)
+    parser.add_argument("--explicit-fraction", type=float, default=0.0,
+                        help="share of readers in explicit mode (report not_found tags)")
+    parser.add_argument("--max-connections", type=int, default=1000)
+    parser.add_argument("--record", help="with the in-process stand-in: write received device reports to this CSV")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--example", action="store_true", help="print one generated payload and exit")
+    args = parser.parse_args()
+
+    model = RssiModel.from_csv(args.data)
+    readers = make_readers(args.readers, args.tags, model, args.seed, args.explicit_fraction)
+    if args.example:
+        print(json.dumps(readers[0].payload(), indent=2))
+        return
+
+    client, server = asyncio.run(run_load(readers, args.url, args.interval, args.duration,
+                                          args.max_connections, args.record))
+    print(format_summary(client, f"Client ({args.readers} readers x {args.tags} tags, every {args.interval:g}s)"))
+    if server is not None:
+        print(format_summary(server, f"Stand-in ({server['devices']} device reports)"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+# generate.py
+# Synthetic inputs for the benchmark suite, in the formats the pipeline reads:
+#   - calibration serial captures (calibration/data/test.txt)
+#   - accuracy test tables (RSSI-Based Distance Estimation Accuracy Test/data.csv)
+#   - location log exports (location_logs_export.csv, headerless)
+# Files are written in chunks, so sizes up to 10^8 rows need disk space, not memory.
+# Output is deterministic for a given (rows, seed).
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+CHUNK_ROWS = 200_000
+TX_POWER = -68.0
+PATH_LOSS_EXPONENT = 2.5
+
+CAPTURE_DISTANCES = np.arange(0.5, 10.0, 0.5)
+READINGS_PER_BLOCK = 10
+FAILED_RATE = 0.05
+MOVING_SHARE = 0.1
+
+ACCURACY_DISTANCES = [1.0, 2.0, 3.0, 4.0, 5.0]
+ACCURACY_TAGS = 2
+ACCURACY_CYCLES = 10
+
+EXPORT_START = pd.Timestamp('2025-08-07 09:33:02')
+EXPORT_TYPES = np.array(['alert', 'heartbeat'])
+EXPORT_STATUSES = np.array(['out_of_range', 'present', 'not_found'])
+EXPORT_STATUS_P = [0.83, 0.15, 0.02]
+
+
+def _rssi_at(distance, rng):
+    return np.round(TX_POWER - 10 * PATH_LOSS_EXPONENT * np.log10(distance) + rng.normal(0, 3, len(distance)))
+
+
+def _calculated(rssi):
+    return np.round(10 ** ((TX_POWER - rssi) / (10 * PATH_LOSS_EXPONENT)), 2)
+
+
+def _capture_block(distance, rssi, failed):
+    lines = [f"{distance:g} meters", f"Starting {len(rssi)} readings..."]
+    for i, (value, fail) in enumerate(zip(rssi, failed), start=1):
+        lines.append("Scanning...")
+        if fail:
+            lines.append("Scanning...")
+        lines.append(f"Reading {i}: RSSI = {value:.0f} | Calculated Distance = {_calculated(value):.2f} meters")
+    lines.append(f"Completed {len(rssi)} readings.")
+    lines.append("")
+    return lines
+
+
+def write_capture(path, rows, seed=0):
+    """A serial capture with about `rows` readings: clear blocks, wall blocks, then a moving walk."""
+    rng = np.random.default_rng(seed)
+    moving = int(rows * MOVING_SHARE)
+    blocks = max(2, (rows - moving) // READINGS_PER_BLOCK)
+    with open(path, 'w') as f:
+        for b in range(blocks):
+            if b == blocks // 2:
+                f.write("Wall\n")
+            distance = CAPTURE_DISTANCES[b % len(CAPTURE_DISTANCES)]
+            d = np.full(READINGS_PER_BLOCK, distance)
+            rssi = _rssi_at(d, rng) - (6 if b >= blocks // 2 else 0)
+            f.write("\n".join(_capture_block(distance, rssi, rng.random(READINGS_PER_BLOCK) < FAILED_RATE)) + "\n")
+
+        f.write("From 15 meters until 1 meters\n")
+        for start in range(0, moving, CHUNK_ROWS):
+            n = min(CHUNK_ROWS, moving - start)
+            d = 15.0 - 14.0 * np.arange(start, start + n) / max(1, moving - 1)
+            rssi = _rssi_at(d, rng)
+            failed = rng.random(n) < FAILED_RATE
+            lines = []
+            for i, (value, fail) in enumerate(zip(rssi, failed), start=start + 1):
+                lines.append("Scanning...")
+                if fail:
+                    lines.append("Scanning...")
+                lines.append(f"Reading {i}: RSSI = {value:.0f} | Calculated Distance = {_calculated(value):.2f} meters")
+            f.write("\n".join(lines) + "\n")
+    return path
+
+
+def write_accuracy_data(path, rows, seed=0):
+    """An accuracy table (trial, ref_distance, cycle, tag, raw_rssi, kalman_rssi, estimated_distance)."""
+    rng = np.random.default_rng(seed)
+    per_trial = len(ACCURACY_DISTANCES) * ACCURACY_TAGS * ACCURACY_CYCLES
+    trials = max(1, rows // per_trial)
+    grid = pd.MultiIndex.from_product([ACCURACY_DISTANCES, range(1, ACCURACY_CYCLES + 1),
+                                       [f"Asset_Tag_{t + 1:02d}" for t in range(ACCURACY_TAGS)]],
+                                      names=['ref_distance', 'cycle', 'tag']).to_frame(index=False)
+    header = True
+    with open(path, 'w', newline='') as f:
+        for start in range(0, trials, max(1, CHUNK_ROWS // per_trial)):
+            n = min(max(1, CHUNK_ROWS // per_trial), trials - start)
+            chunk = pd.concat([grid] * n, ignore_index=True)
+            chunk.insert(0, 'trial', np.repeat(np.arange(start + 1, start + n + 1), per_trial))
+            raw = _rssi_at(chunk['ref_distance'].to_numpy(), rng)
+            kalman = np.round(raw + rng.normal(0, 1, len(raw)), 1)
+            chunk['raw_rssi'] = raw
+            chunk['kalman_rssi'] = kalman
+            chunk['estimated_distance'] = _calculated(kalman)
+            chunk.to_csv(f, header=header, index=False, float_format='%.2f')
+            header = False
+    return path
+
+
+def write_location_export(path, rows, readers=100, seed=0, span_hours=1.0):
+    """A headerless, fully quoted location_logs export spread over `readers` readers and `span_hours`."""
+    rng = np.random.default_rng(seed)
+    span = int(span_hours * 3600)
+    assets_per_reader = 5
+    with open(path, 'w', newline='') as f:
+        for start in range(0, rows, CHUNK_ROWS):
+            n = min(CHUNK_ROWS, rows - start)
+            # each chunk draws its own sorted slice of the span, so timestamps never exist all at once
+            lo, hi = span * start // rows, span * (start + n) // rows
+            seconds = np.sort(rng.integers(lo, max(hi, lo + 1), n))
+            reader = rng.integers(0, readers, n)
+            asset = reader * assets_per_reader + rng.integers(0, assets_per_reader, n) + 1
+            rssi = np.round(rng.normal(-85, 8, n), 1)
+            kalman = np.round(rssi + rng.normal(0, 0.5, n), 1)
+            created = EXPORT_START + pd.to_timedelta(seconds, unit='s')
+            updated = created + pd.to_timedelta(rng.integers(0, 300, n), unit='s')
+            chunk = pd.DataFrame({
+                'id': np.arange(start + 1, start + n + 1),
+                'asset_id': asset,
+                'location_id': asset,
+                'rssi': rssi,
+                'kalman_rssi': kalman,
+                'estimated_distance': _calculated(kalman),
+                'type': EXPORT_TYPES[rng.integers(0, 2, n)],
+                'status': EXPORT_STATUSES[rng.choice(3, n, p=EXPORT_STATUS_P)],
+                'reader_name': np.char.add('Asset_Reader_', np.char.zfill((reader + 1).astype(str), 2)),
+                'created_at': created.strftime('%Y-%m-%d %H:%M:%S'),
+                'updated_at': updated.strftime('%Y-%m-%d %H:%M:%S'),
+            })
+            chunk.to_csv(f, header=False, index=False, quoting=1)
+    return path
+
+
+GENERATORS = {
+    'capture': (write_capture, 'capture.txt'),
+    'accuracy': (write_accuracy_data, 'data.csv'),
+    'export': (write_location_export, 'location_logs_export.csv'),
+}
+
+
+def ensure(kind, rows, data_dir, seed=0):
+    """Path of the `kind` input with `rows` rows under data_dir, generating it on first use."""
+    func, name = GENERATORS[kind]
+    directory = os.path.join(data_dir, f"{rows}-{seed}")
+    path = os.path.join(directory, name)
+    if not os.path.exists(path):
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = path + ".tmp"
+        func(tmp_path, rows, seed=seed)
+        os.replace(tmp_path, path)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic pipeline inputs.")
+    parser.add_argument("kind", choices=sorted(GENERATORS))
+    parser.add_argument("rows", type=lambda v: int(float(v)))
+    parser.add_argument("output")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    GENERATORS[args.kind][0](args.output, args.rows, seed=args.seed)
+
+
+if __name__ == "__main__":
+    main()
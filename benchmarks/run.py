@@ -0,0 +1,269 @@
+# run.py
+# Time and peak memory of each pipeline stage over synthetic inputs of growing size.
+#
+# Every (stage, rows) measurement runs in a fresh interpreter with only the stage's own
+# script directory on sys.path (the scripts add shared/ themselves). Imports happen before the clock starts; peak memory is the child's max RSS,
+# reported both absolute and above the RSS right before the stage ran. Results are
+# appended to results.jsonl with the git commit, and each run is compared with the latest
+# results of a different commit on the same machine to flag regressions.
+#
+#   python benchmarks/run.py --sizes 1e3,1e4,1e5 [--stages parse_data,export] [--fail-on-regression]
+
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from generate import ensure
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+CALIBRATION_DIR = os.path.join(ROOT, "calibration")
+ACCURACY_DIR = os.path.join(ROOT, "RSSI-Based Distance Estimation Accuracy Test")
+DATA_DIR = os.path.join(HERE, ".data")
+RESULTS_FILE = os.path.join(HERE, "results.jsonl")
+
+DEFAULT_SIZES = "1e3,1e4,1e5,1e6"
+REGRESSION_TOLERANCE = 0.2
+
+
+# ---------------------------
+# Stages: each takes its input paths, does its imports and returns the callable to time
+# ---------------------------
+def _parse_data(inputs):
+    from export_txt_to_csv import parse_data
+    return lambda: parse_data(inputs["capture"])
+
+
+def _export(inputs):
+    from export_txt_to_csv import export
+    out_dir = os.path.join(os.path.dirname(inputs["capture"]), "export-timed")
+    return lambda: export(inputs["capture"], out_dir, resume=False)
+
+
+def _exported(inputs, source):
+    """CSV or dataset written by export() for this capture, exported once and reused."""
+    from export_txt_to_csv import export, FILENAMES
+    from dataset import DATASET_DIR
+    out_dir = os.path.join(os.path.dirname(inputs["capture"]), "export")
+    if not os.path.exists(os.path.join(out_dir, DATASET_DIR)):
+        export(inputs["capture"], out_dir, resume=False)
+    return os.path.join(out_dir, DATASET_DIR if source == "dataset" else FILENAMES["clear"])
+
+
+def _visualize_load_csv(inputs):
+    from visualize_data import load_and_process_data
+    path = _exported(inputs, "csv")
+    return lambda: load_and_process_data(path, "Clear")
+
+
+def _visualize_load_dataset(inputs):
+    from visualize_data import load_and_process_data
+    path = _exported(inputs, "dataset")
+    return lambda: load_and_process_data(path, "Clear")
+
+
+def _figs_load_csv(inputs):
+    from export_for_figs import load_and_process_data
+    path = _exported(inputs, "csv")
+    return lambda: load_and_process_data(path, "Clear")
+
+
+def _figs_load_dataset(inputs):
+    from export_for_figs import load_and_process_data
+    path = _exported(inputs, "dataset")
+    return lambda: load_and_process_data(path, "Clear")
+
+
+def _path_loss_fit(inputs):
+    from path_loss import cell_counts, fit
+    path = _exported(inputs, "dataset")
+    return lambda: fit(cell_counts(path, experiment="Clear"), replicates=10000)
+
+
+def _accuracy_summary(inputs):
+    from main import add_model_errors, load_data, print_insights
+
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            print_insights(add_model_errors(load_data(inputs["accuracy"])))
+    return run
+
+
+def _cumulative_counts(inputs):
+    from scalability_test import cumulative_counts, stream_counts
+    return lambda: cumulative_counts(stream_counts(inputs["export"])[0])
+
+
+def _localize(inputs):
+    from localize import track
+    return lambda: track(inputs["export"], window=30)
+
+
+def _drift_monitor(inputs):
+    from drift_monitor import monitor
+    return lambda: sum(len(events) for events in monitor(inputs["export"]))
+
+
+# name -> (setup, script directory, generated inputs)
+STAGES = {
+    "parse_data": (_parse_data, CALIBRATION_DIR, ["capture"]),
+    "export": (_export, CALIBRATION_DIR, ["capture"]),
+    "visualize_load_csv": (_visualize_load_csv, CALIBRATION_DIR, ["capture"]),
+    "visualize_load_dataset": (_visualize_load_dataset, CALIBRATION_DIR, ["capture"]),
+    "figs_load_csv": (_figs_load_csv, CALIBRATION_DIR, ["capture"]),
+    "figs_load_dataset": (_figs_load_dataset, CALIBRATION_DIR, ["capture"]),
+    "path_loss_fit": (_path_loss_fit, CALIBRATION_DIR, ["capture"]),
+    "accuracy_summary": (_accuracy_summary, ACCURACY_DIR, ["accuracy"]),
+    "cumulative_counts": (_cumulative_counts, ACCURACY_DIR, ["export"]),
+    "localize": (_localize, ACCURACY_DIR, ["export"]),
+    "drift_monitor": (_drift_monitor, ACCURACY_DIR, ["export"]),
+}
+
+
+# ---------------------------
+# Measurement
+# ---------------------------
+def _rss_bytes():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def _max_rss_bytes():
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _measure(name, inputs, repeat):
+    """Child process: set up the stage, then time it `repeat` times and report its peak memory."""
+    setup, directory, _ = STAGES[name]
+    sys.path.insert(0, directory)
+    os.chdir(directory)
+    run = setup(inputs)
+    before = _rss_bytes() if os.path.exists("/proc/self/statm") else _max_rss_bytes()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - start)
+    peak = _max_rss_bytes()
+    return {"seconds": min(timings), "peak_mb": peak / 2**20, "delta_mb": max(0, peak - before) / 2**20}
+
+
+def measure(name, rows, repeat=1, seed=0):
+    inputs = {kind: ensure(kind, rows, DATA_DIR, seed) for kind in STAGES[name][2]}
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return pool.submit(_measure, name, inputs, repeat).result()
+
+
+# ---------------------------
+# Results
+# ---------------------------
+def git_commit():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT,
+                                    capture_output=True, text=True, check=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown", False
+    return commit, dirty
+
+
+def load_results(path=RESULTS_FILE):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def append_results(records, path=RESULTS_FILE):
+    with open(path, "a") as f:
+        for record in records:
+            f.write(json.dumps(record, sort_keys=True) + "\n")
+
+
+def baseline_for(record, history):
+    """Latest earlier result for the same stage, size and machine from a different commit."""
+    for old in reversed(history):
+        if (old["stage"], old["rows"], old["machine"]) == (record["stage"], record["rows"], record["machine"]) \
+                and old["commit"] != record["commit"]:
+            return old
+    return None
+
+
+def compare(records, history, tolerance=REGRESSION_TOLERANCE):
+    """Attach time/memory ratios against the baseline; returns the records that regressed."""
+    regressions = []
+    for record in records:
+        old = baseline_for(record, history)
+        if old is None:
+            continue
+        record["time_ratio"] = record["seconds"] / max(old["seconds"], 1e-9)
+        record["memory_ratio"] = record["peak_mb"] / max(old["peak_mb"], 1e-9)
+        record["baseline"] = old["commit"]
+        if max(record["time_ratio"], record["memory_ratio"]) > 1 + tolerance:
+            regressions.append(record)
+    return regressions
+
+
+def print_table(records):
+    print(f"{'stage':<24}{'rows':>12}{'seconds':>11}{'peak MB':>10}{'delta MB':>10}  vs baseline")
+    for r in records:
+        versus = ""
+        if "baseline" in r:
+            versus = f"{r['baseline']}: time x{r['time_ratio']:.2f}, memory x{r['memory_ratio']:.2f}"
+        print(f"{r['stage']:<24}{r['rows']:>12}{r['seconds']:>11.4f}{r['peak_mb']:>10.1f}{r['delta_mb']:>10.1f}  {versus}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the parsing, aggregation and reporting stages.")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="comma list of row counts, e.g. 1e3,1e4,1e8")
+    parser.add_argument("--stages", default=",".join(STAGES), help="comma list of: " + ", ".join(STAGES))
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement; the fastest is kept")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--tolerance", type=float, default=REGRESSION_TOLERANCE,
+                        help="flag time or memory growth above this fraction")
+    parser.add_argument("--results", default=RESULTS_FILE)
+    parser.add_argument("--no-save", action="store_true", help="do not append this run to the results file")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args()
+
+    sizes = [int(float(v)) for v in args.sizes.split(",")]
+    stages = [s for s in args.stages.split(",") if s]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(sorted(unknown))}")
+
+    commit, dirty = git_commit()
+    context = {"commit": commit, "dirty": dirty, "machine": platform.node(),
+               "python": platform.python_version(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S")}
+    records = []
+    for rows in sizes:
+        for stage in stages:
+            records.append({**context, "stage": stage, "rows": rows, **measure(stage, rows, args.repeat, args.seed)})
+
+    measured = [dict(r) for r in records]
+    regressions = compare(records, load_results(args.results), args.tolerance)
+    print(f"commit {commit}{' (dirty)' if dirty else ''}")
+    print_table(records)
+    if not args.no_save:
+        append_results(measured, args.results)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) above {args.tolerance:.0%}:")
+        for r in regressions:
+            print(f"  {r['stage']} @ {r['rows']} rows")
+        if args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+# aggregate.py
+# Per-distance RSSI summaries of the clear and wall experiments, shared by the plotting scripts.
+#
+# One groupby over (Experiment Type, Distance, Status) yields count, RSSI sum/min/max and
+# the calculated distance sum for every group. Those partials merge by adding counts and
+# sums and taking min/max, so a large dataset can be aggregated chunk by chunk, and every
+# experiment's summary table is derived from the same pass.
+#
+# The exporter also keeps Welford accumulators per group (summary_stats.json), updated per
+# reading; summaries of several shards or sessions come from merging those files:
+#   python aggregate.py .output/summary_stats.json other/.output/summary_stats.json [--save merged.json]
+
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "shared"))
+
+from dataset import EXPERIMENT_LABELS, iter_frames
+from running_stats import StatsTable
+
+KEYS = ['Experiment Type', 'Distance (meters)', 'Status']
+FIELDS = ['RSSI', 'Calculated Distance']
+COLUMNS = KEYS + FIELDS
+
+
+def partial(df):
+    """Mergeable per-(experiment, distance, status) aggregates of a frame of readings."""
+    df = df[COLUMNS]
+    if df['Calculated Distance'].dtype == np.float32:
+        # the dataset stores the firmware's 2-decimal values as float32; sum what the CSV would hold
+        df = df.assign(**{'Calculated Distance': df['Calculated Distance'].astype(np.float64).round(2)})
+    grouped = df.groupby(KEYS, observed=True, sort=False)
+    return grouped.agg(
+        count=('RSSI', 'size'),
+        rssi_sum=('RSSI', 'sum'),
+        rssi_min=('RSSI', 'min'),
+        rssi_max=('RSSI', 'max'),
+        calc_sum=('Calculated Distance', 'sum'),
+    )
+
+
+def combine(parts):
+    """Merge partials of several chunks into one."""
+    parts = list(parts)
+    if len(parts) == 1:
+        return parts[0]
+    grouped = pd.concat(parts).groupby(level=KEYS, observed=True, sort=False)
+    return grouped.agg({'count': 'sum', 'rssi_sum': 'sum', 'rssi_min': 'min', 'rssi_max': 'max', 'calc_sum': 'sum'})
+
+
+def aggregate(source, chunk_rows=None):
+    """Partials of a dataset directory or CSV hand-off file, read whole or `chunk_rows` rows at a time."""
+    kwargs = {} if chunk_rows is None else {'chunk_rows': chunk_rows}
+    return combine(partial(chunk) for chunk in iter_frames(source, COLUMNS, **kwargs))
+
+
+# ---------------------------
+# Incremental statistics
+# ---------------------------
+def new_stats():
+    """Welford accumulators per (experiment, distance, status) for RSSI and calculated distance."""
+    return StatsTable(KEYS, FIELDS)
+
+
+def update_stats(stats, reading):
+    """Add one export_txt_to_csv.Reading, O(1)."""
+    stats.update((EXPERIMENT_LABELS[reading.experiment], reading.distance, reading.status),
+                 **{'RSSI': reading.rssi, 'Calculated Distance': reading.calculated_distance})
+    return reading
+
+
+def stats_of(source, chunk_rows=None):
+    """Accumulators for a dataset directory or CSV file, for exports that predate the stats file."""
+    stats = new_stats()
+    kwargs = {} if chunk_rows is None else {'chunk_rows': chunk_rows}
+    for chunk in iter_frames(source, COLUMNS, **kwargs):
+        chunk = chunk.astype({'Experiment Type': str, 'Status': str})
+        if chunk['Distance (meters)'].dtype == np.float32:
+            # same keys and values as the parsed readings (float32 0.3 is not 0.3)
+            chunk['Distance (meters)'] = chunk['Distance (meters)'].astype(np.float64).round(6)
+            chunk['Calculated Distance'] = chunk['Calculated Distance'].astype(np.float64).round(2)
+        stats.update_frame(chunk)
+    return stats
+
+
+def from_stats(stats):
+    """The partials `summary` works on, from accumulators instead of raw readings."""
+    rows = [(key, group['RSSI'], group['Calculated Distance']) for key, group in stats.groups.items()
+            if group['RSSI'].count and key[1] is not None]
+    index = pd.MultiIndex.from_tuples([key for key, _, _ in rows], names=KEYS)
+    return pd.DataFrame({
+        'count': [rssi.count for _, rssi, _ in rows],
+        'rssi_sum': [rssi.sum for _, rssi, _ in rows],
+        'rssi_min': [int(rssi.min) for _, rssi, _ in rows],
+        'rssi_max': [int(rssi.max) for _, rssi, _ in rows],
+        'calc_sum': [calc.sum for _, _, calc in rows],
+    }, index=index)
+
+
+def summary(parts, experiment):
+    """
+    The summary table of one experiment: Min/Avg/Max RSSI, Avg Calc Distance and Success
+    Count over successful readings, and Failed Count, per distance (0 where a distance has none).
+    """
+    experiments = parts.index.get_level_values('Experiment Type')
+    rows = parts[experiments == experiment].droplevel('Experiment Type')
+    statuses = rows.index.get_level_values('Status')
+    success = rows[statuses == 'Success'].droplevel('Status').sort_index()
+    failed = rows[statuses == 'Failed'].droplevel('Status').sort_index()
+
+    stats = pd.DataFrame({
+        'min': success['rssi_min'],
+        'mean': success['rssi_sum'] / success['count'],
+        'max': success['rssi_max'],
+        'count': success['count'],
+        'calc': success['calc_sum'] / success['count'],
+    }).round(2)
+
+    return pd.DataFrame({
+        'Min RSSI': stats['min'],
+        'Avg RSSI': stats['mean'],
+        'Max RSSI': stats['max'],
+        'Avg Calc Distance': stats['calc'],
+        'Success Count': stats['count'],
+        'Failed Count': failed['count']
+    }).fillna(0)
+
+
+def summarize(source, experiments=('Clear', 'Wall'), chunk_rows=None):
+    """Summary tables of several experiments from one pass over `source` (a path, a DataFrame or a StatsTable)."""
+    if isinstance(source, StatsTable):
+        parts = from_stats(source)
+    elif isinstance(source, pd.DataFrame):
+        parts = partial(source)
+    else:
+        parts = aggregate(source, chunk_rows)
+    return {experiment: summary(parts, experiment) for experiment in experiments}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Merge summary statistics files and print the per-distance summaries.")
+    parser.add_argument("stats", nargs="+", help="summary_stats.json files written by export_txt_to_csv.py")
+    parser.add_argument("--save", help="also write the merged accumulators to this file")
+    args = parser.parse_args()
+
+    stats = new_stats()
+    for path in args.stats:
+        stats.merge(StatsTable.load(path))
+    if args.save:
+        stats.save(args.save)
+    for experiment, table in summarize(stats).items():
+        print(f"\n{experiment}\n{table.to_string()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+# dataset.py
+# Typed columnar store for calibration readings, replacing the CSV hand-off between stages.
+#
+# Layout: <dir>/schema.json plus one raw little-endian binary file per column.
+# Columns are opened with np.memmap, so a reader only touches the columns it asks for
+# and nothing is parsed. Categorical columns are stored as integer codes; their labels
+# live in the schema. New rows are appended in place, which lets the resumable export
+# in export_txt_to_csv grow the store without rewriting it.
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+DATASET_DIR = "dataset"
+SCHEMA_FILE = "schema.json"
+SCHEMA_VERSION = 1
+CHUNK_ROWS = 65536
+
+EXPERIMENT_LABELS = {"clear": "Clear", "wall": "Wall", "moving": "Moving"}
+
+# column name (matches the CSV headers) -> storage definition
+COLUMNS = {
+    "Experiment Type": {"file": "experiment.bin", "dtype": "u1", "categories": ["Clear", "Wall", "Moving"]},
+    "Distance (meters)": {"file": "distance.bin", "dtype": "<f4"},      # NaN for moving readings
+    "Reading Number": {"file": "reading_number.bin", "dtype": "<i4"},
+    "RSSI": {"file": "rssi.bin", "dtype": "i1"},                        # dBm, 0 for failed scans
+    "Calculated Distance": {"file": "calculated_distance.bin", "dtype": "<f4"},
+    "Status": {"file": "status.bin", "dtype": "u1", "categories": ["Success", "Failed"]},
+}
+
+# Present only in datasets merged from several captures
+SOURCE_COLUMNS = {
+    "Source File": {"file": "source.bin", "dtype": "<u4"},
+    "Session": {"file": "session.bin", "dtype": "<u4"},
+}
+
+
+def is_dataset(path):
+    return os.path.isfile(os.path.join(path, SCHEMA_FILE))
+
+
+def read_schema(path):
+    with open(os.path.join(path, SCHEMA_FILE)) as f:
+        schema = json.load(f)
+    if schema.get("version") != SCHEMA_VERSION:
+        raise ValueError(f"Unsupported dataset version {schema.get('version')} in {path}")
+    return schema
+
+
+def write_schema(path, schema):
+    tmp_path = os.path.join(path, SCHEMA_FILE + ".tmp")
+    with open(tmp_path, 'w') as f:
+        json.dump(schema, f, indent=2)
+    os.replace(tmp_path, os.path.join(path, SCHEMA_FILE))
+
+
+def new_schema(sources=None, sessions=None):
+    columns = {name: dict(spec) for name, spec in COLUMNS.items()}
+    if sources is not None:
+        columns["Source File"] = dict(SOURCE_COLUMNS["Source File"], categories=list(sources))
+        columns["Session"] = dict(SOURCE_COLUMNS["Session"], categories=list(sessions))
+    return {"version": SCHEMA_VERSION, "rows": 0, "columns": columns}
+
+
+# ---------------------------
+# Writing
+# ---------------------------
+class DatasetWriter:
+    """
+    Append Reading records (see export_txt_to_csv.Reading) to a dataset in fixed-size chunks.
+    Use as a context manager; the row count in the schema is only committed on a clean exit.
+    """
+
+    def __init__(self, path, append=False):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        if append and is_dataset(path):
+            self.schema = read_schema(path)
+        else:
+            self.schema = new_schema()
+            append = False
+        self.files = {}
+        for name in COLUMNS:
+            file_path = os.path.join(path, self.schema["columns"][name]["file"])
+            self.files[name] = open(file_path, 'ab' if append else 'wb')
+            if append:
+                # drop bytes an aborted writer left past the committed rows
+                self.files[name].truncate(self.schema["rows"] * np.dtype(COLUMNS[name]["dtype"]).itemsize)
+        self._reset_buffer()
+
+    def _reset_buffer(self):
+        self.buffer = {name: [] for name in COLUMNS}
+
+    def append(self, reading):
+        b = self.buffer
+        b["Experiment Type"].append(COLUMNS["Experiment Type"]["categories"].index(EXPERIMENT_LABELS[reading.experiment]))
+        b["Distance (meters)"].append(np.nan if reading.distance is None else reading.distance)
+        b["Reading Number"].append(reading.reading_number)
+        b["RSSI"].append(reading.rssi)
+        b["Calculated Distance"].append(reading.calculated_distance)
+        b["Status"].append(COLUMNS["Status"]["categories"].index(reading.status))
+        if len(b["RSSI"]) >= CHUNK_ROWS:
+            self.flush()
+
+    def passthrough(self, readings):
+        """Store every reading while handing it on, so one pass can feed several sinks."""
+        for reading in readings:
+            self.append(reading)
+            yield reading
+
+    def flush(self):
+        n = len(self.buffer["RSSI"])
+        if not n:
+            return
+        for name, values in self.buffer.items():
+            self.files[name].write(np.asarray(values, dtype=COLUMNS[name]["dtype"]).tobytes())
+        self.schema["rows"] += n
+        self._reset_buffer()
+
+    def close(self, commit=True):
+        if commit:
+            self.flush()
+        for f in self.files.values():
+            f.close()
+        if commit:
+            write_schema(self.path, self.schema)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close(commit=exc_type is None)
+
+
+def concat_datasets(parts, path, sources, sessions):
+    """
+    Merge per-capture datasets into one, in the given order, tagging rows with their
+    source file and session. `parts` is a list of (part_path, source, session).
+    Column files are concatenated byte for byte, so nothing is decoded.
+    """
+    os.makedirs(path, exist_ok=True)
+    schema = new_schema(sources, sessions)
+    source_codes = {s: i for i, s in enumerate(sources)}
+    session_codes = {s: i for i, s in enumerate(sessions)}
+
+    outputs = {name: open(os.path.join(path, spec["file"]), 'wb') for name, spec in schema["columns"].items()}
+    try:
+        for part_path, source, session in parts:
+            rows = read_schema(part_path)["rows"]
+            for name in COLUMNS:
+                # only the committed rows; an aborted append may have left more bytes behind
+                remaining = rows * np.dtype(COLUMNS[name]["dtype"]).itemsize
+                with open(os.path.join(part_path, COLUMNS[name]["file"]), 'rb') as part:
+                    while remaining and (chunk := part.read(min(1 << 20, remaining))):
+                        outputs[name].write(chunk)
+                        remaining -= len(chunk)
+            outputs["Source File"].write(np.full(rows, source_codes[source], dtype=SOURCE_COLUMNS["Source File"]["dtype"]).tobytes())
+            outputs["Session"].write(np.full(rows, session_codes[session], dtype=SOURCE_COLUMNS["Session"]["dtype"]).tobytes())
+            schema["rows"] += rows
+    finally:
+        for f in outputs.values():
+            f.close()
+    write_schema(path, schema)
+    return schema["rows"]
+
+
+# ---------------------------
+# Reading
+# ---------------------------
+def open_columns(path, columns=None):
+    """Memory-map the requested columns (all by default) without copying. Returns (schema, {name: array})."""
+    schema = read_schema(path)
+    names = list(schema["columns"]) if columns is None else list(columns)
+    arrays = {}
+    for name in names:
+        spec = schema["columns"][name]
+        if schema["rows"] == 0:
+            arrays[name] = np.empty(0, dtype=spec["dtype"])
+        else:
+            arrays[name] = np.memmap(os.path.join(path, spec["file"]), dtype=spec["dtype"], mode='r', shape=(schema["rows"],))
+    return schema, arrays
+
+
+def _codes_for(spec, labels):
+    if isinstance(labels, str):
+        labels = [labels]
+    return [spec["categories"].index(label) for label in labels if label in spec["categories"]]
+
+
+def load(path, columns=None, experiment=None, status=None):
+    """
+    Load a dataset as a DataFrame with the same column names as the CSV hand-off.
+    Only `columns` are read; `experiment` and `status` (a label or list of labels)
+    filter rows on the stored codes before anything else is materialised.
+    """
+    schema = read_schema(path)
+    names = list(schema["columns"]) if columns is None else list(columns)
+    filters = [(name, labels) for name, labels in (("Experiment Type", experiment), ("Status", status)) if labels is not None]
+
+    _, arrays = open_columns(path, set(names) | {name for name, _ in filters})
+    mask = None
+    for name, labels in filters:
+        selected = np.isin(arrays[name], _codes_for(schema["columns"][name], labels))
+        mask = selected if mask is None else mask & selected
+
+    data = {}
+    for name in names:
+        values = arrays[name] if mask is None else arrays[name][mask]
+        categories = schema["columns"][name].get("categories")
+        if categories is not None:
+            values = pd.Categorical.from_codes(values, categories=categories)
+        data[name] = values
+    return pd.DataFrame(data, columns=names, copy=False)
+
+
+def csv_dtypes(columns=None):
+    """read_csv dtypes matching the dataset schema, so CSV hand-off files load as compactly as a dataset."""
+    names = COLUMNS if columns is None else [name for name in columns if name in COLUMNS]
+    return {name: pd.CategoricalDtype(COLUMNS[name]["categories"]) if "categories" in COLUMNS[name]
+            else np.dtype(COLUMNS[name]["dtype"]) for name in names}
+
+
+def resolve(csv_path, output_dir=".output"):
+    """Prefer the columnar dataset next to a CSV hand-off file when one has been exported."""
+    path = os.path.join(output_dir, DATASET_DIR)
+    return path if is_dataset(path) else csv_path
+
+
+def read_frame(source, columns=None, experiment=None, status=None):
+    """Load readings from a dataset directory or, for older exports, from one of the CSV files."""
+    if is_dataset(source):
+        return load(source, columns, experiment=experiment, status=status)
+    filters = [(name, labels) for name, labels in (("Experiment Type", experiment), ("Status", status)) if labels is not None]
+    usecols = None if columns is None else list(dict.fromkeys(list(columns) + [name for name, _ in filters]))
+    df = pd.read_csv(source, usecols=usecols, dtype=csv_dtypes(usecols))
+    for name, labels in filters:
+        df = df[df[name].isin([labels] if isinstance(labels, str) else labels)]
+    return df if columns is None else df[list(columns)]
+
+
+def iter_frames(source, columns=None, chunk_rows=CHUNK_ROWS * 16, experiment=None, status=None):
+    """
+    Yield a dataset or CSV hand-off file as DataFrames of at most `chunk_rows` rows,
+    keeping only rows of `experiment` and `status` (a label or list of labels) as read_frame does.
+    """
+    filters = [(name, labels) for name, labels in (("Experiment Type", experiment), ("Status", status)) if labels is not None]
+    if not is_dataset(source):
+        usecols = None if columns is None else list(dict.fromkeys(list(columns) + [name for name, _ in filters]))
+        for df in pd.read_csv(source, usecols=usecols, dtype=csv_dtypes(usecols), chunksize=chunk_rows):
+            for name, labels in filters:
+                df = df[df[name].isin([labels] if isinstance(labels, str) else labels)]
+            yield df if columns is None else df[list(columns)]
+        return
+    schema, arrays = open_columns(source, None if columns is None else set(columns) | {name for name, _ in filters})
+    names = list(arrays) if columns is None else list(columns)
+    for start in range(0, schema["rows"], chunk_rows):
+        mask = None
+        for name, labels in filters:
+            selected = np.isin(arrays[name][start:start + chunk_rows], _codes_for(schema["columns"][name], labels))
+            mask = selected if mask is None else mask & selected
+        data = {}
+        for name in names:
+            values = np.asarray(arrays[name][start:start + chunk_rows])
+            if mask is not None:
+                values = values[mask]
+            categories = schema["columns"][name].get("categories")
+            data[name] = pd.Categorical.from_codes(values, categories=categories) if categories is not None else values
+        yield pd.DataFrame(data, columns=names, copy=False)
@@ -1,10 +1,22 @@
 # export_for_figs.py
 # Exports data + style so Octave can rebuild identical-looking figures and save .fig files.
 
+import argparse
+import json
 import os, numpy as np, pandas as pd
+import sys
 import matplotlib.pyplot as plt
 from scipy.stats import linregress
-from scipy.io import savemat
+from scipy.io import loadmat, savemat
+from scipy.io.matlab import MatReadError
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "shared"))
+
+from aggregate import summarize
+from dataset import read_frame, resolve
+from downsample import integer_ticks, line, pixel_size, points, tick_step
+from figure_cache import FigureCache, content_key
+from plotting import OUTPUT, add_arguments, configure, finish, render_all
 
 EXPORT_DIR = "./.output/fig_exports"
 os.makedirs(EXPORT_DIR, exist_ok=True)
@@ -68,159 +80,170 @@ STYLE = {
 }
 # -----------------------------------------------------
 
+LOAD_COLUMNS = ['Distance (meters)', 'RSSI', 'Calculated Distance', 'Status', 'Experiment Type']
+MOVING_COLUMNS = ['Reading Number', 'RSSI', 'Status']
+
 
 def load_and_process_data(file_path, experiment_type):
-    df = pd.read_csv(file_path)
-    df_exp = df[df['Experiment Type'] == experiment_type]
-    df_success = df_exp[df_exp['Status'] == 'Success']
-
-    stats = df_success.groupby('Distance (meters)').agg({
-        'RSSI': ['min', 'mean', 'max', 'count'],
-        'Calculated Distance': 'mean'
-    }).round(2)
-
-    failed_counts = df_exp[df_exp['Status'] == 'Failed'] \
-                        .groupby('Distance (meters)').size()
-
-    summary = pd.DataFrame({
-        'Min RSSI': stats['RSSI']['min'],
-        'Avg RSSI': stats['RSSI']['mean'],
-        'Max RSSI': stats['RSSI']['max'],
-        'Avg Calc Distance': stats['Calculated Distance']['mean'],
-        'Success Count': stats['RSSI']['count'],
-        'Failed Count': failed_counts
-    }).fillna(0)
+    df_exp = read_frame(file_path, LOAD_COLUMNS, experiment=experiment_type)
+    summary = summarize(df_exp, [experiment_type])[experiment_type]
 
     summary.index = summary.index.astype(float)
     return summary, df_exp
 
 
-def export_errorbar_mat(summary, title, base):
-    x = summary.index.values.astype(float)
-    avg = summary['Avg RSSI'].values.astype(float)
-    ymin = summary['Min RSSI'].values.astype(float)
-    ymax = summary['Max RSSI'].values.astype(float)
-    yerr_lower = avg - ymin
-    yerr_upper = ymax - avg
-
-    xticks_vec = np.arange(np.nanmin(x), np.nanmax(x) + STYLE["xtick_step"], STYLE["xtick_step"], dtype=float)
-
-    savemat(os.path.join(EXPORT_DIR, f"{base}_errorbar.mat"), {
-        # data
-        'x': x, 'avg': avg,
-        'yerr_lower': yerr_lower, 'yerr_upper': yerr_upper,
-        # labels / titles
-        'xlabel': STYLE["labels"]["xlabel_rssi"],
-        'ylabel': STYLE["labels"]["ylabel_rssi"],
-        'title': f'{title} - Min/Average/Max RSSI Values',
-        'legend_rssi': STYLE["errorbar"]["label"],
-        # style
-        'fig_w': float(STYLE["fig_size_px"][0]), 'fig_h': float(STYLE["fig_size_px"][1]),
-        'grid_linestyle': STYLE["grid_linestyle"],
-        'color_err_r': float(STYLE["errorbar"]["color_rgb"][0]),
-        'color_err_g': float(STYLE["errorbar"]["color_rgb"][1]),
-        'color_err_b': float(STYLE["errorbar"]["color_rgb"][2]),
-        'err_capsize': float(STYLE["errorbar"]["capsize"]),
-        'err_marker_size': float(STYLE["errorbar"]["marker_size"]),
-        'err_line_width': float(STYLE["errorbar"]["line_width"]),
-        'xticks_vec': xticks_vec,
-    })
+# ---------- Octave bundle ----------
+# One compressed .mat per run: `style` holds the shared style once, `clear`/`wall` hold an
+# errorbar, scatter and regression struct each and `moving` the moving-experiment struct.
+# `bundle_keys` records a content key per experiment, so a re-export rebuilds only the experiments
+# whose inputs changed and carries the others over from the previous bundle.
+BUNDLE_FILE = "fig_bundle.mat"
 
 
-def export_scatter_mat(df_exp, summary, title, base):
-    s = df_exp[df_exp['Status'] == 'Success']
-    f = df_exp[df_exp['Status'] == 'Failed']
+def _floats(values):
+    """A column or index as a float64 array, without a copy when it already is one."""
+    return np.asarray(values.to_numpy(dtype=np.float64, copy=False))
 
-    dist_vals = summary.index.values.astype(float)
-    avg_at_dist = summary['Avg RSSI'].values.astype(float)
 
-    # y offset for text annotations (simulate ~ "xytext=(0,50)" in data units)
-    if avg_at_dist.size:
-        y_off = (np.nanmax(avg_at_dist) - np.nanmin(avg_at_dist)) * STYLE["annotation"]["y_offset_frac"]
-    else:
-        y_off = 0.0
-
-    xticks_vec = np.arange(np.nanmin(dist_vals) if dist_vals.size else 0,
-                           (np.nanmax(dist_vals) if dist_vals.size else 0) + STYLE["xtick_step"],
-                           STYLE["xtick_step"], dtype=float)
-
-    savemat(os.path.join(EXPORT_DIR, f"{base}_scatter.mat"), {
-        # data
-        'sx': s['Distance (meters)'].values.astype(float),
-        'sy': s['RSSI'].values.astype(float),
-        'fx': f['Distance (meters)'].values.astype(float),
-        'fy': f['RSSI'].values.astype(float),
-        'dist_vals': dist_vals,
-        'avg_at_dist': avg_at_dist,
-        'succ_cnt': summary['Success Count'].values.astype(int),
-        'fail_cnt': summary['Failed Count'].values.astype(int),
-        'y_off': float(y_off),
-        # labels / titles
-        'xlabel': STYLE["labels"]["xlabel_rssi"],
-        'ylabel': STYLE["labels"]["ylabel_rssi"],
-        'title': f'{title} - Success/Failed RSSI Markers',
-        'legend_success': STYLE["scatter_success"]["label"],
-        'legend_failed': STYLE["scatter_failed"]["label"],
-        # style
+def _ticks(values):
+    lo, hi = (np.nanmin(values), np.nanmax(values)) if values.size else (0, 0)
+    step = STYLE["xtick_step"] * tick_step(0, (hi - lo) / STYLE["xtick_step"])
+    return np.arange(lo, hi + step, step, dtype=float)
+
+
+def style_struct():
+    def rgb(name):
+        return np.array(STYLE[name]["color_rgb"], dtype=float)
+    return {
         'fig_w': float(STYLE["fig_size_px"][0]), 'fig_h': float(STYLE["fig_size_px"][1]),
         'grid_linestyle': STYLE["grid_linestyle"],
-        'sc_s_r': float(STYLE["scatter_success"]["color_rgb"][0]),
-        'sc_s_g': float(STYLE["scatter_success"]["color_rgb"][1]),
-        'sc_s_b': float(STYLE["scatter_success"]["color_rgb"][2]),
+        'err_color': rgb("errorbar"),
+        'err_capsize': float(STYLE["errorbar"]["capsize"]),
+        'err_marker_size': float(STYLE["errorbar"]["marker_size"]),
+        'err_line_width': float(STYLE["errorbar"]["line_width"]),
+        'sc_s_color': rgb("scatter_success"),
         'sc_s_alpha': float(STYLE["scatter_success"]["alpha"]),
         'sc_s_size': float(STYLE["scatter_success"]["size_pts2"]),
-        'sc_s_marker': 'o',
-        'sc_f_r': float(STYLE["scatter_failed"]["color_rgb"][0]),
-        'sc_f_g': float(STYLE["scatter_failed"]["color_rgb"][1]),
-        'sc_f_b': float(STYLE["scatter_failed"]["color_rgb"][2]),
+        'sc_s_marker': STYLE["scatter_success"]["marker"],
+        'sc_f_color': rgb("scatter_failed"),
         'sc_f_alpha': float(STYLE["scatter_failed"]["alpha"]),
         'sc_f_size': float(STYLE["scatter_failed"]["size_pts2"]),
-        'sc_f_marker': 'x',
-        'xticks_vec': xticks_vec,
-        'text_bg_r': float(STYLE["annotation"]["bg_rgb"][0]),
-        'text_bg_g': float(STYLE["annotation"]["bg_rgb"][1]),
-        'text_bg_b': float(STYLE["annotation"]["bg_rgb"][2]),
-    })
+        'sc_f_marker': STYLE["scatter_failed"]["marker"],
+        'reg_color': rgb("regression"),
+        'reg_lw': float(STYLE["regression"]["line_width"]),
+        'mv_color': rgb("moving_avg"),
+        'mv_lw': float(STYLE["moving_avg"]["line_width"]),
+        'text_bg_color': np.array(STYLE["annotation"]["bg_rgb"], dtype=float),
+        'xlabel_rssi': STYLE["labels"]["xlabel_rssi"],
+        'ylabel_rssi': STYLE["labels"]["ylabel_rssi"],
+        'xlabel_moving': STYLE["labels"]["xlabel_moving"],
+        'ylabel_moving': STYLE["labels"]["ylabel_moving"],
+        'legend_rssi': STYLE["errorbar"]["label"],
+        'legend_success': STYLE["scatter_success"]["label"],
+        'legend_failed': STYLE["scatter_failed"]["label"],
+        'legend_avg': STYLE["moving_avg"]["label"],
+    }
 
 
-def export_regression_mat(df_exp, title, base):
-    s = df_exp[df_exp['Status'] == 'Success']
-    sx = s['Distance (meters)'].values.astype(float)
-    sy = s['RSSI'].values.astype(float)
+def rssi_structs(summary, title, df_exp):
+    """The errorbar, scatter and regression data of one experiment."""
+    x = _floats(summary.index)
+    avg = _floats(summary['Avg RSSI'])
+    success = (df_exp['Status'] == 'Success').to_numpy()
+    failed = (df_exp['Status'] == 'Failed').to_numpy()
+    distance = _floats(df_exp['Distance (meters)'])
+    rssi = _floats(df_exp['RSSI'])
+    sx, sy = distance[success], rssi[success]
+
+    # y offset for text annotations (simulate ~ "xytext=(0,50)" in data units)
+    y_off = (np.nanmax(avg) - np.nanmin(avg)) * STYLE["annotation"]["y_offset_frac"] if avg.size else 0.0
     slope, intercept = (np.nan, np.nan)
     if sx.size >= 2:
         slope, intercept, *_ = linregress(sx, sy)
 
-    xticks_vec = np.arange(np.nanmin(sx) if sx.size else 0,
-                           (np.nanmax(sx) if sx.size else 0) + STYLE["xtick_step"],
-                           STYLE["xtick_step"], dtype=float)
-
-    savemat(os.path.join(EXPORT_DIR, f"{base}_regression.mat"), {
-        # data
-        'sx': sx, 'sy': sy,
-        'slope': float(slope), 'intercept': float(intercept),
-        # labels / titles
-        'xlabel': STYLE["labels"]["xlabel_rssi"],
-        'ylabel': STYLE["labels"]["ylabel_rssi"],
-        'title': f'{title} - Regression Line for Success RSSI',
-        # style
-        'fig_w': float(STYLE["fig_size_px"][0]), 'fig_h': float(STYLE["fig_size_px"][1]),
-        'grid_linestyle': STYLE["grid_linestyle"],
-        'reg_r': float(STYLE["regression"]["color_rgb"][0]),
-        'reg_g': float(STYLE["regression"]["color_rgb"][1]),
-        'reg_b': float(STYLE["regression"]["color_rgb"][2]),
-        'reg_lw': float(STYLE["regression"]["line_width"]),
-        'sc_s_r': float(STYLE["scatter_success"]["color_rgb"][0]),
-        'sc_s_g': float(STYLE["scatter_success"]["color_rgb"][1]),
-        'sc_s_b': float(STYLE["scatter_success"]["color_rgb"][2]),
-        'sc_s_alpha': float(STYLE["scatter_success"]["alpha"]),
-        'sc_s_size': float(STYLE["scatter_success"]["size_pts2"]),
-        'sc_s_marker': 'o',
-        'xticks_vec': xticks_vec,
-    })
+    return {
+        'errorbar': {
+            'x': x, 'avg': avg,
+            'yerr_lower': avg - _floats(summary['Min RSSI']),
+            'yerr_upper': _floats(summary['Max RSSI']) - avg,
+            'title': f'{title} - Min/Average/Max RSSI Values',
+            'xticks_vec': _ticks(x),
+        },
+        'scatter': {
+            'sx': sx, 'sy': sy,
+            'fx': distance[failed], 'fy': rssi[failed],
+            'dist_vals': x,
+            'avg_at_dist': avg,
+            'succ_cnt': summary['Success Count'].to_numpy(dtype=int),
+            'fail_cnt': summary['Failed Count'].to_numpy(dtype=int),
+            'y_off': float(y_off),
+            'title': f'{title} - Success/Failed RSSI Markers',
+            'xticks_vec': _ticks(x),
+        },
+        'regression': {
+            'sx': sx, 'sy': sy,
+            'slope': float(slope), 'intercept': float(intercept),
+            'title': f'{title} - Regression Line for Success RSSI',
+            'xticks_vec': _ticks(sx),
+        },
+    }
+
+
+def moving_struct(df):
+    success = df[df['Status'] == 'Success']
+    failed = df['Status'] == 'Failed'
+    avg = success.groupby('Reading Number')['RSSI'].mean()
+    rx = _floats(avg.index)
+    return {
+        'rx': rx,
+        'avg': _floats(avg),
+        'fx': _floats(df.loc[failed, 'Reading Number']),
+        'fy': _floats(df.loc[failed, 'RSSI']),
+        'title': 'Moving Experiment - RSSI Over Time',
+        'xticks_vec': _ticks(rx),
+    }
+
+
+def export_bundle(experiments, path=None):
+    """
+    Write {name: (struct builder, args)} and the shared style to one compressed .mat file.
+    Only experiments whose inputs changed are built; the others are carried over from the
+    previous bundle as stored. Returns the changed names; nothing is written when none did.
+    """
+    path = path or os.path.join(EXPORT_DIR, BUNDLE_FILE)
+    style = json.dumps(STYLE, sort_keys=True, default=str)
+    keys = {name: content_key(func, args, style) for name, (func, args) in experiments.items()}
+
+    previous = {}
+    if os.path.exists(path):
+        try:
+            stored = loadmat(path, variable_names=['bundle_keys'], squeeze_me=True, struct_as_record=False)
+            previous = {name: getattr(stored['bundle_keys'], name, None) for name in keys}
+        except (KeyError, ValueError, OSError, MatReadError):     # unreadable or pre-bundle file
+            previous = {}
+    changed = [name for name in keys if previous.get(name) != keys[name]]
+    if not changed:
+        return []
+
+    contents = {}
+    unchanged = [name for name in keys if name not in changed]
+    if unchanged:
+        # raw (unsqueezed) structs, which savemat writes back as they were
+        contents = loadmat(path, variable_names=unchanged)
+        contents = {name: contents[name] for name in unchanged}
+    contents.update({name: func(*args) for name, (func, args) in experiments.items() if name in changed})
+    contents['style'] = style_struct()
+    contents['bundle_keys'] = keys
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        # MATLAB v7 with zlib-compressed variables; Octave's load() reads it natively
+        savemat(f, contents, do_compression=True, long_field_names=True)
+    os.replace(tmp_path, path)
+    return changed
 
 
 def plot_rssi_stats(summary, title, df_exp, base):
+    figures = []
     # ------- Python visuals (unchanged look) -------
     # Error bar
     plt.figure(figsize=(10,6))
@@ -235,7 +258,8 @@ def plot_rssi_stats(summary, title, df_exp, base):
     plt.xticks(np.arange(min(summary.index), max(summary.index) + 1, 1))
     plt.grid(True, linestyle=STYLE["grid_linestyle"], alpha=STYLE["grid_alpha"])
     plt.xlabel(STYLE["labels"]["xlabel_rssi"]); plt.ylabel(STYLE["labels"]["ylabel_rssi"])
-    plt.title(f'{title} - Min/Average/Max RSSI Values'); plt.legend(); plt.tight_layout(); plt.show()
+    plt.title(f'{title} - Min/Average/Max RSSI Values'); plt.legend(); plt.tight_layout()
+    figures.append(finish(f'{base}_errorbar.png', save=False))
 
     # Scatter S/F with annotations
     s = df_exp[df_exp['Status'] == 'Success']
@@ -251,82 +275,82 @@ def plot_rssi_stats(summary, title, df_exp, base):
     plt.xticks(np.arange(min(summary.index), max(summary.index) + 1, 1))
     plt.grid(True, linestyle=STYLE["grid_linestyle"], alpha=STYLE["grid_alpha"])
     plt.xlabel(STYLE["labels"]["xlabel_rssi"]); plt.ylabel(STYLE["labels"]["ylabel_rssi"])
-    plt.title(f'{title} - Success/Failed RSSI Markers'); plt.legend(); plt.tight_layout(); plt.show()
+    plt.title(f'{title} - Success/Failed RSSI Markers'); plt.legend(); plt.tight_layout()
+    figures.append(finish(f'{base}_scatter.png', save=False))
 
     # Regression
     plt.figure(figsize=(10,6))
     if len(s) >= 2:
-        slope, intercept, *_ = linregress(s['Distance (meters)'], s['RSSI'])
-        rx = np.linspace(s['Distance (meters)'].min(), s['Distance (meters)'].max(), 100)
+        # fit in float64: distances load as float32, RSSI as int8
+        sx, sy = s['Distance (meters)'].to_numpy(np.float64), s['RSSI'].to_numpy(np.float64)
+        slope, intercept, *_ = linregress(sx, sy)
+        rx = np.linspace(sx.min(), sx.max(), 100)
         plt.plot(rx, slope*rx+intercept, color='blue', label='Regression Line', linewidth=2)
     plt.scatter(s['Distance (meters)'], s['RSSI'], color='green', label='Success', alpha=0.7)
     plt.xticks(np.arange(min(summary.index), max(summary.index) + 1, 1))
     plt.grid(True, linestyle=STYLE["grid_linestyle"], alpha=STYLE["grid_alpha"])
     plt.xlabel(STYLE["labels"]["xlabel_rssi"]); plt.ylabel(STYLE["labels"]["ylabel_rssi"])
-    plt.title(f'{title} - Regression Line for Success RSSI'); plt.legend(); plt.tight_layout(); plt.show()
+    plt.title(f'{title} - Regression Line for Success RSSI'); plt.legend(); plt.tight_layout()
+    figures.append(finish(f'{base}_regression.png', save=False))
+    return figures
 
-    # ------- Export for Octave/MATLAB -------
-    export_errorbar_mat(summary, title, base)
-    export_scatter_mat(df_exp, summary, title, base)
-    export_regression_mat(df_exp, title, base)
 
+def load_moving(file_path):
+    return read_frame(file_path, MOVING_COLUMNS, experiment='Moving')
 
-def plot_moving_experiment(file_path, base='moving'):
-    df = pd.read_csv(file_path)
+
+def plot_moving_experiment(df, base='moving'):
+    if not isinstance(df, pd.DataFrame):
+        df = load_moving(df)
     df_success = df[df['Status'] == 'Success']
     df_failed  = df[df['Status'] == 'Failed']
     stats = df_success.groupby('Reading Number').agg({'RSSI':['mean']})
 
-    # Python plot (original look)
-    plt.figure(figsize=(10,6))
-    plt.plot(stats.index, stats['RSSI']['mean'], STYLE["moving_avg"]["fmt"],
+    # Python plot (original look), reduced to what the output pixels can show
+    fig = plt.figure(figsize=(10,6))
+    width, height = pixel_size(fig, OUTPUT["dpi"])
+    plt.plot(*line(stats.index, stats['RSSI']['mean'], width), STYLE["moving_avg"]["fmt"],
              color=(0/255,0/255,139/255), label=STYLE["moving_avg"]["label"])
     if not df_failed.empty:
-        plt.scatter(df_failed['Reading Number'], df_failed['RSSI'], color='red', label='Failed', marker='x')
-    plt.xticks(np.arange(int(df['Reading Number'].min()), int(df['Reading Number'].max()) + 1, 1))
+        plt.scatter(*points(df_failed['Reading Number'], df_failed['RSSI'], width, height),
+                    color='red', label='Failed', marker='x')
+    integer_ticks(plt.gca(), int(df['Reading Number'].min()), int(df['Reading Number'].max()))
     plt.grid(True, linestyle=STYLE["grid_linestyle"], alpha=STYLE["grid_alpha"])
     plt.xlabel(STYLE["labels"]["xlabel_moving"]); plt.ylabel(STYLE["labels"]["ylabel_moving"])
-    plt.title('Moving Experiment - RSSI Over Time'); plt.legend(); plt.tight_layout(); plt.show()
-
-    # Export for Octave/MATLAB (with style)
-    rx = stats.index.values.astype(float)
-    xticks_vec = np.arange(np.nanmin(rx) if rx.size else 0,
-                           (np.nanmax(rx) if rx.size else 0) + STYLE["xtick_step"],
-                           STYLE["xtick_step"], dtype=float)
-
-    savemat(os.path.join(EXPORT_DIR, f'{base}_moving.mat'), {
-        'rx': rx,
-        'avg': stats['RSSI']['mean'].values.astype(float),
-        'fx': df_failed['Reading Number'].values.astype(float),
-        'fy': df_failed['RSSI'].values.astype(float),
-        # labels / titles
-        'xlabel': STYLE["labels"]["xlabel_moving"],
-        'ylabel': STYLE["labels"]["ylabel_moving"],
-        'title': 'Moving Experiment - RSSI Over Time',
-        'legend_avg': STYLE["moving_avg"]["label"],
-        'legend_failed': STYLE["scatter_failed"]["label"],
-        # style
-        'fig_w': float(STYLE["fig_size_px"][0]), 'fig_h': float(STYLE["fig_size_px"][1]),
-        'grid_linestyle': STYLE["grid_linestyle"],
-        'mv_r': float(STYLE["moving_avg"]["color_rgb"][0]),
-        'mv_g': float(STYLE["moving_avg"]["color_rgb"][1]),
-        'mv_b': float(STYLE["moving_avg"]["color_rgb"][2]),
-        'mv_lw': float(STYLE["moving_avg"]["line_width"]),
-        'xticks_vec': xticks_vec,
-        'fail_r': float(STYLE["scatter_failed"]["color_rgb"][0]),
-        'fail_g': float(STYLE["scatter_failed"]["color_rgb"][1]),
-        'fail_b': float(STYLE["scatter_failed"]["color_rgb"][2]),
-        'fail_size': float(STYLE["scatter_failed"]["size_pts2"]),
-        'fail_alpha': float(STYLE["scatter_failed"]["alpha"]),
-    })
-
-
-# ---- Run like your original flow ----
-clear_summary, clear_data = load_and_process_data('./.output/clear_path_experiment.csv', 'Clear')
-plot_rssi_stats(clear_summary, 'Clear Path', clear_data, base='clear')
+    plt.title('Moving Experiment - RSSI Over Time'); plt.legend(); plt.tight_layout()
+    return [finish(f'{base}_moving.png', save=False)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Plot the calibration experiments and export the .mat bundle for Octave.")
+    add_arguments(parser)
+    args = parser.parse_args()
+    configure(args.batch, args.out, args.dpi)
+
+    # ---- Run like your original flow ----
+    clear_summary, clear_data = load_and_process_data(resolve('./.output/clear_path_experiment.csv'), 'Clear')
+    wall_summary, wall_data = load_and_process_data(resolve('./.output/wall_experiment.csv'), 'Wall')
+
+    moving_data = load_moving(resolve('./.output/moving_experiment.csv'))
+
+    # Each experiment's figures are independent of the others
+    cache = FigureCache(args.out, "export_for_figs", STYLE) if args.batch and not args.no_cache else None
+    render_all([
+        (plot_rssi_stats, (clear_summary, 'Clear Path', clear_data, 'clear')),
+        (plot_rssi_stats, (wall_summary, 'Wall Path', wall_data, 'wall')),
+        (plot_moving_experiment, (moving_data, 'moving')),
+    ], args.workers, cache)
+
+    experiments = {
+        'clear': (rssi_structs, (clear_summary, 'Clear Path', clear_data)),
+        'wall': (rssi_structs, (wall_summary, 'Wall Path', wall_data)),
+        'moving': (moving_struct, (moving_data,)),
+    }
+    changed = export_bundle(experiments)
+    reused = len(experiments) - len(changed)
+    print(f"\nMAT bundle exported to: {os.path.abspath(os.path.join(EXPORT_DIR, BUNDLE_FILE))} "
+          f"({len(changed)} experiments rebuilt, {reused} unchanged carried over)")
 
-wall_summary, wall_data = load_and_process_data('./.output/wall_experiment.csv', 'Wall')
-plot_rssi_stats(wall_summary, 'Wall Path', wall_data, base='wall')
 
-plot_moving_experiment('./.output/moving_experiment.csv', base='moving')
-print(f"\nMAT bundles exported to: {os.path.abspath(EXPORT_DIR)}")
+if __name__ == "__main__":
+    main()
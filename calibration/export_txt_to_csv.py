@@ -1,6 +1,144 @@
+import argparse
 import csv
-import re
+import glob
+import hashlib
+import json
 import os
+import re
+import shutil
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "shared"))
+
+from aggregate import new_stats, stats_of, update_stats
+from dataset import DATASET_DIR, DatasetWriter, concat_datasets, is_dataset
+from running_stats import StatsTable
+
+OUTPUT_DIR = ".output"
+CHECKPOINT_FILE = "export_checkpoint.json"
+STATS_FILE = "summary_stats.json"
+
+FILENAMES = {
+    "clear": "clear_path_experiment.csv",
+    "wall": "wall_experiment.csv",
+    "moving": "moving_experiment.csv"
+}
+
+HEADERS = {
+    "clear": ["Distance (meters)", "Reading Number", "RSSI", "Calculated Distance", "Status", "Experiment Type"],
+    "wall": ["Distance (meters)", "Reading Number", "RSSI", "Calculated Distance", "Status", "Experiment Type"],
+    "moving": ["Experiment Type", "Reading Number", "RSSI", "Calculated Distance", "Status"]
+}
+
+# Extra columns written when several captures are merged into one dataset
+SOURCE_HEADERS = ["Source File", "Session"]
+
+DISTANCE_RE = re.compile(r"(\d+(\.\d+)?) meters")
+READING_RE = re.compile(r"Reading \d+: RSSI = (-?\d+) \| Calculated Distance = ([\d\.]+) meters")
+
+# Bytes hashed from the head of a capture to tell a grown file from a replaced one
+FINGERPRINT_BYTES = 256
+
+
+class Reading(NamedTuple):
+    experiment: str                 # "clear", "wall" or "moving"
+    distance: Optional[float]       # reference distance, None for moving readings
+    reading_number: int
+    rssi: int
+    calculated_distance: float
+    status: str                     # "Success" or "Failed"
+
+
+def initial_state():
+    return {
+        "experiment": "clear",
+        "distance": None,
+        "reading_number": 0,
+        "moving_reading_number": 1,
+        "is_failed": False,
+    }
+
+
+def iter_lines(file_path, offset=0):
+    """
+    Yield (line, end_offset) for every complete line after `offset`.
+    An unterminated last line is still being written by the capture, so it is
+    left for the next run instead of being consumed half-way.
+    """
+    with open(file_path, 'rb') as file:
+        file.seek(offset)
+        for raw in file:
+            if not raw.endswith(b"\n"):
+                break
+            offset += len(raw)
+            yield raw.decode('utf-8', errors='replace').strip(), offset
+
+
+def parse_line(line, state):
+    """Advance the clear/wall/moving state machine by one line, returning a Reading or None."""
+    if line == "Wall":
+        state["experiment"] = "wall"
+        state["distance"] = None
+        return None
+
+    if line.startswith("From 15 meters"):
+        state["experiment"] = "moving"
+        state["distance"] = None
+        state["moving_reading_number"] = 1
+        return None
+
+    distance_match = DISTANCE_RE.match(line)
+    if distance_match:
+        state["distance"] = float(distance_match.group(1))
+        state["reading_number"] = 0
+        state["is_failed"] = False
+        return None
+
+    reading = None
+    reading_match = READING_RE.match(line)
+    if reading_match:
+        reading = _next_reading(state, int(reading_match.group(1)), float(reading_match.group(2)), "Success")
+        state["is_failed"] = False
+
+    elif line == "Scanning...":
+        if state["is_failed"]:
+            reading = _next_reading(state, 0, 0, "Failed")
+        state["is_failed"] = True
+
+    return reading
+
+
+def _next_reading(state, rssi, calculated_distance, status):
+    if state["experiment"] == "moving":
+        number = state["moving_reading_number"]
+        state["moving_reading_number"] += 1
+        return Reading("moving", None, number, rssi, calculated_distance, status)
+
+    # Readings before the first distance header are not part of any block
+    if state["distance"] is None:
+        return None
+    state["reading_number"] += 1
+    return Reading(state["experiment"], state["distance"], state["reading_number"], rssi, calculated_distance, status)
+
+
+def iter_readings(file_path, offset=0, state=None):
+    """
+    Stream Reading records from a serial capture in constant memory.
+    `state` is updated in place and, together with state["offset"], is what
+    gets checkpointed so a later run can pick up where this one stopped.
+    """
+    if state is None:
+        state = initial_state()
+    state["offset"] = offset
+    for line, end_offset in iter_lines(file_path, offset):
+        reading = parse_line(line, state)
+        state["offset"] = end_offset
+        if reading is not None:
+            yield reading
+
 
 def parse_data(file_path):
     experiments = {
@@ -8,96 +146,237 @@ def parse_data(file_path):
         "wall": [],
         "moving": []
     }
-    current_experiment = "clear"
-    current_distance = None
-    readings = []
-    is_failed = False
-    moving_reading_number = 1 
-
-    with open(file_path, 'r') as file:
-        for line in file:
-            line = line.strip()
-            
-            if line == "Wall":
-                if current_distance is not None and readings:
-                    experiments[current_experiment].append((current_distance, readings))
-                current_experiment = "wall"
-                current_distance = None  
-                readings = []
-                continue
-
-            elif line.startswith("From 15 meters"):
-                if current_distance is not None and readings:
-                    experiments[current_experiment].append((current_distance, readings))
-                current_experiment = "moving"
-                current_distance = None  
-                readings = []
-                moving_reading_number = 1  
-                continue
-            
-            distance_match = re.match(r"(\d+(\.\d+)?) meters", line)
-            if distance_match:
-                if current_distance is not None and readings:
-                    experiments[current_experiment].append((current_distance, readings))
-                current_distance = float(distance_match.group(1))
-                readings = []
-                is_failed = False
-                continue
-
-            reading_match = re.match(r"Reading \d+: RSSI = (-?\d+) \| Calculated Distance = ([\d\.]+) meters", line)
-            if reading_match:
-                rssi = int(reading_match.group(1))
-                calculated_distance = float(reading_match.group(2))
-                if current_experiment == "moving":
-                    experiments["moving"].append((moving_reading_number, rssi, calculated_distance, "Success"))
-                    moving_reading_number += 1
-                else:
-                    readings.append((rssi, calculated_distance, "Success"))
-                is_failed = False 
-                
-            elif line == "Scanning...":
-                if is_failed:
-                    if current_experiment == "moving":
-                        experiments["moving"].append((moving_reading_number, 0, 0, "Failed"))
-                        moving_reading_number += 1
-                    else:
-                        readings.append((0, 0, "Failed"))
-                is_failed = True
-        
-        if current_distance is not None and readings:
-            experiments[current_experiment].append((current_distance, readings))
-    
+    for r in iter_readings(file_path):
+        if r.experiment == "moving":
+            experiments["moving"].append((r.reading_number, r.rssi, r.calculated_distance, r.status))
+        else:
+            blocks = experiments[r.experiment]
+            if r.reading_number == 1:
+                blocks.append((r.distance, []))
+            blocks[-1][1].append((r.rssi, r.calculated_distance, r.status))
     return experiments
 
-def save_to_csv(experiments):
-    output_dir = ".output"
+
+def reading_row(reading):
+    if reading.experiment == "moving":
+        return ["Moving", reading.reading_number, reading.rssi, reading.calculated_distance, reading.status]
+    return [reading.distance, reading.reading_number, reading.rssi, reading.calculated_distance,
+            reading.status, reading.experiment.capitalize()]
+
+
+def save_to_csv(readings, output_dir=OUTPUT_DIR, append=False):
+    """Write readings to the per-experiment CSVs, appending to them when resuming."""
     os.makedirs(output_dir, exist_ok=True)
 
-    filenames = {
-        "clear": f"{output_dir}/clear_path_experiment.csv",
-        "wall": f"{output_dir}/wall_experiment.csv",
-        "moving": f"{output_dir}/moving_experiment.csv"
-    }
-    
-    for exp_type, data in experiments.items():
-        with open(filenames[exp_type], 'w', newline='') as csvfile:
-            writer = csv.writer(csvfile)
-            if exp_type == "moving":
-                writer.writerow(["Experiment Type", "Reading Number", "RSSI", "Calculated Distance", "Status"])
-                for reading_num, rssi, calc_dist, status in data:
-                    writer.writerow(["Moving", reading_num, rssi, calc_dist, status])
-            else:
-                writer.writerow(["Distance (meters)", "Reading Number", "RSSI", "Calculated Distance", "Status", "Experiment Type"])
-                for distance, readings in data:
-                    for i, (rssi, calc_dist, status) in enumerate(readings, start=1):
-                        writer.writerow([distance, i, rssi, calc_dist, status, exp_type.capitalize()])
+    files = {}
+    writers = {}
+    try:
+        for exp_type, name in FILENAMES.items():
+            path = os.path.join(output_dir, name)
+            fresh = not append or not os.path.exists(path)
+            files[exp_type] = open(path, 'w' if fresh else 'a', newline='')
+            writers[exp_type] = csv.writer(files[exp_type])
+            if fresh:
+                writers[exp_type].writerow(HEADERS[exp_type])
+
+        count = 0
+        for reading in readings:
+            writers[reading.experiment].writerow(reading_row(reading))
+            count += 1
+        return count
+    finally:
+        for f in files.values():
+            f.close()
+
+
+# ---------------------------
+# Checkpointing
+# ---------------------------
+def fingerprint(file_path):
+    with open(file_path, 'rb') as file:
+        return hashlib.sha1(file.read(FINGERPRINT_BYTES)).hexdigest()
+
+
+def load_checkpoint(file_path, output_dir=OUTPUT_DIR):
+    """Return the saved parser state for `file_path`, or None if the capture must be parsed from the start."""
+    path = os.path.join(output_dir, CHECKPOINT_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        checkpoint = json.load(f)
+
+    if checkpoint.get("source") != os.path.abspath(file_path):
+        return None
+    if not all(os.path.exists(os.path.join(output_dir, name)) for name in FILENAMES.values()):
+        return None
+    if not is_dataset(os.path.join(output_dir, DATASET_DIR)):
+        return None
+    # A shrunk or rewritten capture invalidates everything exported from it
+    if os.path.getsize(file_path) < checkpoint["state"]["offset"]:
+        return None
+    if checkpoint["state"]["offset"] >= FINGERPRINT_BYTES and fingerprint(file_path) != checkpoint["fingerprint"]:
+        return None
+    return checkpoint["state"]
+
+
+def checkpoint_stats(output_dir=OUTPUT_DIR):
+    """Summary accumulators saved with the checkpoint, or None for checkpoints written without them."""
+    with open(os.path.join(output_dir, CHECKPOINT_FILE)) as f:
+        stats = json.load(f).get("stats")
+    return None if stats is None else StatsTable.from_dict(stats)
+
+
+def save_checkpoint(file_path, state, output_dir=OUTPUT_DIR, stats=None):
+    path = os.path.join(output_dir, CHECKPOINT_FILE)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump({
+            "source": os.path.abspath(file_path),
+            "fingerprint": fingerprint(file_path),
+            "state": state,
+            # kept with the parser state so both always describe the same readings
+            "stats": None if stats is None else stats.to_dict(),
+        }, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def export(file_path, output_dir=OUTPUT_DIR, resume=True):
+    """
+    Export a capture to the CSV files, the columnar dataset and the summary statistics,
+    only parsing the bytes added since the last checkpoint. Returns the number of new readings.
+    """
+    state = load_checkpoint(file_path, output_dir) if resume else None
+    append = state is not None
+    stats = None
+    if append:
+        stats = checkpoint_stats(output_dir)
+        if stats is None:
+            stats = stats_of(os.path.join(output_dir, DATASET_DIR))
+    else:
+        state = initial_state()
+        state["offset"] = 0
+        stats = new_stats()
+
+    with DatasetWriter(os.path.join(output_dir, DATASET_DIR), append=append) as store:
+        readings = store.passthrough(iter_readings(file_path, state["offset"], state))
+        count = save_to_csv((update_stats(stats, r) for r in readings), output_dir, append=append)
+    stats.save(os.path.join(output_dir, STATS_FILE))
+    save_checkpoint(file_path, state, output_dir, stats)
+    return count
+
+
+# ---------------------------
+# Multi-file ingestion
+# ---------------------------
+def find_captures(inputs, pattern="*.txt"):
+    """Expand files, directories and glob patterns into a sorted, de-duplicated list of capture paths."""
+    paths = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            paths.update(glob.glob(os.path.join(item, "**", pattern), recursive=True))
+        elif glob.has_magic(item):
+            paths.update(glob.glob(item, recursive=True))
+        else:
+            paths.add(item)
+    return sorted(os.path.normpath(p) for p in paths if os.path.isfile(p))
+
+
+def session_of(path, root):
+    """Captures are grouped as <root>/<session>/<reader>.txt; a file directly under root is its own session."""
+    rel = os.path.relpath(path, root)
+    parts = rel.split(os.sep)
+    if len(parts) > 1:
+        return parts[0]
+    return os.path.splitext(parts[0])[0]
+
+
+def _export_part(args):
+    """Worker: parse one capture into headerless per-experiment CSV parts and a part dataset. Runs in a separate process."""
+    path, source, session, part_prefix = args
+    counts = dict.fromkeys(FILENAMES, 0)
+    stats = new_stats()
+    files = {exp_type: open(f"{part_prefix}_{exp_type}.csv", 'w', newline='') for exp_type in FILENAMES}
+    try:
+        writers = {exp_type: csv.writer(f) for exp_type, f in files.items()}
+        with DatasetWriter(f"{part_prefix}_{DATASET_DIR}") as store:
+            # A fresh state per file keeps the clear/wall/moving machine from leaking across captures
+            for reading in store.passthrough(iter_readings(path)):
+                writers[reading.experiment].writerow(reading_row(reading) + [source, session])
+                update_stats(stats, reading)
+                counts[reading.experiment] += 1
+    finally:
+        for f in files.values():
+            f.close()
+    return counts, stats.to_dict()
+
+
+def ingest(inputs, output_dir=OUTPUT_DIR, pattern="*.txt", workers=None):
+    """
+    Parse many captures in a process pool and merge them into the per-experiment CSVs
+    and the columnar dataset.
+    Files are merged in sorted path order, so the output does not depend on worker scheduling.
+    Returns the list of ingested paths and the total reading counts per experiment.
+    """
+    paths = find_captures(inputs, pattern)
+    if not paths:
+        raise FileNotFoundError(f"No capture files matched {inputs}")
+    root = os.path.commonpath([os.path.dirname(os.path.abspath(p)) for p in paths])
+    os.makedirs(output_dir, exist_ok=True)
+
+    totals = dict.fromkeys(FILENAMES, 0)
+    stats = new_stats()
+    with tempfile.TemporaryDirectory(dir=output_dir) as part_dir:
+        jobs = []
+        for i, path in enumerate(paths):
+            abs_path = os.path.abspath(path)
+            jobs.append((path, os.path.relpath(abs_path, root), session_of(abs_path, root),
+                         os.path.join(part_dir, f"{i:06d}")))
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for counts, part_stats in pool.map(_export_part, jobs, chunksize=max(1, len(jobs) // 64)):
+                for exp_type, n in counts.items():
+                    totals[exp_type] += n
+                stats.merge(StatsTable.from_dict(part_stats))
+
+        for exp_type, name in FILENAMES.items():
+            with open(os.path.join(output_dir, name), 'w', newline='') as out:
+                csv.writer(out).writerow(HEADERS[exp_type] + SOURCE_HEADERS)
+                for job in jobs:
+                    with open(f"{job[3]}_{exp_type}.csv", newline='') as part:
+                        shutil.copyfileobj(part, out)
+
+        concat_datasets([(f"{job[3]}_{DATASET_DIR}", job[1], job[2]) for job in jobs],
+                        os.path.join(output_dir, DATASET_DIR),
+                        sources=[job[1] for job in jobs],
+                        sessions=sorted({job[2] for job in jobs}))
+    stats.save(os.path.join(output_dir, STATS_FILE))
+
+    # Merged outputs no longer correspond to a single-capture checkpoint
+    checkpoint = os.path.join(output_dir, CHECKPOINT_FILE)
+    if os.path.exists(checkpoint):
+        os.remove(checkpoint)
+    return paths, totals
+
 
 def main():
-    file_path = "./data/test.txt"
-    
-    experiments = parse_data(file_path)
-    
-    save_to_csv(experiments)
-    print("Data has been successfully exported to CSV files in the .output/ folder.")
-
-main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Export reader serial captures to the .output CSV files and columnar dataset.")
+    parser.add_argument("inputs", nargs="*", default=["./data/test.txt"],
+                        help="capture file, directory or glob; several inputs are ingested in parallel")
+    parser.add_argument("--pattern", default="*.txt", help="file pattern used when an input is a directory")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--output", default=OUTPUT_DIR)
+    parser.add_argument("--no-resume", action="store_true", help="re-parse a single capture from the start")
+    args = parser.parse_args()
+
+    if len(args.inputs) == 1 and os.path.isfile(args.inputs[0]):
+        count = export(args.inputs[0], args.output, resume=not args.no_resume)
+        print(f"Exported {count} new readings to the CSV files and dataset in the {args.output}/ folder.")
+        return
+
+    paths, totals = ingest(args.inputs, args.output, args.pattern, args.workers)
+    print(f"Ingested {len(paths)} captures ({sum(totals.values())} readings: "
+          f"{totals['clear']} clear, {totals['wall']} wall, {totals['moving']} moving) into {args.output}/.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+# figure_cache.py
+# Content-addressed cache for generated figures.
+#
+# A figure job (func, args) is keyed on a hash of the data it is given, the style
+# parameters and the source of the script that renders it together with every repo module
+# it imports, directly or through those (plotting, downsample, aggregate, ...). The manifest remembers which files each job wrote under which key, so a
+# re-run skips jobs whose key is unchanged and whose files are still on disk, and deletes
+# files of jobs that no longer exist. Each script keeps its own manifest, so scripts
+# writing to the same directory never evict each other's figures.
+
+import hashlib
+import inspect
+import json
+import os
+import sys
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+MANIFEST_FILE = ".figure_cache.{}.json"     # per script
+CACHE_VERSION = 1
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+# modules from these directories are part of a job's code; libraries are not
+_SOURCE_DIRS = (_HERE, os.path.normpath(os.path.join(_HERE, os.pardir, "shared")))
+
+
+def _update_hash(h, value):
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        h.update(repr(list(value.columns) if isinstance(value, pd.DataFrame) else value.name).encode())
+        h.update(repr(list(value.dtypes) if isinstance(value, pd.DataFrame) else value.dtype).encode())
+        h.update(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+    elif isinstance(value, np.ndarray):
+        h.update(repr((value.dtype.str, value.shape)).encode())
+        h.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, (list, tuple)):
+        h.update(b"[")
+        for item in value:
+            _update_hash(h, item)
+        h.update(b"]")
+    else:
+        h.update(repr(value).encode())
+    h.update(b"|")
+
+
+def _flatten(outputs):
+    if outputs is None:
+        return []
+    if isinstance(outputs, str):
+        return [outputs]
+    return [p for item in outputs for p in _flatten(item)]
+
+
+def _file_digest(path, _memo={}):
+    # memoised per file version, so a source rewritten in a long-lived process is hashed again
+    st = os.stat(path)
+    version = (path, st.st_mtime_ns, st.st_size)
+    if version not in _memo:
+        with open(path, 'rb') as f:
+            _memo[version] = hashlib.sha256(f.read()).hexdigest()
+    return _memo[version]
+
+
+def _source_file(module):
+    path = getattr(module, "__file__", None)
+    if path and path.endswith(".py") and os.path.dirname(os.path.abspath(path)) in _SOURCE_DIRS:
+        return os.path.abspath(path)
+    return None
+
+
+@lru_cache(maxsize=None)
+def module_sources(name):
+    """Source files of module `name` and of the repo modules it imports, directly or not, sorted."""
+    found, pending = {}, [sys.modules[name]]
+    while pending:
+        module = pending.pop()
+        path = _source_file(module)
+        if path is None or path in found:
+            continue
+        found[path] = module
+        # modules imported whole, and the modules of imported functions, classes and objects
+        for value in vars(module).values():
+            owner = value if inspect.ismodule(value) else sys.modules.get(getattr(value, "__module__", None) or "")
+            if owner is not None:
+                pending.append(owner)
+    found.setdefault(os.path.abspath(__file__), None)
+    return tuple(sorted(found))
+
+
+def code_version(func):
+    """Digest of the module defining `func` and of every repo module it depends on."""
+    paths = module_sources(func.__module__)
+    return hashlib.sha256("".join(_file_digest(p) for p in paths).encode()).hexdigest()
+
+
+def content_key(func, args, style=""):
+    """Digest of a job's code, style (a string) and data: what decides whether its outputs are stale."""
+    h = hashlib.sha256()
+    h.update(code_version(func).encode())
+    h.update(style.encode())
+    _update_hash(h, list(args))
+    return h.hexdigest()
+
+
+def job_id(func, args):
+    """Stable identity of a job: the function plus its plain (label-like) arguments."""
+    labels = [str(a) for a in args if isinstance(a, (str, int, float))]
+    return ":".join([func.__name__] + labels)
+
+
+class FigureCache:
+    def __init__(self, out_dir, script, style=None):
+        """`script` names the manifest: only figures recorded by the same script are ever evicted."""
+        self.path = os.path.join(out_dir, MANIFEST_FILE.format(script))
+        self.style = json.dumps(style, sort_keys=True, default=str)
+        self.entries = {}
+        self.seen = set()
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                manifest = json.load(f)
+            if manifest.get("version") == CACHE_VERSION:
+                self.entries = manifest["entries"]
+
+    def key(self, func, args):
+        return content_key(func, args, self.style)
+
+    def check(self, func, args):
+        """Return (job_id, key, fresh) for a job and mark it as still wanted."""
+        jid = job_id(func, args)
+        key = self.key(func, args)
+        self.seen.add(jid)
+        entry = self.entries.get(jid)
+        fresh = (entry is not None and entry["key"] == key
+                 and all(os.path.exists(p) for p in entry["outputs"]))
+        return jid, key, fresh
+
+    def record(self, jid, key, outputs):
+        self.entries[jid] = {"key": key, "outputs": _flatten(outputs)}
+
+    def evict_stale(self):
+        """Delete files written by jobs that were not part of this run. Returns the evicted job ids."""
+        stale = [jid for jid in self.entries if jid not in self.seen]
+        for jid in stale:
+            for path in self.entries.pop(jid)["outputs"]:
+                if os.path.exists(path):
+                    os.remove(path)
+        return stale
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({"version": CACHE_VERSION, "entries": self.entries}, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
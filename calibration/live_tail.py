@@ -0,0 +1,365 @@
+# live_tail.py
+# Live calibration view: parse reader serial output as it arrives and keep the plots current.
+#
+# Each source (a serial port, a pseudo-terminal, a FIFO or a capture file still being
+# written) is read by its own asyncio task and fed line by line through the same state
+# machine export_txt_to_csv.py uses, with its own parser state and summary accumulators.
+# A separate task redraws at a fixed frame rate: the moving-experiment RSSI and the
+# min/avg/max per distance are artists whose data is replaced in place and blitted; the
+# figure is only redrawn in full when the axes have to grow.
+#
+#   python live_tail.py /dev/ttyUSB0 /dev/ttyACM0 --baud 115200 --capture-dir data/live
+#   python live_tail.py --simulate data/test.txt --count 2 --lines-per-s 200   # pty stand-in
+#
+# Serial ports are opened directly (raw mode, --baud), so pyserial is not needed.
+
+import argparse
+import asyncio
+import os
+import stat
+import sys
+import termios
+import time
+import tty
+from collections import deque
+
+import matplotlib.pyplot as plt
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "shared"))
+
+from aggregate import new_stats, summarize, update_stats
+from export_txt_to_csv import initial_state, iter_lines, parse_line
+from plotting import OUTPUT, add_arguments, configure, finish
+
+FRAME_RATE = 10.0
+MOVING_HISTORY = 500            # moving readings kept per port for the over-time panel
+POLL_INTERVAL = 0.2             # seconds between checks of a growing capture file
+LINE_LIMIT = 1 << 16
+EXPERIMENT_STYLES = {'Clear': 'o-', 'Wall': 's--'}
+PORT_COLORS = ['teal', '#e67e22', '#8e44ad', '#e74c3c', '#196F3D', '#3498db']
+
+
+class PortTail:
+    """Parser state, summary accumulators and the latest moving readings of one source."""
+
+    def __init__(self, name, capture=None, history=MOVING_HISTORY):
+        self.name = name
+        self.state = initial_state()
+        self.stats = new_stats()
+        self.moving = deque(maxlen=history)     # (reading number, rssi, status)
+        self.lines = 0
+        self.readings = 0
+        self.closed = False
+        self._capture = open(capture, 'a') if capture else None
+
+    def feed(self, line):
+        """Advance the parser by one line; returns the Reading it completed, if any."""
+        self.lines += 1
+        if self._capture is not None:
+            self._capture.write(line + "\n")
+        reading = parse_line(line, self.state)
+        if reading is None:
+            return None
+        self.readings += 1
+        update_stats(self.stats, reading)
+        if reading.experiment == "moving":
+            self.moving.append((reading.reading_number, reading.rssi, reading.status))
+        return reading
+
+    def distance_stats(self, experiment):
+        """(distances, min, mean, max) of the successful readings of one experiment, by distance."""
+        rows = sorted((key[1], s['RSSI']) for key, s in self.stats.groups.items()
+                      if key[0] == experiment and key[2] == 'Success' and s['RSSI'].count)
+        if not rows:
+            return (np.empty(0),) * 4
+        return (np.array([d for d, _ in rows]), np.array([s.min for _, s in rows]),
+                np.array([s.mean for _, s in rows]), np.array([s.max for _, s in rows]))
+
+    def close(self):
+        self.closed = True
+        if self._capture is not None:
+            self._capture.close()
+            self._capture = None
+
+
+# ---------------------------
+# Sources
+# ---------------------------
+def _set_raw(fd, baud=None):
+    tty.setraw(fd, termios.TCSANOW)     # TCSAFLUSH would drop lines already waiting
+    if baud:
+        attrs = termios.tcgetattr(fd)
+        attrs[4] = attrs[5] = getattr(termios, f"B{baud}")
+        termios.tcsetattr(fd, termios.TCSANOW, attrs)
+
+
+async def _tail_stream(path, tail, baud=None):
+    """Read a serial port, pty or FIFO until the other end goes away."""
+    fd = os.open(path, os.O_RDONLY | os.O_NOCTTY | os.O_NONBLOCK)
+    if os.isatty(fd):
+        _set_raw(fd, baud)
+    reader = asyncio.StreamReader(limit=LINE_LIMIT)
+    transport, _ = await asyncio.get_running_loop().connect_read_pipe(
+        lambda: asyncio.StreamReaderProtocol(reader), os.fdopen(fd, 'rb', buffering=0))
+    try:
+        while True:
+            try:
+                raw = await reader.readline()
+            except OSError:                 # EIO once the pty master is closed
+                break
+            if not raw:
+                break
+            tail.feed(raw.decode('utf-8', errors='replace').strip())
+    finally:
+        transport.close()
+
+
+async def _tail_file(path, tail, stop):
+    """Follow a capture file that is still being written, like `tail -f`."""
+    offset = 0
+    while not stop.is_set():
+        for line, offset in iter_lines(path, offset):
+            tail.feed(line)
+        await asyncio.sleep(POLL_INTERVAL)
+
+
+async def tail_source(path, tail, stop, baud=None):
+    try:
+        if stat.S_ISREG(os.stat(path).st_mode):
+            await _tail_file(path, tail, stop)
+        else:
+            await _tail_stream(path, tail, baud)
+    finally:
+        tail.close()
+
+
+class PtyStandIn:
+    """A pseudo-terminal replaying a capture file at a fixed line rate, like a reader on a serial port."""
+
+    def __init__(self, capture, lines_per_s=100.0):
+        self.capture = capture
+        self.lines_per_s = lines_per_s
+        self.master, self.slave = os.openpty()
+        _set_raw(self.slave)                # no echo back into the master, no line editing
+        os.set_blocking(self.master, False)
+        self.path = os.ttyname(self.slave)
+
+    async def run(self, tick=0.01):
+        with open(self.capture, 'rb') as f:
+            lines = f.read().splitlines()
+        per_tick = max(1, round(self.lines_per_s * tick))
+        try:
+            for start in range(0, len(lines), per_tick):
+                data = b"".join(line.rstrip(b"\r") + b"\r\n" for line in lines[start:start + per_tick])
+                while data:
+                    try:
+                        data = data[os.write(self.master, data):]
+                    except BlockingIOError:     # the reader is behind; wait for it
+                        await asyncio.sleep(tick)
+                await asyncio.sleep(tick)
+        finally:
+            os.close(self.master)
+            os.close(self.slave)
+
+
+# ---------------------------
+# Live view
+# ---------------------------
+class LiveView:
+    """Moving RSSI over the latest readings and min/avg/max RSSI per distance, updated in place."""
+
+    def __init__(self, tails):
+        self.fig, (self.ax_moving, self.ax_stats) = plt.subplots(1, 2, figsize=(18, 7))
+        self.moving = {}
+        self.stats = {}
+        for i, tail in enumerate(tails):
+            color = PORT_COLORS[i % len(PORT_COLORS)]
+            self.moving[tail.name] = (
+                self.ax_moving.plot([], [], '.-', color=color, label=f'{tail.name} RSSI', animated=True)[0],
+                self.ax_moving.plot([], [], 'x', color=color, label=f'{tail.name} Failed', animated=True)[0],
+            )
+            for experiment, style in EXPERIMENT_STYLES.items():
+                self.stats[tail.name, experiment] = (
+                    self.ax_stats.plot([], [], style, color=color, label=f'{tail.name} {experiment} avg', animated=True)[0],
+                    self.ax_stats.plot([], [], ':', color=color, alpha=0.6, animated=True)[0],
+                    self.ax_stats.plot([], [], ':', color=color, alpha=0.6, animated=True)[0],
+                )
+        self.artists = [a for pair in self.moving.values() for a in pair] + \
+                       [a for lines in self.stats.values() for a in lines]
+
+        for ax, xlabel in ((self.ax_moving, 'Sample Index'), (self.ax_stats, 'Distance (meters)')):
+            ax.grid(True, linestyle='--', alpha=0.7, linewidth=1.1)
+            ax.set_xlabel(xlabel, fontsize=16, fontweight='bold')
+            ax.set_ylabel('RSSI (dBm)', fontsize=16, fontweight='bold')
+            ax.set_xlim(0, 1)
+            ax.set_ylim(-100, -30)
+        self.ax_moving.set_title('Moving experiment')
+        self.ax_stats.set_title('Min / Avg / Max RSSI')
+        self.ax_moving.legend(loc='upper left', fontsize=10)
+        self.ax_stats.legend(loc='upper right', fontsize=10)
+
+        self.background = None
+        self.fig.canvas.mpl_connect('draw_event', self._on_draw)
+
+    def _on_draw(self, event):
+        self.background = self.fig.canvas.copy_from_bbox(self.fig.bbox)
+        self._draw_artists()
+
+    def _draw_artists(self):
+        for artist in self.artists:
+            self.fig.draw_artist(artist)
+
+    @staticmethod
+    def _grow(ax, xs, ys):
+        """Widen the limits to cover the data with some headroom; True if they changed."""
+        if not len(xs):
+            return False
+        (x0, x1), (y0, y1) = ax.get_xlim(), ax.get_ylim()
+        lo_x, hi_x, lo_y, hi_y = min(xs), max(xs), min(ys), max(ys)
+        if x0 <= lo_x and hi_x <= x1 and y0 <= lo_y and hi_y <= y1:
+            return False
+        # jump by half a view so scrolling data does not force a full redraw every frame
+        span_x = max(hi_x - lo_x, 1)
+        ax.set_xlim(min(x0, lo_x) if hi_x <= x1 else max(x0, hi_x - 2 * span_x), max(x1, hi_x + span_x / 2))
+        ax.set_ylim(min(y0, lo_y - 5), max(y1, hi_y + 5))
+        return True
+
+    def freeze(self):
+        """Hand the artists back to normal drawing, so the final state can be saved or shown."""
+        for artist in self.artists:
+            artist.set_animated(False)
+        self.fig.canvas.draw_idle()
+
+    def update(self, tails):
+        moving_x, moving_y, stats_x, stats_y = [], [], [], []
+        for tail in tails:
+            line, failed = self.moving[tail.name]
+            numbers = np.fromiter((n for n, _, _ in tail.moving), float, len(tail.moving))
+            rssi = np.fromiter((r for _, r, _ in tail.moving), float, len(tail.moving))
+            ok = np.fromiter((s == 'Success' for _, _, s in tail.moving), bool, len(tail.moving))
+            line.set_data(numbers[ok], rssi[ok])
+            # failed readings carry no RSSI; mark them along the bottom edge
+            failed.set_data(numbers[~ok], np.full((~ok).sum(), self.ax_moving.get_ylim()[0] + 1))
+            moving_x += list(numbers)
+            moving_y += list(rssi[ok])
+            for experiment in EXPERIMENT_STYLES:
+                distances, low, mean, high = tail.distance_stats(experiment)
+                for artist, values in zip(self.stats[tail.name, experiment], (mean, low, high)):
+                    artist.set_data(distances, values)
+                stats_x += list(distances)
+                stats_y += list(low) + list(high)
+
+        grew = self._grow(self.ax_moving, moving_x, moving_y or [-60]) | self._grow(self.ax_stats, stats_x, stats_y)
+        canvas = self.fig.canvas
+        if grew or self.background is None:
+            canvas.draw_idle()
+        else:
+            canvas.restore_region(self.background)
+            self._draw_artists()
+            canvas.blit(self.fig.bbox)
+        canvas.flush_events()
+
+
+def _status_line(tails):
+    parts = []
+    for tail in tails:
+        where = tail.state["experiment"] + (f" {tail.state['distance']:g} m" if tail.state["distance"] is not None else "")
+        parts.append(f"{tail.name}: {tail.readings} readings ({where}){' closed' if tail.closed else ''}")
+    return f"[{time.strftime('%H:%M:%S')}] " + " | ".join(parts)
+
+
+async def render(tails, view, stop, frame_rate=FRAME_RATE, report_every=1.0):
+    """Redraw at most `frame_rate` times a second while anything changed; print a status line every `report_every` s."""
+    seen = None
+    last_report = 0.0
+    while True:
+        versions = tuple(tail.lines for tail in tails)
+        if view is not None and versions != seen:
+            view.update(tails)
+        seen = versions
+        now = time.monotonic()
+        if now - last_report >= report_every:
+            print(_status_line(tails), flush=True)
+            last_report = now
+        if stop.is_set():
+            break
+        await asyncio.sleep(1.0 / frame_rate)
+
+
+async def run_live(paths, names, capture_dir=None, baud=None, frame_rate=FRAME_RATE, show=True,
+                   duration=None, standins=()):
+    """Tail every source until they all end (or `duration` s pass); returns the PortTails."""
+    if capture_dir:
+        os.makedirs(capture_dir, exist_ok=True)
+    tails = [PortTail(name, os.path.join(capture_dir, f"{name}.txt") if capture_dir else None) for name in names]
+    view = LiveView(tails) if show else None
+    if view is not None and not OUTPUT["batch"]:
+        plt.show(block=False)
+
+    stop = asyncio.Event()
+    drawing = asyncio.create_task(render(tails, view, stop, frame_rate))
+    feeders = [asyncio.create_task(standin.run()) for standin in standins]
+    readers = [asyncio.create_task(tail_source(path, tail, stop, baud)) for path, tail in zip(paths, tails)]
+    try:
+        await asyncio.wait_for(asyncio.gather(*readers), duration)
+    except asyncio.TimeoutError:
+        pass
+    finally:
+        stop.set()
+        for task in feeders + readers:
+            task.cancel()
+        await asyncio.gather(*feeders, *readers, return_exceptions=True)
+        await drawing
+        for tail in tails:
+            tail.close()
+    if view is not None:
+        view.update(tails)
+        view.freeze()
+    return tails
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tail reader serial output live and keep the calibration plots current.")
+    parser.add_argument("ports", nargs="*", help="serial ports, ptys, FIFOs or growing capture files")
+    parser.add_argument("--baud", type=int, default=115200, help="serial line speed")
+    parser.add_argument("--frame-rate", type=float, default=FRAME_RATE, help="maximum redraws per second")
+    parser.add_argument("--capture-dir", help="also append each port's raw lines to <dir>/<port>.txt "
+                                              "for export_txt_to_csv.py")
+    parser.add_argument("--duration", type=float, help="stop after this many seconds")
+    parser.add_argument("--no-plot", action="store_true", help="status lines and summaries only")
+    parser.add_argument("--simulate", metavar="CAPTURE", help="replay this capture through local ptys instead of ports")
+    parser.add_argument("--count", type=int, default=1, help="number of ptys with --simulate")
+    parser.add_argument("--lines-per-s", type=float, default=100.0, help="replay speed with --simulate")
+    add_arguments(parser)
+    args = parser.parse_args()
+    configure(args.batch, args.out, args.dpi)
+
+    standins = []
+    if args.simulate:
+        standins = [PtyStandIn(args.simulate, args.lines_per_s) for _ in range(args.count)]
+        paths = [s.path for s in standins]
+        names = [f"sim{i + 1}" for i in range(len(standins))]
+    elif args.ports:
+        paths = args.ports
+        names = [os.path.basename(p) for p in paths]
+    else:
+        parser.error("give serial ports to tail, or --simulate CAPTURE")
+
+    try:
+        tails = asyncio.run(run_live(paths, names, args.capture_dir, args.baud, args.frame_rate,
+                                     not args.no_plot, args.duration, standins))
+    except KeyboardInterrupt:
+        return
+
+    for tail in tails:
+        for experiment, table in summarize(tail.stats).items():
+            if len(table):
+                print(f"\n{tail.name} - {experiment} Path Summary:")
+                print(table)
+    if not args.no_plot:
+        finish('Live_Calibration', save=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+# path_loss.py
+# Log-distance path-loss fit of the clear and wall experiments, with bootstrap confidence intervals.
+#
+# calculateDistance on the readers inverts RSSI = txPower - 10 n log10(d), so each
+# environment is fitted by least squares of RSSI against log10(distance) over its
+# successful readings: the intercept is txPower (RSSI at 1 m), the slope -10 n.
+#
+# Readings only differ by (distance, RSSI), and there are a few dozen such cells however
+# long the capture, so the data is reduced to cell counts in one streaming pass. Drawing
+# N readings with replacement is then a multinomial draw over the cells, and a bootstrap
+# replicate is a weighted fit from five weighted sums: thousands of replicates are one
+# (replicates x cells) matrix product. Blocks of replicates run on a process pool, each
+# block with its own seed, so results do not depend on the number of workers.
+#
+#   python path_loss.py [--replicates 10000] [--confidence 0.95] [--json path_loss.json]
+
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from dataset import iter_frames, resolve
+
+COLUMNS = ['Distance (meters)', 'RSSI', 'Status']
+SOURCES = {
+    'Clear': './.output/clear_path_experiment.csv',
+    'Wall': './.output/wall_experiment.csv',
+}
+BLOCK_REPLICATES = 500
+
+
+def cell_counts(source, experiment=None, chunk_rows=None):
+    """
+    Successful readings of a dataset or CSV file as a DataFrame of (distance, rssi, count),
+    one row per distinct pair, accumulated chunk by chunk. A dataset holds every experiment,
+    so `experiment` selects the one to count.
+    """
+    kwargs = {} if chunk_rows is None else {'chunk_rows': chunk_rows}
+    parts = []
+    for chunk in iter_frames(source, COLUMNS, experiment=experiment, **kwargs):
+        chunk = chunk[(chunk['Status'].astype(str) == 'Success') & (chunk['Distance (meters)'] > 0)]
+        distance = chunk['Distance (meters)'].astype(np.float64)
+        if chunk['Distance (meters)'].dtype == np.float32:
+            distance = distance.round(6)    # float32 0.3 is not 0.3
+        parts.append(pd.DataFrame({'distance': distance, 'rssi': chunk['RSSI'].astype(np.float64)})
+                     .groupby(['distance', 'rssi']).size())
+    if not parts:
+        return pd.DataFrame(columns=['distance', 'rssi', 'count'])
+    counts = pd.concat(parts).groupby(level=['distance', 'rssi']).sum()
+    return counts.rename('count').reset_index()
+
+
+def _fit_sums(weights, x, y):
+    """txPower and n of the weighted least-squares fits, one per row of `weights` (replicates x cells)."""
+    w = np.atleast_2d(weights).astype(np.float64)
+    sw = w.sum(axis=1)
+    sx, sy = w @ x, w @ y
+    sxx, sxy = w @ (x * x), w @ (x * y)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        slope = (sw * sxy - sx * sy) / (sw * sxx - sx * sx)
+        intercept = (sy - slope * sx) / sw
+    return intercept, -slope / 10.0
+
+
+def _bootstrap_block(job):
+    """Worker: fit `size` bootstrap replicates drawn with the block's own seed."""
+    cells, size, seed, stratified = job
+    rng = np.random.default_rng(seed)
+    x = np.log10(cells['distance'])
+    counts = cells['count']
+    if stratified:
+        # keep the number of readings at every distance, resample within it
+        weights = np.zeros((size, len(counts)))
+        for d in np.unique(cells['distance']):
+            idx = np.flatnonzero(cells['distance'] == d)
+            weights[:, idx] = rng.multinomial(counts[idx].sum(), counts[idx] / counts[idx].sum(), size=size)
+    else:
+        weights = rng.multinomial(counts.sum(), counts / counts.sum(), size=size)
+    return _fit_sums(weights, x, cells['rssi'])
+
+
+def bootstrap(cells, replicates=10000, seed=0, stratified=True, workers=None):
+    """(txPower, n) arrays of `replicates` bootstrap fits of a cell_counts frame."""
+    arrays = {name: cells[name].to_numpy(dtype=np.float64) for name in ('distance', 'rssi', 'count')}
+    sizes = [min(BLOCK_REPLICATES, replicates - start) for start in range(0, replicates, BLOCK_REPLICATES)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    jobs = [(arrays, size, s, stratified) for size, s in zip(sizes, seeds)]
+    workers = workers or os.cpu_count()
+    if workers == 1 or len(jobs) < 2:
+        results = [_bootstrap_block(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+            results = list(pool.map(_bootstrap_block, jobs))
+    if not results:
+        return np.empty(0), np.empty(0)
+    return np.concatenate([tx for tx, _ in results]), np.concatenate([n for _, n in results])
+
+
+def fit(cells, replicates=10000, confidence=0.95, seed=0, stratified=True, workers=None):
+    """
+    Point estimate and percentile confidence interval of txPower and the path-loss exponent
+    for one environment, plus the RMSE of the fitted RSSI and the number of readings.
+    """
+    x = np.log10(cells['distance'].to_numpy(dtype=np.float64))
+    y = cells['rssi'].to_numpy(dtype=np.float64)
+    w = cells['count'].to_numpy(dtype=np.float64)
+    tx, n = (float(v[0]) for v in _fit_sums(w, x, y))
+    residual = y - (tx - 10.0 * n * x)
+    result = {
+        'txPower': tx, 'pathLossExponent': n,
+        'rmse': float(np.sqrt((w * residual ** 2).sum() / w.sum())) if w.sum() else np.nan,
+        'readings': int(w.sum()), 'replicates': replicates, 'confidence': confidence,
+    }
+    tx_boot, n_boot = bootstrap(cells, replicates, seed, stratified, workers)
+    tail = (1 - confidence) / 2 * 100
+    for name, values in (('txPower', tx_boot), ('pathLossExponent', n_boot)):
+        values = values[np.isfinite(values)]
+        low, high = np.percentile(values, [tail, 100 - tail]) if len(values) else (np.nan, np.nan)
+        result[f'{name}_low'], result[f'{name}_high'] = float(low), float(high)
+    return result
+
+
+def fit_all(sources, **kwargs):
+    """Fit every environment of {name: dataset or CSV path}; a DataFrame indexed by environment."""
+    rows = {name: fit(cell_counts(path, experiment=name), **kwargs) for name, path in sources.items()}
+    columns = ['txPower', 'txPower_low', 'txPower_high', 'pathLossExponent', 'pathLossExponent_low',
+               'pathLossExponent_high', 'rmse', 'readings']
+    return pd.DataFrame.from_dict(rows, orient='index')[columns].rename_axis('Environment')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fit txPower and the path-loss exponent per environment with bootstrap CIs.")
+    parser.add_argument("--clear", default=SOURCES['Clear'], help="clear path CSV (the exported dataset is used when present)")
+    parser.add_argument("--wall", default=SOURCES['Wall'], help="wall CSV (the exported dataset is used when present)")
+    parser.add_argument("--replicates", type=int, default=10000)
+    parser.add_argument("--confidence", type=float, default=0.95)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--resample-all", action="store_true",
+                        help="resample readings over all distances instead of within each distance")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--json", help="also write the fits to this file")
+    args = parser.parse_args()
+
+    sources = {'Clear': resolve(args.clear), 'Wall': resolve(args.wall)}
+    table = fit_all(sources, replicates=args.replicates, confidence=args.confidence, seed=args.seed,
+                    stratified=not args.resample_all, workers=args.workers)
+    print(f"Log-distance fit, {args.confidence:.0%} bootstrap CI over {args.replicates} replicates")
+    print(table.round(3).to_string())
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({name: {k: float(v) if k != 'readings' else int(v) for k, v in row.items()}
+                       for name, row in table.iterrows()}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,16 @@
 function rebuild_and_save_figs_octave()
   exportDir = fullfile('.output','fig_exports');
-  if ~exist(exportDir, 'dir'), error('Folder not found: %s', exportDir); end
-  make_errorbar_fig(fullfile(exportDir,'clear_errorbar.mat'),   fullfile(exportDir,'clear_errorbar.fig'));
-  make_scatter_fig (fullfile(exportDir,'clear_scatter.mat'),    fullfile(exportDir,'clear_scatter.fig'));
-  make_regress_fig (fullfile(exportDir,'clear_regression.mat'), fullfile(exportDir,'clear_regression.fig'));
-  make_errorbar_fig(fullfile(exportDir,'wall_errorbar.mat'),    fullfile(exportDir,'wall_errorbar.fig'));
-  make_scatter_fig (fullfile(exportDir,'wall_scatter.mat'),     fullfile(exportDir,'wall_scatter.fig'));
-  make_regress_fig (fullfile(exportDir,'wall_regression.mat'),  fullfile(exportDir,'wall_regression.fig'));
-  make_moving_fig  (fullfile(exportDir,'moving_moving.mat'),    fullfile(exportDir,'moving_moving.fig'));
+  bundleFile = fullfile(exportDir,'fig_bundle.mat');
+  if ~exist(bundleFile, 'file'), error('Bundle not found: %s (run export_for_figs.py)', bundleFile); end
+  B = load(bundleFile);
+  St = B.style;
+  for name = {'clear','wall'}
+    E = B.(name{1});
+    make_errorbar_fig(St, E.errorbar,   fullfile(exportDir,[name{1} '_errorbar.fig']));
+    make_scatter_fig (St, E.scatter,    fullfile(exportDir,[name{1} '_scatter.fig']));
+    make_regress_fig (St, E.regression, fullfile(exportDir,[name{1} '_regression.fig']));
+  end
+  make_moving_fig(St, B.moving, fullfile(exportDir,'moving_moving.fig'));
   disp('All .fig and .png files saved to ./.output/fig_exports');
 end
 
@@ -42,91 +45,86 @@ function save_fig_and_png(fig_h, outFig)
   close(fig_h);
 end
 
-function make_errorbar_fig(matFile, outFig)
-  S = load(matFile);
-  f = figure('Visible','off'); set_fig_size(f,S.fig_w,S.fig_h);
+function make_errorbar_fig(St, S, outFig)
+  f = figure('Visible','off'); set_fig_size(f,St.fig_w,St.fig_h);
   ax = axes('Parent',f); hold(ax,'on');
-  col = [S.color_err_r, S.color_err_g, S.color_err_b];
+  col = St.err_color;
   h = errorbar(S.x, S.avg, S.yerr_lower, S.yerr_upper, 'o-');
-  if isfield(S,'err_marker_size'), set(h,'MarkerSize',S.err_marker_size); end
-  if isfield(S,'err_line_width'),  set(h,'LineWidth', S.err_line_width);  end
+  set(h,'MarkerSize',St.err_marker_size,'LineWidth',St.err_line_width);
   set(h,'Color',col,'MarkerEdgeColor',col,'MarkerFaceColor','none');
-  xlabel(S.xlabel); ylabel(S.ylabel); title(S.title);
-  legend(S.legend_rssi,'Location','northeast');
+  xlabel(St.xlabel_rssi); ylabel(St.ylabel_rssi); title(S.title);
+  legend(St.legend_rssi,'Location','northeast');
   set_xticks_if_available(ax,S.xticks_vec);
-  apply_common_axes_style(ax,S);
+  apply_common_axes_style(ax,St);
   hold(ax,'off'); drawnow;
   save_fig_and_png(f,outFig);
 end
 
-function make_scatter_fig(matFile, outFig)
-  S = load(matFile);
-  f = figure('Visible','off'); set_fig_size(f,S.fig_w,S.fig_h);
+function make_scatter_fig(St, S, outFig)
+  f = figure('Visible','off'); set_fig_size(f,St.fig_w,St.fig_h);
   ax = axes('Parent',f); hold(ax,'on');
-  sc_s_col = [S.sc_s_r, S.sc_s_g, S.sc_s_b];
+  sc_s_col = St.sc_s_color;
   if ~isempty(S.sx)
-    hs = scatter(S.sx, S.sy, S.sc_s_size, 'o', 'MarkerFaceColor', sc_s_col, 'MarkerEdgeColor', sc_s_col);
-    if isfield(S,'sc_s_alpha'), try, set(hs,'MarkerFaceAlpha',S.sc_s_alpha,'MarkerEdgeAlpha',S.sc_s_alpha); catch, end, end
+    hs = scatter(S.sx, S.sy, St.sc_s_size, St.sc_s_marker, 'MarkerFaceColor', sc_s_col, 'MarkerEdgeColor', sc_s_col);
+    try, set(hs,'MarkerFaceAlpha',St.sc_s_alpha,'MarkerEdgeAlpha',St.sc_s_alpha); catch, end
   end
-  sc_f_col = [S.sc_f_r, S.sc_f_g, S.sc_f_b];
+  sc_f_col = St.sc_f_color;
   if ~isempty(S.fx)
-    hf = scatter(S.fx, S.fy, S.sc_f_size, 'x', 'MarkerEdgeColor', sc_f_col);
-    if isfield(S,'sc_f_alpha'), try, set(hf,'MarkerEdgeAlpha',S.sc_f_alpha); catch, end, end
+    hf = scatter(S.fx, S.fy, St.sc_f_size, St.sc_f_marker, 'MarkerEdgeColor', sc_f_col);
+    try, set(hf,'MarkerEdgeAlpha',St.sc_f_alpha); catch, end
   end
   if isfield(S,'dist_vals') && ~isempty(S.dist_vals)
     for i=1:numel(S.dist_vals)
       txt = sprintf('S:%d\nF:%d', S.succ_cnt(i), S.fail_cnt(i));
       y_here = S.avg_at_dist(i) + S.y_off;
-      text(ax, S.dist_vals(i), y_here, txt, 'VerticalAlignment','top', 'HorizontalAlignment','left', 'BackgroundColor',[S.text_bg_r,S.text_bg_g,S.text_bg_b], 'Margin',2, 'Clipping','on');
+      text(ax, S.dist_vals(i), y_here, txt, 'VerticalAlignment','top', 'HorizontalAlignment','left', 'BackgroundColor',St.text_bg_color, 'Margin',2, 'Clipping','on');
     end
   end
-  xlabel(S.xlabel); ylabel(S.ylabel); title(S.title);
-  legend({S.legend_success,S.legend_failed},'Location','northeast');
+  xlabel(St.xlabel_rssi); ylabel(St.ylabel_rssi); title(S.title);
+  legend({St.legend_success,St.legend_failed},'Location','northeast');
   set_xticks_if_available(ax,S.xticks_vec);
-  apply_common_axes_style(ax,S);
+  apply_common_axes_style(ax,St);
   hold(ax,'off'); drawnow;
   save_fig_and_png(f,outFig);
 end
 
-function make_regress_fig(matFile, outFig)
-  S = load(matFile);
-  f = figure('Visible','off'); set_fig_size(f,S.fig_w,S.fig_h);
+function make_regress_fig(St, S, outFig)
+  f = figure('Visible','off'); set_fig_size(f,St.fig_w,St.fig_h);
   ax = axes('Parent',f); hold(ax,'on');
   if isfield(S,'sx') && numel(S.sx) >= 2 && ~isnan(S.slope) && ~isnan(S.intercept)
     rx = linspace(min(S.sx), max(S.sx), 100);
-    reg_col = [S.reg_r, S.reg_g, S.reg_b];
-    plot(ax, rx, S.slope.*rx + S.intercept, 'LineWidth', S.reg_lw, 'Color', reg_col, 'DisplayName','Regression Line');
+    reg_col = St.reg_color;
+    plot(ax, rx, S.slope.*rx + S.intercept, 'LineWidth', St.reg_lw, 'Color', reg_col, 'DisplayName','Regression Line');
   end
-  sc_s_col = [S.sc_s_r, S.sc_s_g, S.sc_s_b];
+  sc_s_col = St.sc_s_color;
   if ~isempty(S.sx)
-    hs = scatter(ax, S.sx, S.sy, S.sc_s_size, 'o', 'MarkerFaceColor', sc_s_col, 'MarkerEdgeColor', sc_s_col, 'DisplayName','Success');
-    if isfield(S,'sc_s_alpha'), try, set(hs,'MarkerFaceAlpha',S.sc_s_alpha,'MarkerEdgeAlpha',S.sc_s_alpha); catch, end, end
+    hs = scatter(ax, S.sx, S.sy, St.sc_s_size, St.sc_s_marker, 'MarkerFaceColor', sc_s_col, 'MarkerEdgeColor', sc_s_col, 'DisplayName','Success');
+    try, set(hs,'MarkerFaceAlpha',St.sc_s_alpha,'MarkerEdgeAlpha',St.sc_s_alpha); catch, end
   end
-  xlabel(S.xlabel); ylabel(S.ylabel); title(S.title);
+  xlabel(St.xlabel_rssi); ylabel(St.ylabel_rssi); title(S.title);
   legend(ax,'Location','northeast');
   set_xticks_if_available(ax,S.xticks_vec);
-  apply_common_axes_style(ax,S);
+  apply_common_axes_style(ax,St);
   hold(ax,'off'); drawnow;
   save_fig_and_png(f,outFig);
 end
 
-function make_moving_fig(matFile, outFig)
-  S = load(matFile);
-  f = figure('Visible','off'); set_fig_size(f,S.fig_w,S.fig_h);
+function make_moving_fig(St, S, outFig)
+  f = figure('Visible','off'); set_fig_size(f,St.fig_w,St.fig_h);
   ax = axes('Parent',f); hold(ax,'on');
-  mv_col = [S.mv_r, S.mv_g, S.mv_b];
+  mv_col = St.mv_color;
   if isfield(S,'rx') && ~isempty(S.rx)
-    plot(ax, S.rx, S.avg, 'o-', 'LineWidth', S.mv_lw, 'Color', mv_col, 'MarkerEdgeColor', mv_col, 'MarkerFaceColor','none', 'DisplayName', S.legend_avg);
+    plot(ax, S.rx, S.avg, 'o-', 'LineWidth', St.mv_lw, 'Color', mv_col, 'MarkerEdgeColor', mv_col, 'MarkerFaceColor','none', 'DisplayName', St.legend_avg);
   end
-  fail_col = [S.fail_r, S.fail_g, S.fail_b];
+  fail_col = St.sc_f_color;
   if isfield(S,'fx') && ~isempty(S.fx)
-    hf = scatter(ax, S.fx, S.fy, S.fail_size, 'x', 'MarkerEdgeColor', fail_col, 'DisplayName', S.legend_failed);
-    if isfield(S,'fail_alpha'), try, set(hf,'MarkerEdgeAlpha',S.fail_alpha); catch, end, end
+    hf = scatter(ax, S.fx, S.fy, St.sc_f_size, St.sc_f_marker, 'MarkerEdgeColor', fail_col, 'DisplayName', St.legend_failed);
+    try, set(hf,'MarkerEdgeAlpha',St.sc_f_alpha); catch, end
   end
-  xlabel(S.xlabel); ylabel(S.ylabel); title(S.title);
+  xlabel(St.xlabel_moving); ylabel(St.ylabel_moving); title(S.title);
   legend(ax,'Location','northeast');
   set_xticks_if_available(ax,S.xticks_vec);
-  apply_common_axes_style(ax,S);
+  apply_common_axes_style(ax,St);
   hold(ax,'off'); drawnow;
   save_fig_and_png(f,outFig);
 end
@@ -1,33 +1,36 @@
+import argparse
+import os
+import sys
+
 import matplotlib.pyplot as plt
 import pandas as pd
 import numpy as np
 from scipy.stats import linregress
 
-def load_and_process_data(file_path, experiment_type):
-    df = pd.read_csv(file_path)
-
-    df_exp = df[df['Experiment Type'] == experiment_type]
-    df_success = df_exp[df_exp['Status'] == 'Success']
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "shared"))
 
-    stats = df_success.groupby('Distance (meters)').agg({
-        'RSSI': ['min', 'mean', 'max', 'count'],
-        'Calculated Distance': 'mean'
-    }).round(2)
+from aggregate import summarize
+from dataset import read_frame, resolve
+from downsample import integer_ticks, line, pixel_size, points
+from figure_cache import FigureCache
+from plotting import OUTPUT, add_arguments, configure, finish, render_all
 
-    failed_counts = df_exp[df_exp['Status'] == 'Failed'].groupby('Distance (meters)').size()
-
-    summary = pd.DataFrame({
-        'Min RSSI': stats['RSSI']['min'],
-        'Avg RSSI': stats['RSSI']['mean'],
-        'Max RSSI': stats['RSSI']['max'],
-        'Avg Calc Distance': stats['Calculated Distance']['mean'],
-        'Success Count': stats['RSSI']['count'],
-        'Failed Count': failed_counts
-    }).fillna(0)
+LOAD_COLUMNS = ['Distance (meters)', 'RSSI', 'Calculated Distance', 'Status', 'Experiment Type']
+MOVING_COLUMNS = ['Reading Number', 'RSSI', 'Calculated Distance', 'Status']
 
+def load_and_process_data(file_path, experiment_type):
+    df_exp = read_frame(file_path, LOAD_COLUMNS, experiment=experiment_type)
+    summary = summarize(df_exp, [experiment_type])[experiment_type]
     return summary, df_exp
 
 def plot_rssi_stats(summary, title, df_exp):
+    return [
+        plot_errorbar(summary, title),
+        plot_success_failed(summary, title, df_exp),
+        plot_regression(summary, title, df_exp),
+    ]
+
+def plot_errorbar(summary, title):
     # ---------------------------
     # Error bar plot
     # ---------------------------
@@ -51,9 +54,9 @@ def plot_rssi_stats(summary, title, df_exp):
     # plt.title(f'{title} - Min/Average/Max RSSI Values')
     plt.legend(frameon=True, fancybox=True, shadow=True, fontsize=23, loc='best', borderpad=1)
     plt.tick_params(axis='both', which='major', labelsize=25)
-    plt.savefig(f'{title}_MinAverageMax_RSSI_Values.png', dpi=300, bbox_inches='tight')
-    plt.show()
+    return finish(f'{title}_MinAverageMax_RSSI_Values.png')
 
+def plot_success_failed(summary, title, df_exp):
     # ---------------------------
     # Scatter plot with success/failed markers
     # ---------------------------
@@ -89,25 +92,22 @@ def plot_rssi_stats(summary, title, df_exp):
     # plt.title(f'{title} - Success/Failed RSSI Markers')
     plt.legend(frameon=True, fancybox=True, shadow=True, fontsize=23, loc='best', borderpad=1)
     plt.tick_params(axis='both', which='major', labelsize=25)
-    plt.savefig(f'{title}_Success_Failed_RSSI_Markers', dpi=300, bbox_inches='tight')
-    plt.show()
+    return finish(f'{title}_Success_Failed_RSSI_Markers')
 
+def plot_regression(summary, title, df_exp):
     # ---------------------------
     # Regression line on success points
     # ---------------------------
     plt.figure(figsize=(11, 7))
 
+    success_points = df_exp[df_exp['Status'] == 'Success']
+
     if not success_points.empty:
-        slope, intercept, _, _, _ = linregress(
-            success_points['Distance (meters)'],
-            success_points['RSSI']
-        )
+        # fit in float64: distances load as float32, RSSI as int8
+        distance = success_points['Distance (meters)'].to_numpy(np.float64)
+        slope, intercept, _, _, _ = linregress(distance, success_points['RSSI'].to_numpy(np.float64))
 
-        reg_line_x = np.linspace(
-            min(success_points['Distance (meters)']),
-            max(success_points['Distance (meters)']),
-            100
-        )
+        reg_line_x = np.linspace(min(distance), max(distance), 100)
         reg_line_y = slope * reg_line_x + intercept
         plt.plot(reg_line_x, reg_line_y, label='Regression Line', linewidth=2)
 
@@ -123,11 +123,14 @@ def plot_rssi_stats(summary, title, df_exp):
     # plt.title(f'{title} - Regression Line for Success RSSI')
     plt.legend(frameon=True, fancybox=True, shadow=True, fontsize=23, loc='best', borderpad=1)
     plt.tick_params(axis='both', which='major', labelsize=25)
-    plt.savefig(f'{title}_Regression_Line_for_Success_RSSI', dpi=300, bbox_inches='tight')
-    plt.show()
+    return finish(f'{title}_Regression_Line_for_Success_RSSI')
 
-def plot_moving_experiment(file_path):
-    df = pd.read_csv(file_path)
+def load_moving(file_path):
+    return read_frame(file_path, MOVING_COLUMNS, experiment='Moving')
+
+def plot_moving_experiment(df):
+    if not isinstance(df, pd.DataFrame):
+        df = load_moving(df)
     df_success = df[df['Status'] == 'Success']
     df_failed = df[df['Status'] == 'Failed']
 
@@ -136,15 +139,17 @@ def plot_moving_experiment(file_path):
         'Calculated Distance': 'mean'
     })
 
-    plt.figure(figsize=(11, 7))
-    plt.plot(stats.index, stats['RSSI']['mean'], 'o-', label='Average RSSI')
-    plt.scatter(df_failed['Reading Number'], df_failed['RSSI'], label='Failed', marker='x')
+    fig = plt.figure(figsize=(11, 7))
+    # long captures are reduced to what the output pixels can show
+    width, height = pixel_size(fig, OUTPUT["dpi"])
+    plt.plot(*line(stats.index, stats['RSSI']['mean'], width), 'o-', label='Average RSSI')
+    plt.scatter(*points(df_failed['Reading Number'], df_failed['RSSI'], width, height), label='Failed', marker='x')
 
     # Use the Reading Number range for ticks
     if 'Reading Number' in df.columns and not df['Reading Number'].empty:
         xmin = int(df['Reading Number'].min())
         xmax = int(df['Reading Number'].max())
-        plt.xticks(np.arange(xmin, xmax + 1, 1))
+        integer_ticks(plt.gca(), xmin, xmax)
 
     plt.grid(True, linestyle='--', alpha=0.7, linewidth=1.1)
     plt.xlabel('Sample Index', fontsize=22, fontweight='bold')
@@ -152,33 +157,7 @@ def plot_moving_experiment(file_path):
     # plt.title('Moving Experiment - RSSI Over Time')
     plt.legend(frameon=True, fancybox=True, shadow=True, fontsize=23, loc='best', borderpad=1)
     plt.tick_params(axis='both', which='major', labelsize=25)
-    plt.savefig('Moving_Experiment_RSSI_Over_Time', dpi=300, bbox_inches='tight')
-    plt.show()
-
-# ---------------------------
-# Load and plot Clear Path experiment
-# ---------------------------
-clear_summary, clear_data = load_and_process_data('./.output/clear_path_experiment.csv', 'Clear')
-plot_rssi_stats(clear_summary, 'Clear Path', clear_data)
-
-# Print Clear Path Summary
-print("\nClear Path Summary:")
-print(clear_summary)
-
-# ---------------------------
-# Load and plot Wall Path experiment
-# ---------------------------
-wall_summary, wall_data = load_and_process_data('./.output/wall_experiment.csv', 'Wall')
-plot_rssi_stats(wall_summary, 'Wall Path', wall_data)
-
-# Print Wall Path Summary
-print("\nWall Path Summary:")
-print(wall_summary)
-
-# ---------------------------
-# Plot Moving Experiment
-# ---------------------------
-plot_moving_experiment('./.output/moving_experiment.csv')
+    return finish('Moving_Experiment_RSSI_Over_Time')
 
 def plot_rssi_stats_logarithmic(summary, title, df_exp):
     """
@@ -215,15 +194,16 @@ def plot_rssi_stats_logarithmic(summary, title, df_exp):
     plt.legend(frameon=True, fancybox=True, shadow=True, fontsize=23, loc='best', borderpad=1)
     plt.tick_params(axis='both', which='major', labelsize=25)
     
-    plt.savefig(f'{title}_MinAverageMax_RSSI_Values_Logarithmic.png', dpi=300, bbox_inches='tight')
-    plt.show()
+    return finish(f'{title}_MinAverageMax_RSSI_Values_Logarithmic.png')
 
-def plot_moving_experiment_logarithmic(file_path):
+def plot_moving_experiment_logarithmic(df):
     """
     Plot moving experiment with logarithmic scale on Y-axis
     Using 10^(RSSI/10) conversion for proper logarithmic representation
+    Accepts the moving-experiment frame or a path to load it from
     """
-    df = pd.read_csv(file_path)
+    if not isinstance(df, pd.DataFrame):
+        df = load_moving(df)
     df_success = df[df['Status'] == 'Success']
     df_failed = df[df['Status'] == 'Failed']
     
@@ -232,13 +212,14 @@ def plot_moving_experiment_logarithmic(file_path):
         'Calculated Distance': 'mean'
     })
     
-    plt.figure(figsize=(11, 7))
+    fig = plt.figure(figsize=(11, 7))
+    width, height = pixel_size(fig, OUTPUT["dpi"])
     
     # Convert RSSI values using 10^(RSSI/10)
     avg_rssi_converted = 10**(stats['RSSI']['mean']/10)
     
     # Plot success points
-    plt.plot(stats.index, avg_rssi_converted, 'o-', label='Average RSSI')
+    plt.plot(*line(stats.index, avg_rssi_converted, width), 'o-', label='Average RSSI')
     
     # Plot failed points if they exist
     if not df_failed.empty and 'RSSI' in df_failed.columns:
@@ -246,7 +227,7 @@ def plot_moving_experiment_logarithmic(file_path):
         valid_failed = df_failed.dropna(subset=['RSSI'])
         if not valid_failed.empty:
             failed_rssi_converted = 10**(valid_failed['RSSI']/10)
-            plt.scatter(valid_failed['Reading Number'], failed_rssi_converted, 
+            plt.scatter(*points(valid_failed['Reading Number'], failed_rssi_converted, width, height),
                        label='Failed', marker='x', color='red', s=50)
     
     plt.yscale('log')
@@ -266,28 +247,47 @@ def plot_moving_experiment_logarithmic(file_path):
     plt.legend(frameon=True, fancybox=True, shadow=True, fontsize=23, loc='best', borderpad=1)
     plt.tick_params(axis='both', which='major', labelsize=25)
     
-    plt.savefig('Moving_Experiment_RSSI_Over_Time_Logarithmic.png', dpi=300, bbox_inches='tight')
-    plt.show()
-
-# ---------------------------
-# Generate Logarithmic Versions of All Plots
-# ---------------------------
-print("\n" + "="*50)
-print("Generating Logarithmic Scale Versions...")
-print("="*50)
-
-# Generate logarithmic version for Clear Path (Figure 6)
-print("\nGenerating Clear Path Logarithmic Plot...")
-plot_rssi_stats_logarithmic(clear_summary, 'Clear_Path', clear_data)
-
-# Generate logarithmic version for Wall Path (Figure 7)
-print("\nGenerating Wall Path Logarithmic Plot...")
-plot_rssi_stats_logarithmic(wall_summary, 'Wall_Path', wall_data)
-
-# Generate logarithmic version for Moving Experiment (Figure 8)
-print("\nGenerating Moving Experiment Logarithmic Plot...")
-plot_moving_experiment_logarithmic('./.output/moving_experiment.csv')
-
-print("\n" + "="*50)
-print("All logarithmic plots have been generated and saved!")
-print("="*50)
\ No newline at end of file
+    return finish('Moving_Experiment_RSSI_Over_Time_Logarithmic.png')
+
+def main():
+    parser = argparse.ArgumentParser(description="Plot the clear, wall and moving calibration experiments.")
+    add_arguments(parser)
+    args = parser.parse_args()
+    configure(args.batch, args.out, args.dpi)
+
+    clear_summary, clear_data = load_and_process_data(resolve('./.output/clear_path_experiment.csv'), 'Clear')
+    wall_summary, wall_data = load_and_process_data(resolve('./.output/wall_experiment.csv'), 'Wall')
+    moving_data = load_moving(resolve('./.output/moving_experiment.csv'))
+
+    print("\nClear Path Summary:")
+    print(clear_summary)
+    print("\nWall Path Summary:")
+    print(wall_summary)
+
+    # Every figure is independent, so batch mode can render them in parallel
+    jobs = []
+    for summary, title, data in ((clear_summary, 'Clear Path', clear_data), (wall_summary, 'Wall Path', wall_data)):
+        jobs += [
+            (plot_errorbar, (summary, title)),
+            (plot_success_failed, (summary, title, data)),
+            (plot_regression, (summary, title, data)),
+        ]
+    jobs.append((plot_moving_experiment, (moving_data,)))
+
+    # Logarithmic versions (Figures 6-8)
+    jobs += [
+        (plot_rssi_stats_logarithmic, (clear_summary, 'Clear_Path', clear_data)),
+        (plot_rssi_stats_logarithmic, (wall_summary, 'Wall_Path', wall_data)),
+        (plot_moving_experiment_logarithmic, (moving_data,)),
+    ]
+
+    cache = FigureCache(args.out, "visualize_data", {"dpi": args.dpi}) if args.batch and not args.no_cache else None
+    paths = render_all(jobs, args.workers, cache)
+    rendered = sum(p is not None for p in paths)
+    print("\n" + "="*50)
+    print(f"{rendered} of {len(paths)} plots generated and saved ({len(paths) - rendered} unchanged)")
+    print("="*50)
+
+
+if __name__ == "__main__":
+    main()
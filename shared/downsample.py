@@ -0,0 +1,124 @@
+# downsample.py
+# Visual-preserving reduction of long series before they reach matplotlib.
+#
+# A line drawn into a W-pixel-wide figure shows at most one vertical stroke per pixel
+# column, so keeping the first, last, lowest and highest sample of every column (min/max
+# decimation) draws the same picture from at most 4 W points. LTTB (largest triangle
+# three buckets) keeps one point per bucket instead and suits smooth curves. Scatter
+# clouds are thinned to one point per occupied pixel cell. Either way the work left for
+# matplotlib depends on the figure size, not on the length of the capture, and series
+# that already fit the budget are returned untouched, so short captures plot as before.
+#
+# Used by the calibration and accuracy test scripts, which put this directory on sys.path.
+
+import numpy as np
+from matplotlib.ticker import MaxNLocator
+
+MAX_TICKS = 25          # beyond this many unit ticks, let a locator pick round ones
+THINNED_TICKS = 10
+
+
+def pixel_size(fig, dpi):
+    """(width, height) of a figure in output pixels."""
+    return int(fig.get_figwidth() * dpi), int(fig.get_figheight() * dpi)
+
+
+def _runs(x, buckets):
+    """Start index of every run of samples falling into the same one of `buckets` columns over x's range (x ascending)."""
+    span = x[-1] - x[0]
+    if span > 0:
+        column = np.minimum(((x - x[0]) * (buckets / span)).astype(np.int64), buckets - 1)
+    else:
+        column = np.zeros(len(x), dtype=np.int64)
+    return np.flatnonzero(np.r_[True, column[1:] != column[:-1]])
+
+
+def _first_match(mask, run_id):
+    """Index of the first True of `mask` within every run that has one."""
+    idx = np.flatnonzero(mask)
+    runs = run_id[idx]
+    return idx[np.r_[True, runs[1:] != runs[:-1]]] if len(idx) else idx
+
+
+def minmax_indices(x, y, buckets):
+    """Sorted indices of the first, last, minimum and maximum sample of each x column."""
+    n = len(y)
+    starts = _runs(x, buckets)
+    lengths = np.diff(np.r_[starts, n])
+    run_id = np.repeat(np.arange(len(starts)), lengths)
+    with np.errstate(invalid='ignore'):
+        lows = np.repeat(np.fmin.reduceat(y, starts), lengths)
+        highs = np.repeat(np.fmax.reduceat(y, starts), lengths)
+    keep = np.concatenate([starts, starts + lengths - 1,
+                           _first_match(y == lows, run_id), _first_match(y == highs, run_id)])
+    return np.unique(keep)
+
+
+def lttb_indices(x, y, n_out):
+    """Sorted indices of the n_out points the largest-triangle-three-buckets algorithm keeps."""
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    counts = np.diff(edges)
+    mean_x = np.add.reduceat(x[1:n - 1], edges[:-1] - 1) / counts
+    mean_y = np.add.reduceat(y[1:n - 1], edges[:-1] - 1) / counts
+    # the bucket after the last one is the final point
+    mean_x = np.r_[mean_x[1:], x[-1]]
+    mean_y = np.r_[mean_y[1:], y[-1]]
+
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        area = np.abs((x[a] - mean_x[i]) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (mean_y[i] - y[a]))
+        a = lo + int(np.argmax(area))
+        out[i + 1] = a
+    return out
+
+
+def line(x, y, width_px, method='minmax'):
+    """
+    The samples of a line plot worth drawing at `width_px` pixels: min/max per pixel column
+    or LTTB down to one point per pixel. x must be ascending; short series come back as they are.
+    """
+    x, y = np.asarray(x), np.asarray(y)
+    budget = width_px * (4 if method == 'minmax' else 1)
+    if len(y) <= budget or width_px < 1:
+        return x, y
+    xf, yf = x.astype(np.float64), y.astype(np.float64)
+    idx = minmax_indices(xf, yf, width_px) if method == 'minmax' else lttb_indices(xf, yf, width_px)
+    return x[idx], y[idx]
+
+
+def points(x, y, width_px, height_px):
+    """One point of a scatter per occupied pixel cell over the points' own extent, in original order."""
+    x, y = np.asarray(x), np.asarray(y)
+    if len(y) <= width_px or width_px < 1 or height_px < 1:
+        return x, y
+    cells = []
+    for values, size in ((x, width_px), (y, height_px)):
+        values = values.astype(np.float64)
+        lo, span = np.nanmin(values), np.nanmax(values) - np.nanmin(values)
+        cells.append(np.zeros(len(values), dtype=np.int64) if not span > 0
+                     else np.minimum(((values - lo) * (size / span)).astype(np.int64), size - 1))
+    _, first = np.unique(cells[0] * height_px + cells[1], return_index=True)
+    first.sort()
+    return x[first], y[first]
+
+
+def tick_step(lo, hi, max_ticks=MAX_TICKS, ticks=THINNED_TICKS):
+    """1 while unit ticks over [lo, hi] stay readable, else a round integer step giving about `ticks` ticks."""
+    if hi - lo + 1 <= max_ticks:
+        return 1
+    locator = MaxNLocator(nbins=ticks, integer=True)
+    values = locator.tick_values(lo, hi)
+    return int(values[1] - values[0])
+
+
+def integer_ticks(ax, lo, hi, max_ticks=MAX_TICKS):
+    """Unit x ticks from lo to hi as before for short ranges, round integer steps for long ones."""
+    step = tick_step(lo, hi, max_ticks)
+    start = lo if step == 1 else -(-lo // step) * step
+    ax.set_xticks(np.arange(start, hi + 1, step))
@@ -0,0 +1,105 @@
+# plotting.py
+# Figure output shared by the calibration and accuracy test scripts.
+#
+# Interactive runs behave as before: each figure is saved where the script saves it (if it
+# does) and shown in a window. Batch runs switch to the non-interactive Agg backend, write
+# every figure to the output directory and render independent figures in worker processes.
+# With a FigureCache (see calibration/figure_cache.py) jobs whose inputs are unchanged are
+# skipped. The scripts differ only in their defaults, which they pass to add_arguments.
+#
+# Both script directories put this directory on sys.path before importing from it.
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib.pyplot as plt
+
+OUTPUT = {"batch": False, "dir": ".", "dpi": 300, "rc": None}
+
+
+def apply_style(rc=None):
+    """Print-friendly white seaborn grid, plus per-script rcParams overrides."""
+    plt.style.use('seaborn-v0_8-whitegrid')
+    plt.rcParams['figure.facecolor'] = 'white'
+    plt.rcParams['axes.facecolor'] = 'white'
+    plt.rcParams.update(rc or {})
+
+
+def configure(batch=False, out_dir=".", dpi=300, rc=None):
+    """Set the output options; with `rc` (rcParams overrides) the white grid style is applied too."""
+    OUTPUT.update(batch=batch, dir=out_dir, dpi=dpi, rc=rc)
+    if batch:
+        plt.switch_backend('Agg')
+        os.makedirs(out_dir, exist_ok=True)
+    if rc is not None:
+        apply_style(rc)
+
+
+def finish(name, save=True):
+    """
+    Save the current figure as `name` under the output directory, then show it, or close it
+    in batch mode. Figures that were only ever shown (save=False) are still written in batch mode.
+    """
+    path = None
+    if save or OUTPUT["batch"]:
+        path = os.path.join(OUTPUT["dir"], name)
+        if not os.path.splitext(path)[1]:
+            path += ".png"      # what savefig would append anyway
+        plt.savefig(path, dpi=OUTPUT["dpi"], bbox_inches='tight')
+    if OUTPUT["batch"]:
+        plt.close()
+    else:
+        plt.show()
+    return path
+
+
+def _run(job):
+    func, args = job
+    return func(*args)
+
+
+def render_all(jobs, workers=None, cache=None):
+    """
+    Run (func, args) figure jobs and return what each one wrote (None for skipped jobs).
+    In batch mode they are spread over a process pool, so each job must be a module-level
+    function whose args carry all the data it plots. Jobs return the paths they write,
+    which is what `cache` records.
+    """
+    pending = list(range(len(jobs)))
+    keys = {}
+    if cache is not None:
+        pending = []
+        for i, (func, args) in enumerate(jobs):
+            jid, key, fresh = cache.check(func, args)
+            keys[i] = (jid, key)
+            if not fresh:
+                pending.append(i)
+
+    results = [None] * len(jobs)
+    if not OUTPUT["batch"] or workers == 1 or len(pending) < 2:
+        outputs = [_run(jobs[i]) for i in pending]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=configure,
+                                 initargs=(True, OUTPUT["dir"], OUTPUT["dpi"], OUTPUT["rc"])) as pool:
+            outputs = list(pool.map(_run, [jobs[i] for i in pending]))
+
+    for i, output in zip(pending, outputs):
+        results[i] = output
+        if cache is not None:
+            cache.record(*keys[i], output)
+    if cache is not None:
+        cache.evict_stale()
+        cache.save()
+    return results
+
+
+def add_arguments(parser, out=".", dpi=300, cache=True):
+    """The output options, with the calling script's defaults; --no-cache only for scripts using a FigureCache."""
+    parser.add_argument("--batch", action="store_true",
+                        help="headless mode: write every figure to --out instead of showing it")
+    parser.add_argument("--out", default=out, help="directory for saved figures")
+    parser.add_argument("--dpi", type=int, default=dpi)
+    parser.add_argument("--workers", type=int, default=None, help="render processes in batch mode")
+    if cache:
+        parser.add_argument("--no-cache", action="store_true",
+                            help="re-render everything in batch mode, even figures whose inputs are unchanged")
@@ -0,0 +1,176 @@
+# running_stats.py
+# Incremental, mergeable statistics (count, mean, variance, min, max).
+#
+# RunningStats is Welford's accumulator: one reading updates it in O(1) without keeping
+# the readings, and two accumulators over disjoint data merge exactly (Chan et al.), so
+# shards, sessions and capture files can be summarised separately and combined later.
+# StatsTable keeps one accumulator per (key, field) and round-trips through JSON.
+#
+# Used by the calibration and accuracy test scripts, which put this directory on sys.path.
+
+import json
+import math
+import os
+
+import numpy as np
+import pandas as pd
+
+
+def _missing_as_none(value):
+    return None if isinstance(value, float) and math.isnan(value) else value
+
+
+class RunningStats:
+    __slots__ = ("count", "mean", "m2", "min", "max")
+
+    def __init__(self, count=0, mean=0.0, m2=0.0, min=math.inf, max=-math.inf):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+        self.min = min
+        self.max = max
+
+    def update(self, x):
+        x = float(x)
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+        self.min = min(self.min, x)
+        self.max = max(self.max, x)
+        return self
+
+    @classmethod
+    def from_values(cls, values):
+        values = np.asarray(values, dtype=np.float64)
+        if not values.size:
+            return cls()
+        mean = values.mean()
+        return cls(int(values.size), float(mean), float(((values - mean) ** 2).sum()),
+                   float(values.min()), float(values.max()))
+
+    def merge(self, other):
+        """Fold `other` (statistics of disjoint data) into this accumulator."""
+        if not other.count:
+            return self
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    @property
+    def sum(self):
+        return self.mean * self.count
+
+    @property
+    def variance(self):
+        """Sample variance (ddof=1), like pandas' std/var; NaN below two readings."""
+        return self.m2 / (self.count - 1) if self.count > 1 else math.nan
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance)
+
+    def to_dict(self):
+        return {"count": self.count, "mean": self.mean, "m2": self.m2,
+                "min": self.min if self.count else None, "max": self.max if self.count else None}
+
+    @classmethod
+    def from_dict(cls, d):
+        if not d["count"]:
+            return cls()
+        return cls(d["count"], d["mean"], d["m2"], d["min"], d["max"])
+
+    def __repr__(self):
+        return f"RunningStats(count={self.count}, mean={self.mean:.4g}, std={self.std:.4g}, min={self.min}, max={self.max})"
+
+
+class StatsTable:
+    """RunningStats per group key (a tuple) and field name."""
+
+    def __init__(self, key_names, fields):
+        self.key_names = list(key_names)
+        self.fields = list(fields)
+        self.groups = {}
+
+    def _group(self, key):
+        group = self.groups.get(key)
+        if group is None:
+            group = self.groups[key] = {field: RunningStats() for field in self.fields}
+        return group
+
+    def update(self, key, **values):
+        """Add one reading to group `key`; fields not given (or None) are left untouched."""
+        group = self._group(tuple(key))
+        for field, value in values.items():
+            if value is not None:
+                group[field].update(value)
+        return self
+
+    def update_frame(self, df):
+        """
+        Add every row of a DataFrame holding the key columns and the fields, in one grouped
+        pass per field. Missing key values are grouped under None.
+        """
+        keys = [df[k] for k in self.key_names]
+        for field in self.fields:
+            values = df[field].astype(np.float64)
+            grouped = values.groupby(keys, observed=True, sort=False, dropna=False)
+            deviations = (values - grouped.transform('mean')) ** 2
+            part = pd.DataFrame({
+                'count': grouped.count(),
+                'mean': grouped.mean(),
+                'm2': deviations.groupby(keys, observed=True, sort=False, dropna=False).sum(),
+                'min': grouped.min(),
+                'max': grouped.max(),
+            })
+            for key, row in zip(part.index, part.itertuples(index=False)):
+                if row.count:
+                    key = tuple(_missing_as_none(k) for k in (key if isinstance(key, tuple) else (key,)))
+                    self._group(key)[field].merge(RunningStats(int(row.count), row.mean, row.m2, row.min, row.max))
+        return self
+
+    def merge(self, other):
+        for key, group in other.groups.items():
+            target = self._group(key)
+            for field, stats in group.items():
+                target.setdefault(field, RunningStats()).merge(stats)
+        return self
+
+    def frame(self):
+        """One row per key, columns (field, statistic) for count, mean, std, min and max."""
+        rows = {key: {(field, stat): getattr(s, stat) if s.count else np.nan
+                      for field, s in group.items() for stat in ("count", "mean", "std", "min", "max")}
+                for key, group in self.groups.items()}
+        frame = pd.DataFrame.from_dict(rows, orient='index')
+        if len(frame):
+            frame.index = pd.MultiIndex.from_tuples(frame.index, names=self.key_names) \
+                if len(self.key_names) > 1 else pd.Index([k[0] for k in frame.index], name=self.key_names[0])
+            frame.columns = pd.MultiIndex.from_tuples(frame.columns)
+        return frame.sort_index()
+
+    def to_dict(self):
+        return {"keys": self.key_names, "fields": self.fields,
+                "groups": [[list(key), {f: s.to_dict() for f, s in group.items()}] for key, group in self.groups.items()]}
+
+    @classmethod
+    def from_dict(cls, d):
+        table = cls(d["keys"], d["fields"])
+        for key, group in d["groups"]:
+            table.groups[tuple(key)] = {f: RunningStats.from_dict(s) for f, s in group.items()}
+        return table
+
+    def save(self, path):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))